@@ -2,14 +2,17 @@ from __future__ import annotations
 
 import asyncio
 import datetime
+import json
 from abc import ABC, abstractmethod
+from collections import Counter
+from typing import TYPE_CHECKING
 
-import aiohttp
-import requests
-from aiohttp.client_exceptions import ContentTypeError
-
+from clients import http_transport
+from clients.deferred_plays import FEED_NOT_JSON, DeferralCollector, DeferredPlays
+from clients.payload_archive import get_payload_archive
 from my_types import (
     Game,
+    GameWindow,
     KnownPlays,
     SeasonPeriod,
     Sport,
@@ -17,13 +20,43 @@ from my_types import (
     TwitterCredentials,
 )
 
+if TYPE_CHECKING:
+    from clients.fetch_scheduler import FetchResult, FetchScheduler
+
 
 class AbstractSportsClient(ABC):
     def __init__(self, dry_run: bool):
         self.dry_run = dry_run
-        self.conn = aiohttp.TCPConnector(ttl_dns_cache=300)
-        self.session = aiohttp.ClientSession(connector=self.conn)
+        self._fetch_scheduler: FetchScheduler | None = None
         self.base_url = ""  # Overriden in NHL and MLB
+        # What the parsers skipped for now, moved to deferred_plays after each poll
+        self.deferrals = DeferralCollector()
+        self._deferred_plays: DeferredPlays | None = None
+        # Players seen in the feeds and how often, when collecting for scorecard_cache.py
+        self.active_players: Counter[tuple[int, str]] | None = None
+
+    @property
+    def fetch_scheduler(self) -> FetchScheduler:
+        # Built on first use, so runs that stop after the schedule check never import aiohttp
+        if self._fetch_scheduler is None:
+            from clients.fetch_scheduler import FetchScheduler
+
+            self._fetch_scheduler = FetchScheduler()
+        return self._fetch_scheduler
+
+    @property
+    def deferred_plays(self) -> DeferredPlays:
+        if self._deferred_plays is None:
+            self._deferred_plays = DeferredPlays(self.sport, dry_run=self.dry_run)
+        return self._deferred_plays
+
+    async def close(self) -> None:
+        """Close the feed session. Call it from the event loop that fetched."""
+        if self._fetch_scheduler is not None:
+            if self._fetch_scheduler.hosts:
+                print(self._fetch_scheduler.report())
+            await self._fetch_scheduler.close()
+            self._fetch_scheduler = None
 
     @property
     @abstractmethod
@@ -56,6 +89,12 @@ class AbstractSportsClient(ABC):
     def score_name(self) -> str:
         pass
 
+    @property
+    @abstractmethod
+    def max_game_hours(self) -> int:
+        "How long after the scheduled start a game can still have plays to process"
+        pass
+
     @abstractmethod
     def season_period(self, game_type_raw: str) -> SeasonPeriod:
         pass
@@ -76,20 +115,31 @@ class AbstractSportsClient(ABC):
             return f"in the {real_year} playoffs"
         raise ValueError(f"Unknown season period: {season_period}")
 
-    # This is shared between MLB and NHL and overriden in NBA and NFL
+    # This is shared between MLB and NHL and overriden in NFL
     def get_current_games(self) -> list[Game]:
         # Fudge it by a day in either direction in case of timezone issues
         today = datetime.date.today()
-        yesterday = (today - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
-        tomorrow = (today + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+        yesterday = today - datetime.timedelta(days=1)
+        tomorrow = today + datetime.timedelta(days=1)
+
+        response = http_transport.get(self.schedule_url(yesterday, tomorrow))
+        self.archive_payload("schedule", "", response.content)
+        return self.games_from_schedule(response.json(), yesterday, tomorrow)
 
-        dates = requests.get(
+    # This is shared between MLB and NHL and overriden in NBA and NFL
+    def schedule_url(self, start: datetime.date, end: datetime.date) -> str:
+        return (
             self.base_url
-            + f"/schedule?sportId=1&startDate={yesterday}&endDate={tomorrow}"
-        ).json()["dates"]
+            + f"/schedule?sportId=1&startDate={start.strftime('%Y-%m-%d')}&endDate={end.strftime('%Y-%m-%d')}"
+        )
 
+    # This is shared between MLB and NHL and overriden in NBA and NFL
+    def games_from_schedule(
+        self, schedule: dict, start: datetime.date, end: datetime.date
+    ) -> list[Game]:
+        """The games in a schedule payload that have started, the URL already limits it to start through end."""
         games: list[Game] = []
-        for d in dates:
+        for d in schedule["dates"]:
             for g in d["games"]:
                 abstract_game_state = g["status"]["abstractGameState"]
                 # Rainout is abstract_game_state == "Final" and detailed_state == "Postponed"
@@ -108,6 +158,21 @@ class AbstractSportsClient(ABC):
                     )
         return games
 
+    # This is shared between MLB and NHL and overriden in NBA and NFL
+    def get_game_windows(
+        self, start: datetime.date, end: datetime.date
+    ) -> list[GameWindow]:
+        dates = http_transport.get(self.schedule_url(start, end)).json()["dates"]
+        return [self._game_window(g["gameDate"]) for d in dates for g in d["games"]]
+
+    def _game_window(self, start_time: str) -> GameWindow:
+        """Window for a game starting at an ISO time like 2023-03-30T17:05:00Z or 2023-09-08T00:20Z."""
+        start = datetime.datetime.fromisoformat(
+            start_time.replace("Z", "+00:00")
+        ).timestamp()
+        # Start a little early in case the start time moves up
+        return GameWindow(start=start - 30 * 60, end=start + self.max_game_hours * 3600)
+
     @abstractmethod
     def get_player_picture(self, player_id: int) -> bytes:
         pass
@@ -117,10 +182,117 @@ class AbstractSportsClient(ABC):
         pass
 
     @abstractmethod
+    def play_by_play_url(self, game_id: str) -> str:
+        pass
+
     async def get_tweetable_plays(
         self, games: list[Game], known_plays: KnownPlays
     ) -> list[TweetablePlay]:
         """Find any new plays that could be Tweetable, depending on the State."""
+        from clients.parse_pool import get_parse_pool
+
+        feeds = await self._fetch_feeds(games)
+        parse_pool = get_parse_pool()
+        if parse_pool and parse_pool.wants(games):
+            tweetable_plays = await parse_pool.parse(self, games, feeds, known_plays)
+        else:
+            tweetable_plays = self._parse_feeds(games, feeds, known_plays)
+        # What each sport sorts its plays by. Stable, so NFL keeps the feed order.
+        tweetable_plays.sort(key=lambda p: (p.end_time, p.tiebreaker))
+        tweetable_plays = self.hold_plays(tweetable_plays, games)
+        self.deferred_plays.update(games, tweetable_plays, self.deferrals.take())
+        return tweetable_plays
+
+    def hold_plays(
+        self, plays: list[TweetablePlay], games: list[Game]
+    ) -> list[TweetablePlay]:
+        """The plays to tweet now, the rest should be deferred. Overriden in NHL."""
+        return plays
+
+    def _parse_feeds(
+        self,
+        games: list[Game],
+        feeds: dict[str, FetchResult],
+        known_plays: KnownPlays,
+    ) -> list[TweetablePlay]:
+        tweetable_plays: list[TweetablePlay] = []
+        for g in games:
+            # Decode one feed at a time and drop it once its plays are out. The decoded
+            # feeds of a big slate are several times the size of the responses.
+            result = feeds[g.game_id]
+            if not result.is_json:
+                # Usually an error page, the next fetch tends to be fine
+                self.deferrals.defer(g.game_id, "", FEED_NOT_JSON)
+                continue
+            g.payload = json.loads(result.body)
+            try:
+                tweetable_plays.extend(self.parse_tweetable_plays([g], known_plays))
+                if self.active_players is not None:
+                    self.active_players.update(self.players_in_feed(g))
+            finally:
+                g.payload = None
+        return tweetable_plays
+
+    def players_in_feed(self, game: Game) -> list[tuple[int, str]]:
+        """(player id, name as plays have it) of each appearance in the game's payload."""
+        return []
+
+    def worker_context(self, games: list[Game]) -> dict:
+        """Attributes to set on a parse worker's client, so parsing there needs no network."""
+        return {}
+
+    def finish_pool_plays(self, plays: list[TweetablePlay]) -> list[TweetablePlay]:
+        """Whatever parse_tweetable_plays would have looked up, for plays from a parse worker."""
+        return plays
+
+    async def fetch_play_by_play(self, games: list[Game]) -> None:
+        """Set the payload of each game, left as None if the feed isn't JSON."""
+        feeds = await self._fetch_feeds(games)
+        for g in games:
+            result = feeds[g.game_id]
+            if result.is_json:
+                g.payload = json.loads(result.body)
+
+    async def _fetch_feeds(self, games: list[Game]) -> dict[str, FetchResult]:
+        """
+        The response for each game id, archived as it is.
+
+        Games with deferred plays are fetched first, then live games.
+        """
+        from clients.fetch_scheduler import (
+            PRIORITY_DEFERRED,
+            PRIORITY_FINISHED,
+            PRIORITY_LIVE,
+        )
+
+        deferred_game_ids = self.deferred_plays.game_ids()
+        priorities = {
+            g.game_id: PRIORITY_DEFERRED
+            if g.game_id in deferred_game_ids
+            else PRIORITY_FINISHED
+            if g.is_complete
+            else PRIORITY_LIVE
+            for g in games
+        }
+        # Sorted too, since the first requests go out before anything has to wait
+        games = sorted(games, key=lambda g: priorities[g.game_id])
+        results = await asyncio.gather(
+            *[
+                self.fetch_scheduler.fetch(
+                    self.play_by_play_url(g.game_id), priority=priorities[g.game_id]
+                )
+                for g in games
+            ]
+        )
+        for g, result in zip(games, results):
+            self.archive_payload("play_by_play", g.game_id, result.body)
+        return {g.game_id: result for g, result in zip(games, results)}
+
+    @abstractmethod
+    def parse_tweetable_plays(
+        self, games: list[Game], known_plays: KnownPlays
+    ) -> list[TweetablePlay]:
+        """Find the new plays in the payloads from fetch_play_by_play. No network calls for MLB and NHL."""
         pass
 
     # For NBA and NFL
@@ -138,20 +310,8 @@ class AbstractSportsClient(ABC):
         else:
             return f"{period - 4}OT"
 
-    async def gather_with_concurrency(self, session, *tasks):
-        semaphore = asyncio.Semaphore(40)
-
-        async def sem_task(task):
-            async with semaphore:
-                return await task
-
-        await asyncio.gather(*(sem_task(task) for task in tasks))
-        await session.close()
-
-    async def get_async(self, url, session, g: Game):
-        async with session.get(url) as response:
-            try:
-                obj = await response.json()
-                g.payload = obj
-            except (ContentTypeError):
-                pass
+    def archive_payload(self, kind: str, game_id: str, body: bytes) -> None:
+        """Keep the raw response if PAYLOAD_ARCHIVE_DIR is set. Written in the background."""
+        archive = get_payload_archive()
+        if archive:
+            archive.append(self.sport, kind, game_id, body)
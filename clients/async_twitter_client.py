@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlencode, urlsplit
+
+from clients import deadline
+from clients.http_transport import BACKOFF_SECONDS, DEFAULT_RETRIES, RETRY_STATUSES
+from my_types import TwitterCredentials
+
+if TYPE_CHECKING:
+    import aiohttp
+
+API_URL = "https://api.twitter.com/1.1"
+UPLOAD_URL = "https://upload.twitter.com/1.1"
+# Per Twitter call, and never past the run's deadline
+REQUEST_TIMEOUT_SECONDS = 30
+CHUNK_BYTES = 1024 * 1024
+MAX_PROCESSING_CHECKS = 10
+
+
+class TwitterApiError(Exception):
+    def __init__(self, status: int, body: str) -> None:
+        super().__init__(f"Twitter returned {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0  # Connection errors, timeouts and error statuses
+    retries: int = 0
+    bytes_sent: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def summary(self) -> str:
+        if len(self.latencies) > 1:
+            p50, p95 = (
+                statistics.quantiles(self.latencies, n=100)[i] for i in (49, 94)
+            )
+        else:
+            p50 = p95 = self.latencies[0] if self.latencies else 0.0
+        return (
+            f"{self.requests} requests, {self.errors} errors, {self.retries} retries, "
+            f"{self.bytes_sent / 1024:.0f} KiB sent, p50 {p50 * 1000:.0f}ms, "
+            f"p95 {p95 * 1000:.0f}ms"
+        )
+
+
+class AsyncTwitterClient:
+    """
+    Posts to the Twitter v1.1 API from the event loop, signing each request with OAuth 1.0a.
+
+    Requests go over the session it is given, normally the one the sports client fetches
+    feeds with, so connections stay alive between tweets. Media uploads are retried with
+    jittered backoff on connection errors and retryable statuses, since media nobody tweets
+    just expires. A status is only retried when Twitter asks us to wait, or when we couldn't
+    connect at all, so a tweet that may have gone out is never posted twice.
+    """
+
+    def __init__(
+        self,
+        credentials: TwitterCredentials,
+        session: aiohttp.ClientSession,
+        api_url: str = API_URL,
+        upload_url: str = UPLOAD_URL,
+        retries: int = DEFAULT_RETRIES,
+    ) -> None:
+        from oauthlib.oauth1 import Client  # type: ignore
+
+        self.oauth = Client(
+            credentials.consumer_key,
+            client_secret=credentials.consumer_secret,
+            resource_owner_key=credentials.access_token,
+            resource_owner_secret=credentials.access_token_secret,
+        )
+        self.session = session
+        self.api_url = api_url
+        self.upload_url = upload_url
+        self.retries = retries
+        self.stats: dict[str, EndpointStats] = {}
+
+    async def media_upload(
+        self, media: bytes, filename: str, chunked: bool = False
+    ) -> int:
+        """Upload an image for a tweet. Returns its media id."""
+        if not chunked:
+            response = await self._request(
+                "POST",
+                f"{self.upload_url}/media/upload.json",
+                files={"media": (filename, media)},
+                idempotent=True,
+            )
+            return int(response["media_id_string"])
+        return await self._chunked_upload(media, filename)
+
+    async def update_status(
+        self,
+        status: str,
+        media_ids: list[int] | None = None,
+        in_reply_to: int | None = None,
+    ) -> int:
+        """Tweet status, as a reply to in_reply_to if given. Returns the new tweet id."""
+        data = {"status": status}
+        if media_ids:
+            data["media_ids"] = ",".join(str(m) for m in media_ids)
+        if in_reply_to:
+            data["in_reply_to_status_id"] = str(in_reply_to)
+        response = await self._request(
+            "POST", f"{self.api_url}/statuses/update.json", data=data
+        )
+        return int(response["id_str"])
+
+    def report(self) -> str:
+        return "\n".join(
+            f"{name}: {s.summary()}" for name, s in sorted(self.stats.items())
+        )
+
+    async def _chunked_upload(self, media: bytes, filename: str) -> int:
+        url = f"{self.upload_url}/media/upload.json"
+        init = await self._request(
+            "POST",
+            url,
+            data={
+                "command": "INIT",
+                "total_bytes": str(len(media)),
+                "media_type": _media_type(filename),
+                "media_category": "tweet_image",
+            },
+            idempotent=True,
+        )
+        media_id = init["media_id_string"]
+        for segment_index, start in enumerate(range(0, len(media), CHUNK_BYTES)):
+            end = start + CHUNK_BYTES
+            await self._request(
+                "POST",
+                url,
+                data={
+                    "command": "APPEND",
+                    "media_id": media_id,
+                    "segment_index": str(segment_index),
+                },
+                files={"media": (filename, media[start:end])},
+                idempotent=True,
+            )
+        response = await self._request(
+            "POST",
+            url,
+            data={"command": "FINALIZE", "media_id": media_id},
+            idempotent=True,
+        )
+        for _ in range(MAX_PROCESSING_CHECKS):
+            processing_info = response.get("processing_info")
+            if not processing_info or processing_info["state"] == "succeeded":
+                return int(media_id)
+            if processing_info["state"] == "failed":
+                raise TwitterApiError(200, f"Processing failed: {processing_info}")
+            await asyncio.sleep(
+                deadline.clamp(processing_info.get("check_after_secs", 1))
+            )
+            response = await self._request(
+                "GET",
+                url,
+                params={"command": "STATUS", "media_id": media_id},
+                idempotent=True,
+            )
+        raise TwitterApiError(200, f"Media {media_id} is still processing")
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        data: dict[str, str] | None = None,
+        files: dict[str, tuple[str, bytes]] | None = None,
+        params: dict[str, str] | None = None,
+        idempotent: bool = False,
+    ) -> dict[str, Any]:
+        import aiohttp
+
+        endpoint = urlsplit(url).path
+        if data and data.get("command"):
+            endpoint = f"{endpoint} {data['command']}"
+        stats = self.stats.setdefault(endpoint, EndpointStats())
+        if params:
+            url = f"{url}?{urlencode(params)}"
+
+        for attempt in range(self.retries + 1):
+            timeout = aiohttp.ClientTimeout(
+                total=deadline.clamp(REQUEST_TIMEOUT_SECONDS)
+            )
+            body, headers, size = self._signed_body(method, url, data, files)
+            stats.requests += 1
+            started = time.perf_counter()
+            try:
+                async with self.session.request(
+                    method, url, data=body, headers=headers, timeout=timeout
+                ) as response:
+                    text = await response.text()
+            except aiohttp.ClientConnectorError:
+                # Nothing was sent, so even a status can be tried again
+                stats.errors += 1
+                if attempt == self.retries:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                stats.errors += 1
+                if not idempotent or attempt == self.retries:
+                    raise
+            else:
+                stats.latencies.append(time.perf_counter() - started)
+                stats.bytes_sent += size
+                if response.status < 400:
+                    return json.loads(text) if text else {}
+                stats.errors += 1
+                retryable = response.status == 429 or (
+                    idempotent and response.status in RETRY_STATUSES
+                )
+                if not retryable or attempt == self.retries:
+                    raise TwitterApiError(response.status, text)
+            stats.retries += 1
+            backoff = BACKOFF_SECONDS * 2**attempt
+            await asyncio.sleep(deadline.clamp(backoff + random.uniform(0, backoff)))
+        raise AssertionError("unreachable")
+
+    def _signed_body(
+        self,
+        method: str,
+        url: str,
+        data: dict[str, str] | None,
+        files: dict[str, tuple[str, bytes]] | None,
+    ) -> tuple[Any, dict[str, str], int]:
+        """The body to send, its headers with a fresh OAuth signature, and its size."""
+        import aiohttp
+
+        if files:
+            # Multipart fields aren't part of the signature
+            _, headers, _ = self.oauth.sign(url, http_method=method)
+            form = aiohttp.FormData()
+            size = 0
+            for name, value in (data or {}).items():
+                form.add_field(name, value)
+                size += len(value)
+            for name, (filename, content) in files.items():
+                size += len(content)
+                form.add_field(
+                    name,
+                    content,
+                    filename=filename,
+                    content_type="application/octet-stream",
+                )
+            return form, headers, size
+        if data:
+            body = urlencode(data)
+            _, headers, _ = self.oauth.sign(
+                url,
+                http_method=method,
+                body=body,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            )
+            return body, headers, len(body)
+        _, headers, _ = self.oauth.sign(url, http_method=method)
+        return None, headers, 0
+
+
+def _media_type(filename: str) -> str:
+    return "image/png" if filename.endswith(".png") else "image/jpeg"
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+
+from clients.local_state import local_state_path
+from my_types import Game
+
+# Catch games completed by another instance, and recover if the local file was lost
+RECONCILE_SECONDS = 6 * 60 * 60
+
+
+class CompletedGamesIndex:
+    """
+    The completed game ids of one sport, kept on local disk.
+
+    Completed games never become active again, so once a game is in here we can skip it
+    without asking the database. Written through on every set_completed_games, and
+    replaced by what the database says every RECONCILE_SECONDS.
+    """
+
+    def __init__(self, sport: str) -> None:
+        self.sport = sport
+        self.path = local_state_path(f"completed_games_{sport}.json")
+        self.reconciled_at: float | None = None
+        self.game_ids: set[str] = set()
+        self._load()
+
+    def needs_reconcile(self, now: float | None = None) -> bool:
+        if self.reconciled_at is None:
+            return True
+        now = time.time() if now is None else now
+        return now - self.reconciled_at > RECONCILE_SECONDS
+
+    def active_games(self, games: list[Game]) -> list[Game]:
+        return [g for g in games if g.game_id not in self.game_ids]
+
+    def reconcile(self, completed_game_ids: set[str]) -> None:
+        """Replace the index with the database's answer for the games we are tracking now."""
+        self.game_ids = completed_game_ids
+        self.reconciled_at = time.time()
+        self._save()
+
+    def add(self, games: list[Game]) -> None:
+        self.game_ids.update(g.game_id for g in games)
+        self._save()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.reconciled_at = data["reconciled_at"]
+        self.game_ids = set(data["game_ids"])
+
+    def _save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "reconciled_at": self.reconciled_at,
+                    "game_ids": sorted(self.game_ids),
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import time
+from typing import Iterator
+
+# When this run has to be done by, in time.monotonic() seconds. None means no deadline.
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+# What posting a tweet can take, to decide if there is still time to start one
+MATCHED_TWEET_SECONDS = 40  # Rendering the scorecard is most of it
+UNMATCHED_TWEET_SECONDS = 5
+
+
+class DeadlineExceeded(Exception):
+    """Not enough time left in this run. Whatever wasn't started is left for the next run."""
+
+
+@contextlib.contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Everything under this, including tasks started by asyncio.run, shares the deadline.
+
+    A nested deadline can only make it earlier.
+    """
+    current = _deadline.get()
+    new = time.monotonic() + seconds
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left, or None without a deadline."""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def check(needed: float = 0.0, what: str = "") -> None:
+    """Raise DeadlineExceeded unless there are at least needed seconds left."""
+    left = remaining()
+    if left is not None and left < needed:
+        raise DeadlineExceeded(
+            f"{left:.1f}s left, {what or 'the next step'} needs {needed:.1f}s"
+        )
+
+
+def clamp(timeout: float) -> float:
+    """A timeout that ends by the deadline. Raises DeadlineExceeded if it has passed."""
+    check(what="any call")
+    left = remaining()
+    return timeout if left is None else min(timeout, left)
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+
+from clients.local_state import local_state_path
+from my_types import Game, Sport, TweetablePlay
+
+# Why a play was skipped, and how long until it is worth fetching again
+FEED_NOT_JSON = "feed_not_json"  # The whole game, play_id is empty
+NBA_PLAYER_LOOKUP = "nba_player_lookup"
+NFL_PASSER_ONLY = "nfl_passer_only"  # The text only has the quarterback so far
+NFL_SCORER_NOT_ON_ROSTER = "nfl_scorer_not_on_roster"  # Likely just signed
+NHL_UNSETTLED = "nhl_unsettled"  # The scorer may still change
+RETRY_SECONDS = {
+    FEED_NOT_JSON: 5,
+    NBA_PLAYER_LOOKUP: 5,
+    NFL_PASSER_ONLY: 30,
+    NFL_SCORER_NOT_ON_ROSTER: 30,
+    NHL_UNSETTLED: 30,
+}
+# Polls of a play still deferred for the same reason before we give up on it. A play
+# that never resolves would otherwise keep its game active and every run retrying.
+MAX_ATTEMPTS = {
+    FEED_NOT_JSON: 30,
+    NBA_PLAYER_LOOKUP: 30,
+    NFL_PASSER_ONLY: 30,
+    NFL_SCORER_NOT_ON_ROSTER: 10,
+    NHL_UNSETTLED: 10,
+}
+# Re-fetch within the same run only if the first retry is this close
+FAST_RETRY_MAX_SECONDS = 30
+# Forget plays of games we stopped polling, and give up on plays deferred for this long
+FORGET_SECONDS = 24 * 60 * 60
+
+
+@dataclass
+class DeferredPlay:
+    game_id: str
+    play_id: str
+    reason: str
+    first_deferred: float  # Epoch seconds
+    retry_at: float
+    attempts: int = 1
+
+
+@dataclass
+class ReasonStats:
+    deferred: int = 0
+    resolved: int = 0
+    unresolved: int = 0  # Given up on after MAX_ATTEMPTS or FORGET_SECONDS
+    # From the first deferral until the play was found tweetable
+    total_delay_seconds: float = 0.0
+    max_delay_seconds: float = 0.0
+
+
+@dataclass
+class Deferral:
+    game_id: str
+    play_id: str
+    reason: str
+
+
+class DeferredPlays:
+    """
+    The plays of one sport we skipped for now, why, and when to look at them again.
+
+    Parsers and the tweet loop defer a play instead of silently leaving it for the next poll.
+    The run can then fetch those games again before it ends (see due_within), and the next
+    poll fetches them first. A deferred play is resolved once it shows up as tweetable, and
+    the time that took is kept per reason. One deferred too often or for too long is given
+    up on, and not deferred again. Kept on local disk, losing it is safe.
+    """
+
+    def __init__(self, sport: Sport, dry_run: bool = False) -> None:
+        self.sport = sport
+        self.dry_run = dry_run
+        self.path = local_state_path(f"deferred_plays_{sport}.json")
+        # game_id:play_id to play
+        self.plays: dict[str, DeferredPlay] = {}
+        self.stats: dict[str, ReasonStats] = {}
+        # game_id:play_id to when we gave up on it
+        self.given_up: dict[str, float] = {}
+        self._load()
+
+    def game_ids(self) -> set[str]:
+        return {p.game_id for p in self.plays.values()}
+
+    def due_within(self, seconds: float, now: float | None = None) -> float | None:
+        """Seconds until the first retry, if it is at most seconds away."""
+        if not self.plays:
+            return None
+        now = time.time() if now is None else now
+        wait = max(0.0, min(p.retry_at for p in self.plays.values()) - now)
+        return wait if wait <= seconds else None
+
+    def add(self, deferrals: list[Deferral], now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        for d in deferrals:
+            key = f"{d.game_id}:{d.play_id}"
+            existing = self.plays.get(key)
+            if existing:
+                existing.attempts += 1
+                existing.reason = d.reason
+                existing.retry_at = now + RETRY_SECONDS[d.reason]
+                continue
+            self.plays[key] = DeferredPlay(
+                d.game_id, d.play_id, d.reason, now, now + RETRY_SECONDS[d.reason]
+            )
+            self.stats.setdefault(d.reason, ReasonStats()).deferred += 1
+            print(f"Deferred {self.sport} {key}: {d.reason}")
+        self._save()
+
+    def update(
+        self,
+        games: list[Game],
+        tweetable_plays: list[TweetablePlay],
+        deferrals: list[Deferral],
+        now: float | None = None,
+    ) -> None:
+        """After a poll of games: resolve what is tweetable now, and record the new deferrals."""
+        now = time.time() if now is None else now
+        found = {f"{p.game_id}:{p.play_id}" for p in tweetable_plays}
+        still_deferred = {f"{d.game_id}:{d.play_id}" for d in deferrals}
+        polled = {g.game_id for g in games}
+        for key, p in list(self.plays.items()):
+            if key in found or (key.endswith(":") and p.game_id in polled):
+                # Tweetable now, or the game's feed came back
+                if key not in still_deferred:
+                    self._resolve(key, now)
+            elif key in still_deferred:
+                if (
+                    p.attempts >= MAX_ATTEMPTS[p.reason]
+                    or now - p.first_deferred > FORGET_SECONDS
+                ):
+                    self._give_up(key, now)
+            elif p.game_id in polled or now - p.first_deferred > FORGET_SECONDS:
+                # Already known, or gone from the feed
+                del self.plays[key]
+        for key, given_up_at in list(self.given_up.items()):
+            if now - given_up_at > FORGET_SECONDS:
+                del self.given_up[key]
+        self.add(
+            [d for d in deferrals if f"{d.game_id}:{d.play_id}" not in self.given_up],
+            now,
+        )
+
+    def report(self) -> str:
+        lines = [
+            f"{len(self.plays)} {self.sport} plays deferred"
+            + "".join(f", {k} {p.reason}" for k, p in sorted(self.plays.items()))
+        ]
+        for reason, s in sorted(self.stats.items()):
+            average = s.total_delay_seconds / s.resolved if s.resolved else 0.0
+            lines.append(
+                f"  {reason}: {s.deferred} deferred, {s.resolved} resolved, "
+                f"{s.unresolved} unresolved, "
+                f"time to tweetable avg {average:.0f}s max {s.max_delay_seconds:.0f}s"
+            )
+        return "\n".join(lines)
+
+    def _resolve(self, key: str, now: float) -> None:
+        p = self.plays.pop(key)
+        delay = now - p.first_deferred
+        stats = self.stats.setdefault(p.reason, ReasonStats())
+        stats.resolved += 1
+        stats.total_delay_seconds += delay
+        stats.max_delay_seconds = max(stats.max_delay_seconds, delay)
+        print(f"Resolved {self.sport} {key} ({p.reason}) after {delay:.0f}s")
+
+    def _give_up(self, key: str, now: float) -> None:
+        p = self.plays.pop(key)
+        self.given_up[key] = now
+        self.stats.setdefault(p.reason, ReasonStats()).unresolved += 1
+        print(
+            f"Gave up on {self.sport} {key} ({p.reason}) after {p.attempts} attempts "
+            f"in {now - p.first_deferred:.0f}s"
+        )
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.plays = {k: DeferredPlay(**p) for k, p in data["plays"].items()}
+        self.stats = {k: ReasonStats(**s) for k, s in data["stats"].items()}
+        # Files saved before we gave up on plays don't have it
+        self.given_up = data.get("given_up", {})
+
+    def _save(self) -> None:
+        if self.dry_run:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "plays": {k: asdict(p) for k, p in self.plays.items()},
+                    "stats": {k: asdict(s) for k, s in self.stats.items()},
+                    "given_up": self.given_up,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class DeferralCollector:
+    """What one parse deferred. Picklable, so parse workers can send theirs back."""
+
+    deferrals: list[Deferral] = field(default_factory=list)
+
+    def defer(self, game_id: str, play_id: str, reason: str) -> None:
+        self.deferrals.append(Deferral(game_id, play_id, reason))
+
+    def take(self) -> list[Deferral]:
+        deferrals, self.deferrals = self.deferrals, []
+        return deferrals
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from clients import deadline
+
+if TYPE_CHECKING:
+    import aiohttp
+
+INITIAL_LIMIT = 8
+MIN_LIMIT = 1
+MAX_LIMIT = 64
+# Slower than this many times the best recent latency means the host is queueing us
+LATENCY_TOLERANCE = 2.0
+BACKOFF_FACTOR = 0.7  # On a slow response
+ERROR_BACKOFF_FACTOR = 0.5  # On an error or a 429/5xx
+LATENCY_WINDOW = 100
+FETCH_TIMEOUT_SECONDS = 30
+
+# Lower runs first
+PRIORITY_DEFERRED = -1  # Games with plays we skipped last time, see deferred_plays.py
+PRIORITY_LIVE = 0
+PRIORITY_FINISHED = 1
+
+
+@dataclass
+class FetchResult:
+    status: int
+    content_type: str
+    body: bytes
+
+    @property
+    def is_json(self) -> bool:
+        # What aiohttp's response.json() accepts
+        return self.content_type == "application/json" or (
+            self.content_type.startswith("application/")
+            and self.content_type.endswith("+json")
+        )
+
+
+@dataclass
+class HostLimiter:
+    """Additive increase, multiplicative decrease of how many requests one host gets at once."""
+
+    limit: float = INITIAL_LIMIT
+    in_flight: int = 0
+    requests: int = 0
+    errors: int = 0
+    bytes_received: int = 0
+    first_started: float | None = None
+    last_finished: float | None = None
+    latencies: list[float] = field(default_factory=list)
+    _recent: deque = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+    _last_decrease: float = 0.0
+    # (priority, order, future) of requests waiting for a slot
+    _waiting: list = field(default_factory=list)
+
+    @property
+    def has_room(self) -> bool:
+        return self.in_flight < max(MIN_LIMIT, int(self.limit))
+
+    def on_success(self, latency: float, size: int, now: float) -> None:
+        self._finish(latency, now)
+        self.bytes_received += size
+        best = min(self._recent)
+        if latency > LATENCY_TOLERANCE * best and now - self._last_decrease > best:
+            # At most once per round trip, so one slow burst doesn't collapse the limit
+            self._decrease(BACKOFF_FACTOR, now)
+        else:
+            self.limit = min(MAX_LIMIT, self.limit + 1 / self.limit)
+
+    def on_error(self, latency: float, now: float) -> None:
+        self._finish(latency, now)
+        self.errors += 1
+        self._decrease(ERROR_BACKOFF_FACTOR, now)
+
+    def _finish(self, latency: float, now: float) -> None:
+        self.requests += 1
+        self.latencies.append(latency)
+        self._recent.append(latency)
+        self.last_finished = now
+
+    def _decrease(self, factor: float, now: float) -> None:
+        self.limit = max(MIN_LIMIT, self.limit * factor)
+        self._last_decrease = now
+
+    def summary(self) -> str:
+        elapsed = (self.last_finished or 0) - (self.first_started or 0)
+        throughput = self.requests / elapsed if elapsed > 0 else 0.0
+        latencies = sorted(self.latencies)
+        if len(latencies) > 1:
+            p50, p95, p99 = (
+                statistics.quantiles(latencies, n=100)[i] for i in (49, 94, 98)
+            )
+        else:
+            p50 = p95 = p99 = latencies[0] if latencies else 0.0
+        return (
+            f"{self.requests} requests, {self.errors} errors, {throughput:.1f}/s, "
+            f"p50 {p50 * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms, p99 {p99 * 1000:.0f}ms, "
+            f"{self.bytes_received / 1024:.0f} KiB, limit {self.limit:.1f}"
+        )
+
+
+class FetchScheduler:
+    """
+    Fetches feeds with a concurrency limit per host that adapts to how the host responds.
+
+    The limit grows by about one per round trip while latency stays near the best we have
+    seen, and shrinks when responses slow down or fail. Requests waiting for a slot go out
+    in priority order. The session lives until close(), so one scheduler serves every fetch
+    of a run:
+
+        async with FetchScheduler() as scheduler:
+            result = await scheduler.fetch(url, priority=PRIORITY_LIVE)
+    """
+
+    def __init__(self) -> None:
+        self.hosts: dict[str, HostLimiter] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._order = itertools.count()
+
+    async def __aenter__(self) -> FetchScheduler:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # aiohttp is only imported once a run actually fetches feeds
+        if self._session is None:
+            import aiohttp
+
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(ttl_dns_cache=300, limit=0)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch(self, url: str, priority: int = PRIORITY_LIVE) -> FetchResult:
+        import aiohttp
+
+        host = self.hosts.setdefault(urlsplit(url).netloc, HostLimiter())
+        await self._acquire(host, priority)
+        started = time.perf_counter()
+        if host.first_started is None:
+            host.first_started = started
+        try:
+            # No later than the run's deadline, checked after waiting for the slot
+            timeout = aiohttp.ClientTimeout(total=deadline.clamp(FETCH_TIMEOUT_SECONDS))
+            async with self.session.get(url, timeout=timeout) as response:
+                body = await response.read()
+        except Exception as e:
+            host.on_error(time.perf_counter() - started, time.perf_counter())
+            self._release(host)
+            if isinstance(e, asyncio.TimeoutError):
+                deadline.check(what=f"fetching {url}")
+            raise
+        finished = time.perf_counter()
+        if response.status == 429 or response.status >= 500:
+            host.on_error(finished - started, finished)
+        else:
+            host.on_success(finished - started, len(body), finished)
+        # After the limit moved, so the next request goes out under the new limit
+        self._release(host)
+        return FetchResult(response.status, response.content_type, body)
+
+    def report(self) -> str:
+        return "\n".join(
+            f"{name}: {host.summary()}" for name, host in sorted(self.hosts.items())
+        )
+
+    async def _acquire(self, host: HostLimiter, priority: int) -> None:
+        if host.has_room and not host._waiting:
+            host.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(host._waiting, (priority, next(self._order), waiter))
+        # _release hands over the slot, in_flight is already counted for us
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(host)
+            raise
+
+    def _release(self, host: HostLimiter) -> None:
+        host.in_flight -= 1
+        while host._waiting and host.has_room:
+            _, _, waiter = heapq.heappop(host._waiting)
+            if not waiter.done():
+                host.in_flight += 1
+                waiter.set_result(None)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+
+from clients.local_state import local_state_path
+from my_types import Game, TweetablePlay
+
+# A goal is released once we saw the same scorer and description this many polls in a row
+REQUIRED_OBSERVATIONS = 2
+# Or once it is this old, even if we only saw it once
+GRACE_SECONDS = 150
+# The fixed delay this replaces, to measure what we saved
+FIXED_DELAY_SECONDS = 5 * 60
+# Forget goals of games we stopped polling
+FORGET_SECONDS = 24 * 60 * 60
+
+
+@dataclass
+class ProvisionalGoal:
+    scorer_id: int
+    scorer_name: str
+    first_seen: float  # Epoch seconds, reset when the scorer or description changes
+    observations: int = 0
+    description: str = ""  # Like Jack Hughes (10) Wrist Shot, assists: none
+    corrected: bool = False  # The grace window then starts at first_seen, not the goal
+
+
+@dataclass
+class GoalStats:
+    released: int = 0
+    released_early: int = 0  # Before the fixed delay would have let them out
+    seconds_saved: float = 0.0
+    corrections: int = 0  # Scorer or description changed before we tweeted
+
+
+class GoalTracker:
+    """
+    Holds each new NHL goal until its scorer has settled, instead of a fixed 5 minutes.
+
+    The scorer can change for a minute or two after a goal. Every poll records who the feed
+    says scored each goal we haven't tweeted yet, and how it describes it. A goal is released
+    once REQUIRED_OBSERVATIONS polls in a row agree, or once it is GRACE_SECONDS old. A
+    different scorer or description starts the count over, and the grace window with it. Kept on local disk, losing it only means waiting for the grace window.
+    """
+
+    def __init__(self, dry_run: bool = False) -> None:
+        self.dry_run = dry_run
+        self.path = local_state_path("provisional_goals_NHL.json")
+        # game_id:play_id to goal
+        self.goals: dict[str, ProvisionalGoal] = {}
+        self.stats = GoalStats()
+        self._load()
+
+    def release(
+        self, plays: list[TweetablePlay], games: list[Game], now: float | None = None
+    ) -> list[TweetablePlay]:
+        """The plays whose scorer has settled, in order. Call once per poll of games."""
+        now = time.time() if now is None else now
+        run_stats = GoalStats()
+        seen: set[str] = set()
+        released: list[TweetablePlay] = []
+        for p in plays:
+            key = f"{p.game_id}:{p.play_id}"
+            seen.add(key)
+            goal = self.goals.get(key)
+            if goal and (goal.scorer_id, goal.scorer_name) != (
+                p.player_id,
+                p.player_name,
+            ):
+                print(
+                    f"Scorer of {key} changed from {goal.scorer_name} to {p.player_name}"
+                )
+                run_stats.corrections += 1
+                goal = None
+            elif goal and goal.description != p.description:
+                # Like an assist added, which can come before the scorer changes
+                print(
+                    f"Description of {key} changed from {goal.description!r} to {p.description!r}"
+                )
+                run_stats.corrections += 1
+                goal = None
+            if goal is None:
+                goal = ProvisionalGoal(
+                    p.player_id,
+                    p.player_name,
+                    first_seen=now,
+                    description=p.description,
+                    corrected=key in self.goals,
+                )
+                self.goals[key] = goal
+            goal.observations += 1
+
+            age = now - _goal_time(p)
+            # A correction seen long after the goal still waits for a poll that agrees
+            settling = now - goal.first_seen if goal.corrected else age
+            if goal.observations >= REQUIRED_OBSERVATIONS or settling >= GRACE_SECONDS:
+                released.append(p)
+                del self.goals[key]
+                run_stats.released += 1
+                if age < FIXED_DELAY_SECONDS:
+                    run_stats.released_early += 1
+                    run_stats.seconds_saved += FIXED_DELAY_SECONDS - age
+
+        # Goals no longer in their game's feed were overturned
+        polled = {g.game_id for g in games}
+        for key, goal in list(self.goals.items()):
+            game_id = key.split(":")[0]
+            if (game_id in polled and key not in seen) or (
+                now - goal.first_seen > FORGET_SECONDS
+            ):
+                del self.goals[key]
+
+        self._add_stats(run_stats)
+        if plays:
+            print(
+                f"Released {run_stats.released} of {len(plays)} new goals, "
+                f"{run_stats.released_early} early, saving {run_stats.seconds_saved:.0f}s in total. "
+                f"{len(self.goals)} still settling"
+            )
+        if not self.dry_run:
+            self._save()
+        return released
+
+    def _add_stats(self, run_stats: GoalStats) -> None:
+        self.stats.released += run_stats.released
+        self.stats.released_early += run_stats.released_early
+        self.stats.seconds_saved += run_stats.seconds_saved
+        self.stats.corrections += run_stats.corrections
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.goals = {k: ProvisionalGoal(**g) for k, g in data["goals"].items()}
+        self.stats = GoalStats(**data["stats"])
+
+    def _save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "goals": {k: asdict(g) for k, g in self.goals.items()},
+                    "stats": asdict(self.stats),
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
+
+
+def _goal_time(play: TweetablePlay) -> float:
+    # Like 2023-01-14T01:23:45Z
+    return (
+        datetime.datetime.strptime(play.end_time, "%Y-%m-%dT%H:%M:%SZ")
+        .replace(tzinfo=datetime.timezone.utc)
+        .timestamp()
+    )
@@ -2,15 +2,16 @@ from __future__ import annotations
 
 import json
 
-import requests
-from google.cloud import storage  # type: ignore
-
-from my_types import TweetablePlay
+from clients import http_transport
+from my_types import OutboxEntry, TweetablePlay
 
 
 class GoogleCloudStorageClient:
     @staticmethod
-    def store_latest_play(play: TweetablePlay | None) -> None:
+    def store_latest_play(play: TweetablePlay | OutboxEntry | None) -> None:
+        # Only needed when a play matches, so keep it off the import path of every run
+        from google.cloud import storage  # type: ignore
+
         storage_client = storage.Client()
         bucket_name = "greg-finley-public"
         bucket = storage_client.bucket(bucket_name)
@@ -28,7 +29,7 @@ class GoogleCloudStorageClient:
             existing_data_dicts = []
             extra_params = ""
 
-        new_plays_dict = requests.get(
+        new_plays_dict = http_transport.get(
             f"https://us-central1-greg-finley.cloudfunctions.net/alphabet-game-plays-api?matches_only=true&limit=0&lite=true{extra_params}"
         ).json()["data"]
 
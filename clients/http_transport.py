@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import bisect
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from clients import deadline
+
+# (connect, read) seconds. Generous on read, the schedule endpoints can be slow to build
+DEFAULT_TIMEOUT = (3.05, 20)
+DEFAULT_RETRIES = 2
+# Retries wait a random time up to BACKOFF_SECONDS * 2 ** attempt
+BACKOFF_SECONDS = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Upper bounds in seconds, the last bucket catches everything slower
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    errors: int = 0  # Connection errors, timeouts and retryable statuses
+    retries: int = 0
+    bytes_received: int = 0
+    latency_buckets: list[int] = field(
+        default_factory=lambda: [0] * len(LATENCY_BUCKETS)
+    )
+
+    def observe(self, seconds: float) -> None:
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def latency_quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        target = q * sum(self.latency_buckets)
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return 0.0
+
+
+class HttpTransport:
+    """
+    Every synchronous HTTP call goes through here.
+
+    Each host gets its own pooled session, so repeated calls to a host reuse the connection.
+    Requests get a default timeout, and idempotent ones are retried with jittered backoff on
+    connection errors and retryable statuses. Per host, we count requests, errors, retries
+    and bytes, and keep a latency histogram.
+    """
+
+    def __init__(
+        self,
+        timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff_seconds: float = BACKOFF_SECONDS,
+    ) -> None:
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.stats: dict[str, HostStats] = {}
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(
+        self, method: str, url: str, idempotent: bool | None = None, **kwargs
+    ) -> requests.Response:
+        """
+        Like requests.request. Pass idempotent=True to retry a POST that is safe to repeat.
+
+        Timeouts are cut short to end by the run's deadline, and DeadlineExceeded is raised
+        instead of starting a request or retry after it.
+        """
+        host = urlsplit(url).netloc
+        session, stats = self._host(host)
+        kwargs.setdefault("timeout", self.timeout)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retries = self.retries if idempotent else 0
+
+        for attempt in range(retries + 1):
+            if attempt:
+                stats.retries += 1
+                delay = random.uniform(0, self.backoff_seconds * 2**attempt)
+                deadline.check(delay, f"retrying {host}")
+                time.sleep(delay)
+            timeout = _by_deadline(kwargs["timeout"])
+            stats.requests += 1
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    method, url, **{**kwargs, "timeout": timeout}
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                stats.errors += 1
+                stats.observe(time.perf_counter() - started)
+                if attempt == retries:
+                    raise
+                continue
+            stats.observe(time.perf_counter() - started)
+            stats.bytes_received += len(response.content)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            stats.errors += 1
+            if attempt == retries:
+                return response
+        raise AssertionError("unreachable")
+
+    def report(self) -> str:
+        lines = []
+        for host, s in sorted(self.stats.items()):
+            lines.append(
+                f"{host}: {s.requests} requests, {s.errors} errors, {s.retries} retries, "
+                f"{s.bytes_received / 1024:.0f} KiB, p50 <= {s.latency_quantile(0.5)}s, "
+                f"p95 <= {s.latency_quantile(0.95)}s"
+            )
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+
+    def _host(self, host: str) -> tuple[requests.Session, HostStats]:
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+                self.stats[host] = HostStats()
+            return self._sessions[host], self.stats[host]
+
+
+def _by_deadline(timeout):
+    if timeout is None:
+        deadline.check(what="any call")
+        return deadline.remaining()
+    if isinstance(timeout, tuple):
+        return tuple(deadline.clamp(t) for t in timeout)
+    return deadline.clamp(timeout)
+
+
+_http_transport: HttpTransport | None = None
+
+
+def get_http_transport() -> HttpTransport:
+    """The transport shared by every client in this process."""
+    global _http_transport
+    if _http_transport is None:
+        _http_transport = HttpTransport()
+    return _http_transport
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return get_http_transport().get(url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return get_http_transport().post(url, **kwargs)
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import io
+import os
 
-import requests
-
+from clients import http_transport
 from my_types import ImageInput
 
 
@@ -13,6 +13,20 @@ class ImageClient:
         image_input: ImageInput,
         local_save_name: str | None = None,
     ) -> io.BytesIO:
+        # Only import Pillow if we draw scorecards ourselves
+        if os.environ.get("SCORECARD_RENDERER", "remote") == "local":
+            from clients.scorecard_renderer import get_scorecard_renderer
+
+            b = get_scorecard_renderer(image_input.sport).render(image_input)
+        else:
+            b = self._get_remote_image(image_input)
+
+        if local_save_name:
+            with open(local_save_name, "wb") as f:
+                f.write(b.getvalue())
+        return b
+
+    def _get_remote_image(self, image_input: ImageInput) -> io.BytesIO:
         # curl -m 70 -X POST 'https://us-central1-greg-finley.cloudfunctions.net/get_custom_scorecard?completed_at=1673587932&matching_letters=A%2CB%2CC&next_letter=D&player_id=8478403&player_name=Gregory+Finley&season_phrase=in+the+2022-23+season&sport=NHL&times_cycled=22&tweet_id=1613770857377136640' \
         # -H "Content-Type: application/json" \
         # -d '{}' --output screenshot-alphabet-custom.jpeg
@@ -29,17 +43,14 @@ class ImageClient:
             "times_cycled": image_input.times_cycled,
             "tweet_id": image_input.tweet_id,
         }
-        response = requests.post(
+        response = http_transport.post(
             "https://us-central1-greg-finley.cloudfunctions.net/get_custom_scorecard",
             params=query_params,
             json={},
+            # Rendering the scorecard is slow, but safe to repeat
+            timeout=(3.05, 70),
+            idempotent=True,
         )
-        image = response.content
-
-        if local_save_name:
-            with open(local_save_name, "wb") as f:
-                f.write(image)
-
-        b = io.BytesIO(image)
+        b = io.BytesIO(response.content)
         b.seek(0)
         return b
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+import os
+
+# Cloud Functions only lets us write to /tmp, and it survives between runs while the instance stays warm
+DEFAULT_LOCAL_STATE_DIR = "/tmp/mlb-alphabet-game"
+
+
+def local_state_path(file_name: str) -> str:
+    """Path for a file we keep between runs on this machine. Losing it must always be safe."""
+    state_dir = os.environ.get("LOCAL_STATE_DIR", DEFAULT_LOCAL_STATE_DIR)
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, file_name)
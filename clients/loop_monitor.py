@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import os
+import sys
+import sysconfig
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_THRESHOLD_MS = 100
+# How often the loop checks in, and how often the watchdog looks
+HEARTBEAT_SECONDS = 0.01
+
+_LIBRARY_PATHS = tuple(
+    {sysconfig.get_paths()["stdlib"], sysconfig.get_paths()["purelib"]}
+)
+
+
+@dataclass
+class CallSite:
+    """Where a stall happened: our innermost frame, and the library call it was waiting in."""
+
+    our_frame: str  # clients/nba_client.py:255 in _get_player_name
+    blocked_in: str  # ssl.py:1134 in read
+
+    def __str__(self) -> str:
+        return f"{self.our_frame} (blocked in {self.blocked_in})"
+
+
+@dataclass
+class SiteStats:
+    stalls: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+@dataclass
+class LoopMonitor:
+    """
+    Finds the code that blocks the event loop.
+
+    A coroutine on the loop checks in every HEARTBEAT_SECONDS. A watchdog thread samples the
+    loop thread's stack whenever a check-in is more than threshold_ms late, and the stall is
+    charged to the call site seen most often while it lasted. Costs nothing unless enabled
+    with LOOP_MONITOR=true.
+    """
+
+    threshold_ms: float = DEFAULT_THRESHOLD_MS
+    sites: dict[str, SiteStats] = field(default_factory=dict)
+    _last_beat: float = 0.0
+    _samples: list = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _stopped: threading.Event = field(default_factory=threading.Event)
+
+    @classmethod
+    def from_env(cls) -> LoopMonitor | None:
+        if os.environ.get("LOOP_MONITOR", "false").lower() != "true":
+            return None
+        return cls(
+            threshold_ms=float(os.environ.get("LOOP_STALL_MS", DEFAULT_THRESHOLD_MS))
+        )
+
+    async def watch(self, awaitable: Awaitable[T]) -> T:
+        """Await awaitable with the monitor running on the current loop."""
+        loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._last_beat = time.monotonic()
+        heartbeat = asyncio.ensure_future(self._heartbeat())
+        watchdog = threading.Thread(
+            target=self._watchdog, args=(loop_thread_id,), daemon=True
+        )
+        watchdog.start()
+        try:
+            return await awaitable
+        finally:
+            self._stopped.set()
+            heartbeat.cancel()
+            watchdog.join()
+            # A stall right before the end, that the heartbeat never woke up to see
+            stalled_for = time.monotonic() - self._last_beat - HEARTBEAT_SECONDS
+            if stalled_for > self.threshold_ms / 1000:
+                self._record(stalled_for, self._samples)
+
+    def report(self) -> str:
+        if not self.sites:
+            return f"Event loop never blocked for more than {self.threshold_ms:.0f}ms"
+        total = sum(s.total_seconds for s in self.sites.values())
+        stalls = sum(s.stalls for s in self.sites.values())
+        lines = [
+            f"Event loop blocked {stalls} times for {total:.2f}s in total (over {self.threshold_ms:.0f}ms each)"
+        ]
+        for site, s in sorted(self.sites.items(), key=lambda i: -i[1].total_seconds):
+            lines.append(
+                f"  {s.total_seconds:6.2f}s {s.stalls:4}x max {s.max_seconds:.2f}s  {site}"
+            )
+        return "\n".join(lines)
+
+    async def _heartbeat(self) -> None:
+        threshold = self.threshold_ms / 1000
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            now = time.monotonic()
+            stalled_for = now - self._last_beat - HEARTBEAT_SECONDS
+            self._last_beat = now
+            with self._lock:
+                samples, self._samples = self._samples, []
+            if stalled_for > threshold:
+                self._record(stalled_for, samples)
+
+    def _watchdog(self, loop_thread_id: int) -> None:
+        threshold = self.threshold_ms / 1000
+        while not self._stopped.wait(HEARTBEAT_SECONDS):
+            if time.monotonic() - self._last_beat < threshold:
+                continue
+            frame = sys._current_frames().get(loop_thread_id)
+            if frame is None:
+                continue
+            site = _call_site(frame)
+            with self._lock:
+                self._samples.append(str(site))
+
+    def _record(self, seconds: float, samples: list[str]) -> None:
+        # Too short for the watchdog to catch in the act
+        site = (
+            collections.Counter(samples).most_common(1)[0][0]
+            if samples
+            else "unknown (shorter than a sample)"
+        )
+        stats = self.sites.setdefault(site, SiteStats())
+        stats.stalls += 1
+        stats.total_seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+
+
+def _call_site(frame) -> CallSite:
+    innermost = _describe(frame)
+    while frame is not None:
+        if not frame.f_code.co_filename.startswith(_LIBRARY_PATHS) and (
+            frame.f_code.co_filename != __file__
+        ):
+            return CallSite(our_frame=_describe(frame), blocked_in=innermost)
+        frame = frame.f_back
+    return CallSite(our_frame="unknown", blocked_in=innermost)
+
+
+def _describe(frame) -> str:
+    path = os.path.relpath(frame.f_code.co_filename)
+    if path.startswith(".."):
+        path = os.path.basename(path)
+    return f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+async def monitored(awaitable: Awaitable[T], name: str = "") -> T:
+    """Await awaitable, watching the loop if LOOP_MONITOR is set, and print the report."""
+    monitor = LoopMonitor.from_env()
+    if monitor is None:
+        return await awaitable
+    try:
+        return await monitor.watch(awaitable)
+    finally:
+        print(f"{name} {monitor.report()}".strip())
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+
+MAX_SIDE = 1600  # Twitter shows no more than this
+QUALITIES = (90, 82, 74, 66, 58)
+# How much smaller each try after the lowest quality gets
+SHRINK = 0.8
+MAX_SHRINKS = 4
+CACHE_SIZE = 64
+# Twitter takes simple uploads up to 5 MB, chunked ones are sturdier well before that
+CHUNKED_MIN_BYTES = 1024 * 1024
+# What Pillow keeps from the original that the tweet doesn't need
+METADATA_KEYS = ("exif", "icc_profile", "comment", "XML:com.adobe.xmp")
+# Scorecards are JPEGs, and tweepy needs an extension for the content type of chunked uploads
+DEFAULT_FILENAME = "scorecard.jpg"
+
+
+@dataclass
+class ProcessedMedia:
+    data: bytes
+    filename: str  # With the extension of the format, for the upload's content type
+    original_bytes: int
+    cached: bool = False
+
+    @property
+    def chunked(self) -> bool:
+        return len(self.data) >= CHUNKED_MIN_BYTES
+
+
+class MediaOptimizer:
+    """
+    Makes scorecards as small as they need to be before they are uploaded.
+
+    Images over max_side are scaled down, metadata is dropped, and JPEGs are saved at lower
+    qualities, then smaller, until they fit in byte_budget. An image already within all of
+    that is uploaded as it is. Results are kept by the hash of the original, so posting the
+    same scorecard again doesn't process it again. Set MEDIA_BYTE_BUDGET to use it.
+    """
+
+    def __init__(
+        self, byte_budget: int, max_side: int = MAX_SIDE, cache_size: int = CACHE_SIZE
+    ) -> None:
+        self.byte_budget = byte_budget
+        self.max_side = max_side
+        self.cache_size = cache_size
+        # Hash of the original to what we made of it
+        self.processed: OrderedDict[str, ProcessedMedia] = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> MediaOptimizer | None:
+        byte_budget = int(os.environ.get("MEDIA_BYTE_BUDGET", "0"))
+        if byte_budget < 1:
+            return None
+        return cls(byte_budget)
+
+    def process(self, data: bytes) -> ProcessedMedia:
+        key = hashlib.sha256(data).hexdigest()
+        if key in self.processed:
+            self.processed.move_to_end(key)
+            cached = self.processed[key]
+            return ProcessedMedia(cached.data, cached.filename, len(data), cached=True)
+
+        processed = self._process(data)
+        self.processed[key] = processed
+        if len(self.processed) > self.cache_size:
+            self.processed.popitem(last=False)
+        return processed
+
+    def _process(self, data: bytes) -> ProcessedMedia:
+        # Only import Pillow if we process media. Pillow 10.1 has no type hints.
+        from PIL import Image  # type: ignore
+
+        try:
+            image: Image.Image = Image.open(io.BytesIO(data))
+            image.load()
+        except Exception as e:
+            # Not for us to judge, Twitter will say if it can't take it
+            print(f"Uploading media we can't open as it is: {e}")
+            return ProcessedMedia(data, DEFAULT_FILENAME, len(data))
+
+        extension = "png" if image.format == "PNG" else "jpg"
+        if (
+            len(data) <= self.byte_budget
+            and max(image.size) <= self.max_side
+            and not any(k in image.info for k in METADATA_KEYS)
+        ):
+            return ProcessedMedia(data, f"scorecard.{extension}", len(data))
+
+        # Only the pixels are kept, so no metadata comes along
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        if max(image.size) > self.max_side:
+            image.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+        best = b""
+        for _ in range(MAX_SHRINKS + 1):
+            for quality in QUALITIES:
+                b = io.BytesIO()
+                image.save(b, format="JPEG", quality=quality, optimize=True)
+                best = b.getvalue()
+                if len(best) <= self.byte_budget:
+                    return ProcessedMedia(best, "scorecard.jpg", len(data))
+            image = image.resize(
+                (round(image.width * SHRINK), round(image.height * SHRINK)),
+                Image.Resampling.LANCZOS,
+            )
+        print(f"Media is still {len(best)} bytes, over the {self.byte_budget} budget")
+        return ProcessedMedia(best, "scorecard.jpg", len(data))
+
+
+@dataclass
+class MediaUpload:
+    tweet_status: str  # The start of it, to tell the tweets apart
+    original_bytes: int
+    uploaded_bytes: int
+    chunked: bool
+    cached: bool
+    seconds: float
+
+
+class UploadLog:
+    """What each tweet uploaded, and how long it took."""
+
+    def __init__(self) -> None:
+        self.uploads: list[MediaUpload] = []
+
+    def add(self, upload: MediaUpload) -> None:
+        self.uploads.append(upload)
+
+    def report(self) -> str:
+        if not self.uploads:
+            return ""
+        lines = []
+        for u in self.uploads:
+            how = ", ".join(
+                w for w, used in (("chunked", u.chunked), ("cached", u.cached)) if used
+            )
+            lines.append(
+                f"{u.tweet_status!r}: {u.uploaded_bytes / 1024:.0f} KiB of "
+                f"{u.original_bytes / 1024:.0f} KiB in {u.seconds:.2f}s"
+                + (f" ({how})" if how else "")
+            )
+        uploaded = sum(u.uploaded_bytes for u in self.uploads)
+        original = sum(u.original_bytes for u in self.uploads)
+        seconds = sum(u.seconds for u in self.uploads)
+        lines.append(
+            f"{len(self.uploads)} uploads: {uploaded / 1024:.0f} KiB of "
+            f"{original / 1024:.0f} KiB, {seconds / len(self.uploads):.2f}s each"
+        )
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        self.uploads.clear()
+
+
+_media_optimizer: MediaOptimizer | None = None
+_upload_log = UploadLog()
+
+
+def get_media_optimizer() -> MediaOptimizer | None:
+    """The optimizer, kept with its cache while the instance is warm, if MEDIA_BYTE_BUDGET is set."""
+    global _media_optimizer
+    if _media_optimizer is None:
+        _media_optimizer = MediaOptimizer.from_env()
+    return _media_optimizer
+
+
+def get_upload_log() -> UploadLog:
+    """The uploads of every TwitterClient in this process since the last report."""
+    return _upload_log
@@ -4,8 +4,7 @@ import datetime
 import os
 import random
 
-import requests
-
+from clients import http_transport
 from clients.abstract_sports_client import AbstractSportsClient
 from my_types import (
     Game,
@@ -107,6 +106,11 @@ class MLBClient(AbstractSportsClient):
             access_token_secret=os.environ.get("MLB_TWITTER_ACCESS_SECRET", ""),
         )
 
+    @property
+    def max_game_hours(self) -> int:
+        # Extra innings and rain delays
+        return 8
+
     @property
     def short_tweet_phrase(self) -> str:
         return "hit a homer"
@@ -115,22 +119,13 @@ class MLBClient(AbstractSportsClient):
     def score_name(self) -> str:
         return "homer"
 
-    async def get_tweetable_plays(
+    def play_by_play_url(self, game_id: str) -> str:
+        return self.base_url + f"/game/{game_id}/playByPlay"
+
+    def parse_tweetable_plays(
         self, games: list[Game], known_plays: KnownPlays
     ) -> list[TweetablePlay]:
         """Get home runs we haven't processed yet and sort them by end_time."""
-        await self.gather_with_concurrency(
-            self.session,
-            *[
-                self.get_async(
-                    self.base_url + f"/game/{g.game_id}/playByPlay",
-                    self.session,
-                    g,
-                )
-                for g in games
-            ],
-        )
-
         tweetable_plays: list[TweetablePlay] = []
 
         for g in games:
@@ -190,12 +185,20 @@ class MLBClient(AbstractSportsClient):
         tweetable_plays.sort(key=lambda p: p.end_time)
         return tweetable_plays
 
+    def players_in_feed(self, game: Game) -> list[tuple[int, str]]:
+        assert game.payload
+        # Every plate appearance
+        return [
+            (p["matchup"]["batter"]["id"], p["matchup"]["batter"]["fullName"])
+            for p in game.payload["allPlays"]
+        ]
+
     def get_player_picture(self, player_id: int) -> bytes:
-        return requests.get(
+        return http_transport.get(
             f"https://img.mlbstatic.com/mlb-photos/image/upload/d_people:generic:headshot:67:current.png/h_1000,q_auto:best/v1/people/{player_id}/headshot/67/current"
         ).content
 
     def get_default_player_picture(self) -> bytes:
-        return requests.get(
+        return http_transport.get(
             "https://img.mlbstatic.com/mlb-photos/image/upload/d_people:generic:headshot:67:current.png/h_1000,q_auto:best/v1/people/batter/headshot/67/current"
         ).content
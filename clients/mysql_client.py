@@ -1,24 +1,40 @@
 from __future__ import annotations
 
+import math
 import os
 
 import MySQLdb
+import MySQLdb.cursors
 
+from clients import deadline
 from clients.abstract_sports_client import AbstractSportsClient
+from clients.completed_games_index import CompletedGamesIndex
 from clients.google_cloud_storage_client import GoogleCloudStorageClient
-from my_types import Game, KnownPlays, State, TweetablePlay
+from clients.storage_client import LEASE_SECONDS, StateConflictError, StorageClient
+from my_types import Game, KnownPlays, OutboxEntry, State, TweetablePlay
 
+SQL_TIMEOUT_SECONDS = 15
 
-class MySQLClient:
-    def __init__(self, dry_run: bool, sports_client: AbstractSportsClient) -> None:
-        self.sport = sports_client.sport
-        self.dry_run = dry_run
+
+class MySQLClient(StorageClient):
+    def __init__(
+        self,
+        dry_run: bool,
+        sports_client: AbstractSportsClient,
+        state_key: str | None = None,
+    ) -> None:
+        super().__init__(dry_run, sports_client, state_key)
         self.connection = MySQLdb.connect(
             host=os.getenv("MYSQL_HOST"),
             user=os.getenv("MYSQL_USERNAME"),
             passwd=os.getenv("MYSQL_PASSWORD"),
             db=os.getenv("MYSQL_DATABASE"),
             ssl_mode="VERIFY_IDENTITY",
+            connect_timeout=math.ceil(deadline.clamp(10)),
+            # Past the run's deadline, but inside the function timeout. Once a play is tweeted,
+            # saving it matters more than stopping on time.
+            read_timeout=SQL_TIMEOUT_SECONDS,
+            write_timeout=SQL_TIMEOUT_SECONDS,
             ssl={
                 "ca": os.environ.get(
                     "SSL_CERT_FILE", "/etc/ssl/certs/ca-certificates.crt"
@@ -26,28 +42,33 @@ class MySQLClient:
             },
         )
         self.connection.autocommit(True)
+        self.completed_games = CompletedGamesIndex(self.sport)
 
     def get_active_games(self, games: list[Game]) -> list[Game]:
         if not games:
             return []
+        if self.completed_games.needs_reconcile():
+            self.completed_games.reconcile(self._get_completed_game_ids(games))
+        return self.completed_games.active_games(games)
+
+    def _get_completed_game_ids(self, games: list[Game]) -> set[str]:
         query = f"""
-            SELECT game_id, completed_at
+            SELECT game_id
             FROM completed_games
             where game_id in ({','.join([f"'{g.game_id}'" for g in games])})
             and sport = '{self.sport}'
         """
         self.connection.query(query)
         r = self.connection.store_result()
-        completed_game_ids = [row["game_id"] for row in r.fetch_row(maxrows=100, how=1)]
-
-        return [g for g in games if g.game_id not in completed_game_ids]
+        return {row["game_id"] for row in r.fetch_row(maxrows=0, how=1)}
 
     def set_completed_games(self, games: list[Game]) -> None:
         complete_games = [g for g in games if g.is_complete]
 
         if complete_games:
+            # IGNORE, since another instance may have completed the game since we last reconciled
             q = """
-                INSERT INTO completed_games (game_id, sport, completed_at)
+                INSERT IGNORE INTO completed_games (game_id, sport, completed_at)
                 VALUES
             """
             for g in complete_games:
@@ -56,11 +77,9 @@ class MySQLClient:
             print(q)
             if not self.dry_run:
                 self.connection.query(q)
+                self.completed_games.add(complete_games)
 
     def get_known_plays(self, games: list[Game]) -> KnownPlays:
-        """
-        In prior runs, we should record which plays we've already processed.
-        """
         # Should never hit this path without games, but if so there are no plays
         if not games:
             return {}
@@ -84,6 +103,13 @@ class MySQLClient:
 
     def add_tweetable_play(
         self, tweetable_play: TweetablePlay, state: State, is_match: bool
+    ) -> None:
+        self._insert_tweetable_play(tweetable_play, state)
+        if is_match and not self.dry_run:
+            GoogleCloudStorageClient.store_latest_play(tweetable_play)
+
+    def _insert_tweetable_play(
+        self, tweetable_play: TweetablePlay, state: State
     ) -> None:
         q = f"""
             INSERT INTO tweetable_plays (game_id, play_id, sport, completed_at,
@@ -96,12 +122,10 @@ class MySQLClient:
         print(q)
         if not self.dry_run:
             self.connection.query(q)
-        if is_match and not self.dry_run:
-            GoogleCloudStorageClient.store_latest_play(tweetable_play)
 
     def get_initial_state(self) -> State:
         self.connection.query(
-            f"SELECT current_letter, current_letter as initial_current_letter, times_cycled, times_cycled as initial_times_cycled, season, season as initial_season, tweet_id, tweet_id as initial_tweet_id, scores_since_last_match, scores_since_last_match as initial_scores_since_last_match FROM state where sport = '{self.sport}';"
+            f"SELECT current_letter, current_letter as initial_current_letter, times_cycled, times_cycled as initial_times_cycled, season, season as initial_season, tweet_id, tweet_id as initial_tweet_id, scores_since_last_match, scores_since_last_match as initial_scores_since_last_match, version FROM state where sport = '{self.sport}';"
         )
         r = self.connection.store_result()
         rows = r.fetch_row(maxrows=1, how=1)
@@ -115,20 +139,108 @@ class MySQLClient:
         raise Exception("No state found")
 
     def update_state(self, state: State) -> None:
-        if (
-            state.current_letter == state.initial_current_letter
-            and state.times_cycled == state.initial_times_cycled
-            and state.season == state.initial_season
-            and state.tweet_id == state.initial_tweet_id
-            and state.scores_since_last_match == state.initial_scores_since_last_match
-        ):
+        if self._state_unchanged(state):
             print("No state change")
             return
         print("Updated state", state)
-        q = f"UPDATE state SET current_letter = '{state.current_letter}', times_cycled = {state.times_cycled}, season = '{state.season}', tweet_id = {state.tweet_id}{f', scores_since_last_match = {state.scores_since_last_match}' if state.scores_since_last_match is not None else ''} WHERE sport='{self.sport}';"
+        q = f"UPDATE state SET current_letter = '{state.current_letter}', times_cycled = {state.times_cycled}, season = '{state.season}', tweet_id = {state.tweet_id}{f', scores_since_last_match = {state.scores_since_last_match}' if state.scores_since_last_match is not None else ''}, version = version + 1 WHERE sport='{self.sport}' AND version = {state.version};"
         print(q)
         if not self.dry_run:
             self.connection.query(q)
+            if self.connection.affected_rows() != 1:
+                raise StateConflictError(
+                    f"{self.sport} state is no longer at version {state.version}"
+                )
+            state.version += 1
+
+    def acquire_lease(self) -> bool:
+        if self.dry_run:
+            return True
+        self.connection.query(
+            f"UPDATE state SET lease_owner = '{self.lease_owner}', lease_expires_at = NOW() + INTERVAL {LEASE_SECONDS} SECOND WHERE sport = '{self.sport}' AND (lease_owner IS NULL OR lease_owner = '{self.lease_owner}' OR lease_expires_at < NOW());"
+        )
+        return self.connection.affected_rows() == 1
+
+    def release_lease(self) -> None:
+        if self.dry_run:
+            return
+        self.connection.query(
+            f"UPDATE state SET lease_owner = NULL, lease_expires_at = NULL WHERE sport = '{self.sport}' AND lease_owner = '{self.lease_owner}';"
+        )
+
+    def record_play(
+        self,
+        tweetable_play: TweetablePlay,
+        state: State,
+        is_match: bool,
+        outbox_entry: OutboxEntry | None,
+    ) -> None:
+        if self.dry_run:
+            self.update_state(state)
+            self._insert_tweetable_play(tweetable_play, state)
+            return
+        self.connection.query("START TRANSACTION")
+        try:
+            self.update_state(state)
+            self._insert_tweetable_play(tweetable_play, state)
+            if outbox_entry:
+                # Parameterized, since tweet texts have newlines and quotes
+                self.connection.cursor().execute(
+                    """
+                    INSERT IGNORE INTO tweet_outbox (idempotency_key, sport, game_id, play_id, status_text, is_reply, image_input)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    self._outbox_row(outbox_entry),
+                )
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+
+    def get_pending_tweets(self) -> list[OutboxEntry]:
+        cursor = self.connection.cursor(MySQLdb.cursors.DictCursor)
+        cursor.execute(
+            "SELECT * FROM tweet_outbox WHERE sport = %s AND status IN ('pending', 'sending') ORDER BY id",
+            (self.sport,),
+        )
+        return [self._outbox_entry(row) for row in cursor.fetchall()]
+
+    def mark_tweet_sending(self, entry: OutboxEntry) -> None:
+        self._set_outbox_status(entry, "sending")
+
+    def mark_tweet_posted(self, entry: OutboxEntry, state: State) -> None:
+        self.connection.query("START TRANSACTION")
+        try:
+            self.update_state(state)
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "UPDATE tweetable_plays SET tweet_id = %s WHERE sport = %s AND game_id = %s AND play_id = %s",
+                (entry.tweet_id, self.sport, entry.game_id, entry.play_id),
+            )
+            cursor.execute(
+                "UPDATE tweet_outbox SET status = 'posted', tweet_id = %s, posted_at = CURRENT_TIMESTAMP() WHERE id = %s",
+                (entry.tweet_id, entry.entry_id),
+            )
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        entry.status = "posted"
+        if entry.image_input:
+            GoogleCloudStorageClient.store_latest_play(entry)
+
+    def mark_tweet_skipped(self, entry: OutboxEntry) -> None:
+        self._set_outbox_status(entry, "skipped")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _set_outbox_status(self, entry: OutboxEntry, status: str) -> None:
+        self.connection.cursor().execute(
+            "UPDATE tweet_outbox SET status = %s WHERE id = %s",
+            (status, entry.entry_id),
+        )
+        entry.status = status
 
     def _escape_string(self, string: str) -> str:
         return string.replace("'", "\\'").replace("\n", " ")
@@ -4,11 +4,12 @@ import datetime
 import os
 import random
 
-import requests
-
+from clients import http_transport
 from clients.abstract_sports_client import AbstractSportsClient
+from clients.deferred_plays import NBA_PLAYER_LOOKUP
 from my_types import (
     Game,
+    GameWindow,
     KnownPlays,
     SeasonPeriod,
     Sport,
@@ -43,6 +44,8 @@ class NBAClient(AbstractSportsClient):
     def __init__(self, dry_run: bool):
         super().__init__(dry_run)
         self.known_players: dict = {}  # Cache
+        # Replay turns this off and looks up the names once for the whole season
+        self.lookup_player_names = True
 
     @property
     def sport(self) -> Sport:
@@ -64,22 +67,25 @@ class NBAClient(AbstractSportsClient):
     def alphabet_game_name(self) -> str:
         return "Slam Dunk"
 
-    def get_current_games(self) -> list[Game]:
-        today = datetime.date.today()
-        yesterday = today - datetime.timedelta(days=1)
-        # yesterday_str, like 09/30/2022 00:00:00
-        yesterday_str = f"{self._int_to_string_with_padding(yesterday.month)}/{self._int_to_string_with_padding(yesterday.day)}/{yesterday.year} 00:00:00"
-        tomorrow = today + datetime.timedelta(days=1)
-        tomorrow_str = f"{self._int_to_string_with_padding(tomorrow.month)}/{self._int_to_string_with_padding(tomorrow.day)}/{tomorrow.year} 00:00:00"
-        today_str = f"{self._int_to_string_with_padding(today.month)}/{self._int_to_string_with_padding(today.day)}/{today.year} 00:00:00"
+    def schedule_url(self, start: datetime.date, end: datetime.date) -> str:
+        # The whole season in one file
+        return "https://cdn.nba.com/static/json/staticData/scheduleLeagueV2.json"
 
-        game_dates = requests.get(
-            "https://cdn.nba.com/static/json/staticData/scheduleLeagueV2.json"
-        ).json()["leagueSchedule"]["gameDates"]
+    def games_from_schedule(
+        self, schedule: dict, start: datetime.date, end: datetime.date
+    ) -> list[Game]:
+        # Like 09/30/2022 00:00:00
+        game_date_strs: list[str] = []
+        day = start
+        while day <= end:
+            game_date_strs.append(
+                f"{self._int_to_string_with_padding(day.month)}/{self._int_to_string_with_padding(day.day)}/{day.year} 00:00:00"
+            )
+            day += datetime.timedelta(days=1)
 
         games = []
-        for d in game_dates:
-            if d["gameDate"] in [tomorrow_str, today_str, yesterday_str]:
+        for d in schedule["leagueSchedule"]["gameDates"]:
+            if d["gameDate"] in game_date_strs:
                 for g in d["games"]:
                     game_id = g["gameId"]
                     assert type(game_id) == str
@@ -94,6 +100,22 @@ class NBAClient(AbstractSportsClient):
                     )
         return games
 
+    def get_game_windows(
+        self, start: datetime.date, end: datetime.date
+    ) -> list[GameWindow]:
+        game_dates = http_transport.get(self.schedule_url(start, end)).json()[
+            "leagueSchedule"
+        ]["gameDates"]
+
+        windows: list[GameWindow] = []
+        for d in game_dates:
+            for g in d["games"]:
+                # Like 2022-10-18T23:30:00Z
+                game_time = g["gameDateTimeUTC"]
+                if start.isoformat() <= game_time[:10] <= end.isoformat():
+                    windows.append(self._game_window(game_time))
+        return windows
+
     @property
     def team_to_abbrevation(self) -> dict:
         return {
@@ -138,6 +160,11 @@ class NBAClient(AbstractSportsClient):
             access_token_secret=os.environ.get("NBA_TWITTER_ACCESS_SECRET", ""),
         )
 
+    @property
+    def max_game_hours(self) -> int:
+        # Overtimes
+        return 4
+
     @property
     def short_tweet_phrase(self) -> str:
         return "dunked"
@@ -146,22 +173,13 @@ class NBAClient(AbstractSportsClient):
     def score_name(self) -> str:
         return "dunk"
 
-    async def get_tweetable_plays(
+    def play_by_play_url(self, game_id: str) -> str:
+        return f"https://cdn.nba.com/static/json/liveData/playbyplay/playbyplay_{game_id}.json"
+
+    def parse_tweetable_plays(
         self, games: list[Game], known_plays: KnownPlays
     ) -> list[TweetablePlay]:
         """Get dunks we haven't processed yet and sort them by end_time."""
-        await self.gather_with_concurrency(
-            self.session,
-            *[
-                self.get_async(
-                    f"https://cdn.nba.com/static/json/liveData/playbyplay/playbyplay_{g.game_id}.json",
-                    self.session,
-                    g,
-                )
-                for g in games
-            ],
-        )
-
         tweetable_plays: list[TweetablePlay] = []
 
         for g in games:
@@ -179,11 +197,15 @@ class NBAClient(AbstractSportsClient):
                     and play_id not in known_plays_for_this_game
                 ):
                     player_id = p["personId"]
-                    try:
-                        player_name = self._get_player_name(player_id)
-                    except PlayerLookupError:
-                        # Just skip it this run if we can't look it up
-                        continue
+                    if self.lookup_player_names:
+                        try:
+                            player_name = self._get_player_name(player_id)
+                        except PlayerLookupError:
+                            # Just skip it for now if we can't look it up
+                            self.deferrals.defer(g.game_id, play_id, NBA_PLAYER_LOOKUP)
+                            continue
+                    else:
+                        player_name = ""
                     period = self._period_to_string(p["period"])
                     clock = self._clean_clock(p["clock"])
 
@@ -215,13 +237,38 @@ class NBAClient(AbstractSportsClient):
         tweetable_plays.sort(key=lambda p: p.end_time)
         return tweetable_plays
 
+    def players_in_feed(self, game: Game) -> list[tuple[int, str]]:
+        assert game.payload
+        # Only players whose names we already looked up, for a dunk
+        return [
+            (p["personId"], self.known_players[p["personId"]])
+            for p in game.payload["game"]["actions"]
+            if p.get("personId") in self.known_players
+        ]
+
+    def worker_context(self, games: list[Game]) -> dict:
+        # The names are looked up here, with this process's cache
+        return {"lookup_player_names": False}
+
+    def finish_pool_plays(self, plays: list[TweetablePlay]) -> list[TweetablePlay]:
+        found = []
+        for p in plays:
+            try:
+                p.player_name = self._get_player_name(p.player_id)
+            except PlayerLookupError:
+                # Same as parse_tweetable_plays, skip it for now
+                self.deferrals.defer(p.game_id, p.play_id, NBA_PLAYER_LOOKUP)
+                continue
+            found.append(p)
+        return found
+
     def get_player_picture(self, player_id: int) -> bytes:
-        return requests.get(
+        return http_transport.get(
             f"https://cdn.nba.com/headshots/nba/latest/1040x760/{player_id}.png"
         ).content
 
     def get_default_player_picture(self) -> bytes:
-        return requests.get(
+        return http_transport.get(
             "https://cdn.nba.com/headshots/nba/latest/1040x760/fallback.png"
         ).content
 
@@ -232,7 +279,7 @@ class NBAClient(AbstractSportsClient):
         else:
             try:
                 player_name = (
-                    requests.get(f"https://www.nba.com/player/{player_id}")
+                    http_transport.get(f"https://www.nba.com/player/{player_id}")
                     .text.split("<title>")[1]
                     .split("</title>")[0]
                     .split(" |")[0]
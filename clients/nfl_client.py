@@ -3,11 +3,13 @@ from __future__ import annotations
 import datetime
 import os
 
-import requests
-
+from clients import http_transport
 from clients.abstract_sports_client import AbstractSportsClient
+from clients.deferred_plays import NFL_PASSER_ONLY, NFL_SCORER_NOT_ON_ROSTER
+from clients.roster_index import RosterIndex
 from my_types import (
     Game,
+    GameWindow,
     KnownPlays,
     SeasonPeriod,
     Sport,
@@ -20,6 +22,7 @@ class NFLClient(AbstractSportsClient):
     def __init__(self, dry_run: bool):
         super().__init__(dry_run)
         self.known_rosters: dict = {}
+        self._roster_indexes: dict[int, RosterIndex] = {}
 
     @property
     def sport(self) -> Sport:
@@ -57,13 +60,22 @@ class NFLClient(AbstractSportsClient):
         return "Touchdown"
 
     def get_current_games(self) -> list[Game]:
-
-        all_games = requests.get(
+        # The scoreboard without dates is this week's games
+        response = http_transport.get(
             "http://site.api.espn.com/apis/site/v2/sports/football/nfl/scoreboard"
-        ).json()["events"]
+        )
+        self.archive_payload("schedule", "", response.content)
+        today = datetime.date.today()
+        return self.games_from_schedule(response.json(), today, today)
+
+    def schedule_url(self, start: datetime.date, end: datetime.date) -> str:
+        return f"http://site.api.espn.com/apis/site/v2/sports/football/nfl/scoreboard?dates={start.strftime('%Y%m%d')}-{end.strftime('%Y%m%d')}&limit=1000"
 
+    def games_from_schedule(
+        self, schedule: dict, start: datetime.date, end: datetime.date
+    ) -> list[Game]:
         games: list[Game] = []
-        for g in all_games:
+        for g in schedule["events"]:
             if g["status"]["type"]["state"] != "pre":
                 competitors = g["competitions"][0]["competitors"]
                 home_team_id: int | None = None
@@ -91,6 +103,13 @@ class NFLClient(AbstractSportsClient):
                 )
         return games
 
+    def get_game_windows(
+        self, start: datetime.date, end: datetime.date
+    ) -> list[GameWindow]:
+        events = http_transport.get(self.schedule_url(start, end)).json()["events"]
+        # Dates look like 2023-09-08T00:20Z
+        return [self._game_window(g["date"]) for g in events]
+
     @property
     def team_to_abbrevation(self) -> dict:
         return {
@@ -137,6 +156,11 @@ class NFLClient(AbstractSportsClient):
             access_token_secret=os.environ.get("NFL_TWITTER_ACCESS_SECRET", ""),
         )
 
+    @property
+    def max_game_hours(self) -> int:
+        # Overtime and weather delays
+        return 5
+
     @property
     def short_tweet_phrase(self) -> str:
         return "scored a touchdown"
@@ -145,22 +169,13 @@ class NFLClient(AbstractSportsClient):
     def score_name(self) -> str:
         return "touchdown"
 
-    async def get_tweetable_plays(
+    def play_by_play_url(self, game_id: str) -> str:
+        return f"http://site.api.espn.com/apis/site/v2/sports/football/nfl/summary?event={game_id}"
+
+    def parse_tweetable_plays(
         self, games: list[Game], known_plays: KnownPlays
     ) -> list[TweetablePlay]:
-        """Get touchdowns we haven't processed yet and sort them by end_time."""
-        await self.gather_with_concurrency(
-            self.session,
-            *[
-                self.get_async(
-                    f"http://site.api.espn.com/apis/site/v2/sports/football/nfl/summary?event={g.game_id}",
-                    self.session,
-                    g,
-                )
-                for g in games
-            ],
-        )
-
+        """Get touchdowns we haven't processed yet. The feed doesn't have play times to sort on."""
         tweetable_plays: list[TweetablePlay] = []
 
         for g in games:
@@ -175,31 +190,29 @@ class NFLClient(AbstractSportsClient):
                     and play_id not in known_plays_for_this_game
                 ):
                     player_team_id = int(p["team"]["id"])
-                    roster = self.get_roster(player_team_id)
                     play_text = p["text"].replace("Blocked Kick Recovered by ", "")
-                    first_two_words = " ".join(play_text.split(" ")[:2])
-                    first_three_words = " ".join(play_text.split(" ")[:3])
-                    try:
-                        player_id = (
-                            roster.get(first_two_words)
-                            or roster.get(first_two_words + " Jr.")
-                            or roster[first_two_words + " Sr."]
+                    match = self.roster_index(player_team_id).match(play_text)
+                    if match is None:
+                        # Likely signed since we loaded the roster. Load it again, and keep
+                        # the game active until the scorer is found.
+                        print(
+                            f"No player on {player_team_id}'s roster for: {play_text}"
                         )
-                        player_name = first_two_words
-                    except KeyError:
-                        player_id = (
-                            roster.get(first_three_words)
-                            or roster.get(first_three_words + " Jr.")
-                            or roster[first_three_words + " Sr."]
+                        self.known_rosters.pop(player_team_id, None)
+                        self.deferrals.defer(
+                            g.game_id, play_id, NFL_SCORER_NOT_ON_ROSTER
                         )
-                        player_name = first_three_words
+                        continue
+                    player_id = match.player_id
+                    player_name = match.player_name
 
-                    if play_text.startswith(f"{player_name} Pass for"):
-                        # We have the quarterback name, just skip this play and get it on the next run
+                    if match.rest.startswith("Pass for"):
+                        # We have the quarterback name, skip this play and fetch it again soon
                         # First time:
                         # Jalen Hurts Pass for 7 Yds, DeVonta Smith Pass From Jalen Hurts for 7 Yds, Trevon Diggs 1 Yd Pnlty
                         # Second time:
                         # DeVonta Smith Pass From Jalen Hurts for 7 Yds, shotgun TWO-POINT CONVERSION ATTEMPT. M.Sanders rushes up the middle. ATTEMPT FAILS.
+                        self.deferrals.defer(g.game_id, play_id, NFL_PASSER_ONLY)
                         continue
 
                     period = self._period_to_string(p["period"]["number"])
@@ -229,22 +242,44 @@ class NFLClient(AbstractSportsClient):
         # tweetable_plays.sort(key=lambda p: p.end_time)
         return tweetable_plays
 
+    def players_in_feed(self, game: Game) -> list[tuple[int, str]]:
+        # The feed only names the scorers, so everyone on a roster we already have
+        return [
+            (player_id, player_name)
+            for team_id in (game.home_team_id, game.away_team_id)
+            for player_name, player_id in self.known_rosters.get(team_id, {}).items()
+        ]
+
+    def worker_context(self, games: list[Game]) -> dict:
+        # Fetched here once, instead of by every worker that sees the team
+        team_ids = {t for g in games for t in (g.home_team_id, g.away_team_id)}
+        return {"known_rosters": {t: self.get_roster(t) for t in team_ids}}
+
     def get_player_picture(self, player_id: int) -> bytes:
-        return requests.get(
+        return http_transport.get(
             f"https://a.espncdn.com/combiner/i?img=/i/headshots/nfl/players/full/{player_id}.png&w=1378&h=1000"
         ).content
 
     def get_default_player_picture(self) -> bytes:
-        return requests.get(
+        return http_transport.get(
             "https://a.espncdn.com/combiner/i?img=/i/headshots/nophoto.png&w=1378&h=1000"
         ).content
 
+    def roster_index(self, team_id: int) -> RosterIndex:
+        roster = self.get_roster(team_id)
+        index = self._roster_indexes.get(team_id)
+        # Built again if the roster was loaded again, or replaced like in parse workers
+        if index is None or index.roster is not roster:
+            index = RosterIndex(roster)
+            self._roster_indexes[team_id] = index
+        return index
+
     def get_roster(self, team_id: int) -> dict[str, int]:
         if self.known_rosters.get(team_id):
             return self.known_rosters[team_id]
         else:
             roster_dict = {}
-            roster = requests.get(
+            roster = http_transport.get(
                 f"https://site.api.espn.com/apis/site/v2/sports/football/nfl/teams/{team_id}/roster"
             ).json()["athletes"]
             for section in roster:
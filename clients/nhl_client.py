@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import datetime
 import os
 from typing import Any
 
-import requests
-
+from clients import http_transport
 from clients.abstract_sports_client import AbstractSportsClient
+from clients.deferred_plays import NHL_UNSETTLED
+from clients.goal_tracker import GoalTracker
 from my_types import (
     Game,
     KnownPlays,
@@ -21,6 +21,7 @@ class NHLClient(AbstractSportsClient):
     def __init__(self, dry_run: bool):
         super().__init__(dry_run)
         self.base_url = "https://statsapi.web.nhl.com/api/v1"
+        self._goal_tracker: GoalTracker | None = None
 
     @property
     def sport(self) -> Sport:
@@ -85,6 +86,11 @@ class NHLClient(AbstractSportsClient):
             access_token_secret=os.environ.get("NHL_TWITTER_ACCESS_SECRET", ""),
         )
 
+    @property
+    def max_game_hours(self) -> int:
+        # Overtime and shootouts
+        return 5
+
     @property
     def short_tweet_phrase(self) -> str:
         return "scored a goal"
@@ -93,37 +99,41 @@ class NHLClient(AbstractSportsClient):
     def score_name(self) -> str:
         return "goal"
 
-    async def get_tweetable_plays(
+    def play_by_play_url(self, game_id: str) -> str:
+        return self.base_url + f"/game/{game_id}/playByPlay"
+
+    @property
+    def goal_tracker(self) -> GoalTracker:
+        if self._goal_tracker is None:
+            self._goal_tracker = GoalTracker(dry_run=self.dry_run)
+        return self._goal_tracker
+
+    def hold_plays(
+        self, plays: list[TweetablePlay], games: list[Game]
+    ) -> list[TweetablePlay]:
+        # The scorer can still change for a while after a goal
+        released = self.goal_tracker.release(plays, games)
+        if len(released) < len(plays):
+            released_ids = {(p.game_id, p.play_id) for p in released}
+            for p in plays:
+                if (p.game_id, p.play_id) not in released_ids:
+                    self.deferrals.defer(p.game_id, p.play_id, NHL_UNSETTLED)
+        return released
+
+    def parse_tweetable_plays(
         self, games: list[Game], known_plays: KnownPlays
     ) -> list[TweetablePlay]:
         """
         Get all goals that we haven't processed yet, only the goal scorer (not the assister).
+
+        Live runs hold them in the goal tracker until the scorer has settled.
         """
         tweetable_plays: list[TweetablePlay] = []
-        five_minutes_ago = datetime.datetime.now(
-            datetime.timezone.utc
-        ) - datetime.timedelta(minutes=5)
-
-        await self.gather_with_concurrency(
-            self.session,
-            *[
-                self.get_async(
-                    self.base_url + f"/game/{g.game_id}/playByPlay",
-                    self.session,
-                    g,
-                )
-                for g in games
-            ],
-        )
 
         for g in games:
             assert g.payload
             known_plays_for_this_game = known_plays.get(g.game_id, [])
             for p in g.payload["allPlays"]:
-                play_time = datetime.datetime.strptime(
-                    p["about"]["dateTime"],
-                    "%Y-%m-%dT%H:%M:%SZ",
-                ).replace(tzinfo=datetime.timezone.utc)
                 play_id = str(p["about"]["eventId"])
                 if (
                     p["result"]["event"] == "Goal"
@@ -131,9 +141,6 @@ class NHLClient(AbstractSportsClient):
                     and (
                         p["result"]["description"] != "Goal"
                     )  # We have seen the player name flip if there is no detailed description
-                    and (
-                        play_time < five_minutes_ago
-                    )  # Ensure play_time happened at least 5 minutes ago
                     and play_id not in known_plays_for_this_game
                 ):
                     scorer: Any = None
@@ -166,6 +173,7 @@ class NHLClient(AbstractSportsClient):
                                 season_period=g.season_period,
                                 season_phrase=self.season_phrase(g.season_period),
                                 sport=self.sport,
+                                description=p["result"]["description"],
                             )
                         )
 
@@ -173,12 +181,21 @@ class NHLClient(AbstractSportsClient):
         tweetable_plays.sort(key=lambda p: (p.end_time, p.tiebreaker))
         return tweetable_plays
 
+    def players_in_feed(self, game: Game) -> list[tuple[int, str]]:
+        assert game.payload
+        # Shooters, hitters, faceoff takers and so on
+        return [
+            (player["player"]["id"], player["player"]["fullName"])
+            for p in game.payload["allPlays"]
+            for player in p.get("players", [])
+        ]
+
     def get_player_picture(self, player_id: int) -> bytes:
-        return requests.get(
+        return http_transport.get(
             f"https://cms.nhl.bamgrid.com/images/headshots/current/168x168/{player_id}@2x.jpg"
         ).content
 
     def get_default_player_picture(self) -> bytes:
-        return requests.get(
+        return http_transport.get(
             "https://cms.nhl.bamgrid.com/images/headshots/current/168x168/skater@2x.jpg"
         ).content
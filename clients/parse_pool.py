@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from clients.deferred_plays import FEED_NOT_JSON, Deferral
+from my_types import Game, KnownPlays, Sport, TweetablePlay
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+    from clients.abstract_sports_client import AbstractSportsClient
+    from clients.fetch_scheduler import FetchResult
+
+# Below this many games, shipping the feeds to other processes costs more than it saves.
+# See parse_pool_benchmark.py for where it crosses over.
+DEFAULT_MIN_GAMES = 8
+
+
+@dataclass
+class ParseTask:
+    sport: Sport
+    game: Game  # Without its payload, the body is the feed
+    body: bytes
+    is_json: bool
+    known_plays: KnownPlays  # Only this game's
+    # Attributes to set on the worker's sports client first, from worker_context()
+    context: dict
+    collect_players: bool  # See AbstractSportsClient.active_players
+
+
+@dataclass
+class ParseResult:
+    plays: list[TweetablePlay]
+    is_complete: bool  # NBA finds out from the feed that a game ended
+    deferrals: list[Deferral]
+    players: list[tuple[int, str]]
+
+
+class ParsePool:
+    """
+    Decodes and parses feeds in other processes, so a big slate uses more than one core.
+
+    Each game is one task: the raw response goes to a worker, which decodes it and runs the
+    sport's parse_tweetable_plays, and only the plays come back. Anything a parser would look
+    up over the network is done in this process, before (worker_context) or after
+    (finish_pool_plays). Set PARSE_WORKERS to use it, and PARSE_POOL_MIN_GAMES to change
+    how many games it takes.
+    """
+
+    def __init__(self, workers: int, min_games: int = DEFAULT_MIN_GAMES) -> None:
+        self.workers = workers
+        self.min_games = min_games
+        self._executor: ProcessPoolExecutor | None = None
+
+    @classmethod
+    def from_env(cls) -> ParsePool | None:
+        workers = int(os.environ.get("PARSE_WORKERS", "0"))
+        if workers < 2:
+            return None
+        return cls(
+            workers,
+            min_games=int(os.environ.get("PARSE_POOL_MIN_GAMES", DEFAULT_MIN_GAMES)),
+        )
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Started on first use and kept while the instance is warm
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def wants(self, games: list[Game]) -> bool:
+        return len(games) >= self.min_games
+
+    async def parse(
+        self,
+        sports_client: AbstractSportsClient,
+        games: list[Game],
+        feeds: dict[str, FetchResult],
+        known_plays: KnownPlays,
+    ) -> list[TweetablePlay]:
+        """The plays of every game, in game order. Sorting them is up to the caller."""
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    self.executor,
+                    parse_game,
+                    ParseTask(
+                        sport=sports_client.sport,
+                        game=g,
+                        body=feeds[g.game_id].body,
+                        is_json=feeds[g.game_id].is_json,
+                        known_plays={g.game_id: known_plays.get(g.game_id, [])},
+                        context=sports_client.worker_context([g]),
+                        collect_players=sports_client.active_players is not None,
+                    ),
+                )
+                for g in games
+            ]
+        )
+        plays: list[TweetablePlay] = []
+        for g, result in zip(games, results):
+            g.is_complete = result.is_complete
+            plays.extend(result.plays)
+            sports_client.deferrals.deferrals.extend(result.deferrals)
+            if sports_client.active_players is not None:
+                sports_client.active_players.update(result.players)
+        return sports_client.finish_pool_plays(plays)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+_worker_clients: dict[str, AbstractSportsClient] = {}
+
+
+def parse_game(task: ParseTask) -> ParseResult:
+    """Runs in a worker process."""
+    from clients.sports_clients import get_sports_client
+
+    if task.sport not in _worker_clients:
+        _worker_clients[task.sport] = get_sports_client(task.sport, dry_run=True)
+    sports_client = _worker_clients[task.sport]
+    for name, value in task.context.items():
+        setattr(sports_client, name, value)
+
+    g = task.game
+    if not task.is_json:
+        return ParseResult(
+            plays=[],
+            is_complete=g.is_complete,
+            deferrals=[Deferral(g.game_id, "", FEED_NOT_JSON)],
+            players=[],
+        )
+    g.payload = json.loads(task.body)
+    # Anything left over from a task that failed
+    sports_client.deferrals.take()
+    try:
+        plays = sports_client.parse_tweetable_plays([g], task.known_plays)
+        players = sports_client.players_in_feed(g) if task.collect_players else []
+    finally:
+        g.payload = None
+    return ParseResult(
+        plays=plays,
+        is_complete=g.is_complete,
+        deferrals=sports_client.deferrals.take(),
+        players=players,
+    )
+
+
+_parse_pool: ParsePool | None = None
+
+
+def get_parse_pool() -> ParsePool | None:
+    """The pool shared by every sport in this process, if PARSE_WORKERS is set."""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ParsePool.from_env()
+    return _parse_pool
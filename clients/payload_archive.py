@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import atexit
+import json
+import mmap
+import os
+import queue
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Iterator
+
+from my_types import Sport
+
+# Start a new segment file once the current one is this big
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+# Delete the oldest segments once all of them take more than this. On Cloud Functions /tmp
+# is in memory, which is 512 MB for the whole function.
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+@dataclass
+class ArchiveEntry:
+    sport: Sport
+    kind: str  # "schedule" or "play_by_play"
+    game_id: str  # Empty for schedules
+    fetched_at: float  # Epoch seconds
+    segment: str  # Path of the segment file
+    offset: int
+    length: int  # Compressed length
+
+
+class PayloadArchive:
+    """
+    Append-only archive of every schedule and play-by-play response we fetch.
+
+    Each sport has its own folder of segment files. A record is one zlib-compressed response,
+    and each segment has a sidecar .idx file with a JSON line per record: kind, game_id,
+    fetched_at, offset and length. append() only queues the bytes, a background thread
+    compresses and writes them so fetching never waits on the disk. Whenever a segment is
+    started, the oldest ones of every sport are deleted to keep the archive within max_bytes,
+    give or take the segments still being written.
+    """
+
+    def __init__(
+        self,
+        archive_dir: str,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.archive_dir = archive_dir
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self._queue: queue.Queue = queue.Queue()
+        # Per sport: (data file, index file, bytes written)
+        self._segments: dict[str, tuple] = {}
+        self._segment_count = 0
+        self._writer = threading.Thread(target=self._write_forever, daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def append(
+        self,
+        sport: Sport,
+        kind: str,
+        game_id: str,
+        body: bytes,
+        fetched_at: float | None = None,
+    ) -> None:
+        self._queue.put(
+            (
+                sport,
+                kind,
+                game_id,
+                time.time() if fetched_at is None else fetched_at,
+                body,
+            )
+        )
+
+    def flush(self) -> None:
+        """Wait until everything appended so far is on disk."""
+        self._queue.join()
+
+    def _write_forever(self) -> None:
+        while True:
+            sport, kind, game_id, fetched_at, body = self._queue.get()
+            try:
+                self._write(sport, kind, game_id, fetched_at, body)
+            except Exception as e:
+                # Archiving is best effort, it must never break a run
+                print(f"Could not archive {sport} {kind} {game_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(
+        self, sport: Sport, kind: str, game_id: str, fetched_at: float, body: bytes
+    ) -> None:
+        record = zlib.compress(body)
+        data_file, index_file, written = self._segments.get(sport, (None, None, 0))
+        if data_file is None or written + len(record) > self.segment_bytes:
+            if data_file is not None:
+                data_file.close()
+                index_file.close()
+            data_file, index_file = self._new_segment(sport)
+            written = 0
+            self._prune()
+
+        data_file.write(record)
+        # The data has to be on disk before the index points at it
+        data_file.flush()
+        index_file.write(
+            json.dumps(
+                {
+                    "kind": kind,
+                    "game_id": game_id,
+                    "fetched_at": fetched_at,
+                    "offset": written,
+                    "length": len(record),
+                }
+            )
+            + "\n"
+        )
+        index_file.flush()
+        self._segments[sport] = (data_file, index_file, written + len(record))
+
+    def _new_segment(self, sport: Sport) -> tuple:
+        sport_dir = os.path.join(self.archive_dir, sport)
+        os.makedirs(sport_dir, exist_ok=True)
+        # Never reuse a segment, so several processes can archive into the same folder
+        self._segment_count += 1
+        name = f"segment-{int(time.time())}-{os.getpid()}-{self._segment_count}"
+        path = os.path.join(sport_dir, name)
+        return open(path + ".dat", "ab"), open(path + ".idx", "a")
+
+    def _prune(self) -> None:
+        """Delete the oldest segments, and their indexes, until the archive fits in max_bytes."""
+        open_segments = {f.name for f, _, _ in self._segments.values() if f}
+        segments = []
+        total = 0
+        for sport in os.listdir(self.archive_dir):
+            sport_dir = os.path.join(self.archive_dir, sport)
+            if not os.path.isdir(sport_dir):
+                continue
+            for name in os.listdir(sport_dir):
+                if not name.endswith(".dat"):
+                    continue
+                path = os.path.join(sport_dir, name)
+                try:
+                    stat = os.stat(path)
+                    index_bytes = os.path.getsize(path[: -len(".dat")] + ".idx")
+                except FileNotFoundError:
+                    # Another process pruned it first
+                    continue
+                total += stat.st_size + index_bytes
+                if path not in open_segments:
+                    segments.append((stat.st_mtime, path, stat.st_size + index_bytes))
+        # Room for the segment just started to fill up
+        for _, path, size in sorted(segments):
+            if total + self.segment_bytes <= self.max_bytes:
+                break
+            # The index first, so a reader never finds records without their data
+            for suffix in (".idx", ".dat"):
+                try:
+                    os.remove(path[: -len(".dat")] + suffix)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            print(f"Deleted archive segment {path}")
+
+
+class ArchiveReader:
+    """Random access to a PayloadArchive. Segments are memory-mapped and only the records read are decompressed."""
+
+    def __init__(self, archive_dir: str) -> None:
+        self.archive_dir = archive_dir
+        self._entries: dict[str, list[ArchiveEntry]] = {}
+        # (sport, kind, game_id) to entries, so one game's records are found without a scan
+        self._by_game: dict[tuple[str, str, str], list[ArchiveEntry]] = {}
+        self._maps: dict[str, mmap.mmap] = {}
+
+    def entries(
+        self,
+        sport: Sport,
+        kind: str | None = None,
+        game_id: str | None = None,
+        start: float | None = None,
+        end: float | None = None,
+    ) -> list[ArchiveEntry]:
+        """Matching entries in fetch order."""
+        candidates = self._sport_entries(sport)
+        if kind is not None and game_id is not None:
+            candidates = self._by_game.get((sport, kind, game_id), [])
+        return [
+            e
+            for e in candidates
+            if (kind is None or e.kind == kind)
+            and (game_id is None or e.game_id == game_id)
+            and (start is None or e.fetched_at >= start)
+            and (end is None or e.fetched_at < end)
+        ]
+
+    def latest(
+        self, sport: Sport, kind: str, game_id: str = "", end: float | None = None
+    ) -> ArchiveEntry | None:
+        matching = self.entries(sport, kind, game_id, end=end)
+        return matching[-1] if matching else None
+
+    def read(self, entry: ArchiveEntry) -> bytes:
+        segment = self._maps.get(entry.segment)
+        if segment is None:
+            with open(entry.segment, "rb") as f:
+                segment = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[entry.segment] = segment
+        start, end = entry.offset, entry.offset + entry.length
+        return zlib.decompress(segment[start:end])
+
+    def read_json(self, entry: ArchiveEntry) -> dict:
+        return json.loads(self.read(entry))
+
+    def iter_payloads(
+        self, sport: Sport, **filters
+    ) -> Iterator[tuple[ArchiveEntry, bytes]]:
+        for entry in self.entries(sport, **filters):
+            yield entry, self.read(entry)
+
+    def _sport_entries(self, sport: Sport) -> list[ArchiveEntry]:
+        if sport in self._entries:
+            return self._entries[sport]
+        entries: list[ArchiveEntry] = []
+        sport_dir = os.path.join(self.archive_dir, sport)
+        index_names = (
+            [n for n in os.listdir(sport_dir) if n.endswith(".idx")]
+            if os.path.isdir(sport_dir)
+            else []
+        )
+        for index_name in index_names:
+            segment = os.path.join(sport_dir, index_name[: -len(".idx")] + ".dat")
+            try:
+                segment_size = os.path.getsize(segment)
+                f = open(os.path.join(sport_dir, index_name))
+            except FileNotFoundError:
+                # Pruned by the live run since we listed it
+                continue
+            with f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        # A half written last line from a process that was killed
+                        continue
+                    if row["offset"] + row["length"] > segment_size:
+                        continue
+                    entries.append(ArchiveEntry(sport=sport, segment=segment, **row))
+        entries.sort(key=lambda e: e.fetched_at)
+        self._entries[sport] = entries
+        for e in entries:
+            self._by_game.setdefault((sport, e.kind, e.game_id), []).append(e)
+        return entries
+
+
+_payload_archive: PayloadArchive | None = None
+
+
+def get_payload_archive() -> PayloadArchive | None:
+    """The archive shared by every client in this process, if PAYLOAD_ARCHIVE_DIR is set."""
+    global _payload_archive
+    archive_dir = os.environ.get("PAYLOAD_ARCHIVE_DIR")
+    if not archive_dir:
+        return None
+    if _payload_archive is None:
+        _payload_archive = PayloadArchive(
+            archive_dir,
+            max_bytes=int(
+                os.environ.get("PAYLOAD_ARCHIVE_MAX_BYTES", str(DEFAULT_MAX_BYTES))
+            ),
+        )
+    return _payload_archive
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import functools
+import unicodedata
+from dataclasses import dataclass
+
+# The feed's text leaves these off some names, and adds them to others
+SUFFIXES = {"jr", "sr", "ii", "iii", "iv", "v"}
+_PUNCTUATION = str.maketrans("", "", ".,'’‘`")
+# Marks a node where a name ends. Never a normalized word, those have no spaces.
+_END = " "
+
+
+@dataclass
+class RosterMatch:
+    player_id: int
+    player_name: str  # As on the roster
+    rest: str  # The text after the name
+
+
+class RosterIndex:
+    """
+    Finds which player of a roster a play's text starts with.
+
+    The names are kept in a trie of normalized words, so one pass over the text finds the
+    longest name it starts with, however many words that is. Each name is also indexed
+    without its suffix, since the text has "Kenneth Walker" for "Kenneth Walker III".
+    """
+
+    def __init__(self, roster: dict[str, int]) -> None:
+        self.roster = roster
+        self._root: dict = {}
+        self._most_words = 0
+        # Names without their suffix first, so a player whose name that really is wins
+        for name, player_id in roster.items():
+            words = _words(name)
+            if len(words) > 2 and words[-1] in SUFFIXES:
+                self._insert(words[:-1], name, player_id)
+        for name, player_id in roster.items():
+            self._insert(_words(name), name, player_id)
+
+    def match(self, text: str) -> RosterMatch | None:
+        """The player with the longest name that text starts with."""
+        # Only as many words as the longest name, the rest stays in one piece
+        words = text.split(maxsplit=self._most_words)
+        node = self._root
+        found: tuple[int, str] | None = None
+        found_words = 0
+        for i, word in enumerate(words):
+            child = node.get(normalize(word))
+            if child is None:
+                break
+            node = child
+            if _END in node:
+                found = node[_END]
+                found_words = i + 1
+        if found is None:
+            return None
+        return RosterMatch(found[0], found[1], " ".join(words[found_words:]))
+
+    def _insert(self, words: list[str], name: str, player_id: int) -> None:
+        node = self._root
+        for word in words:
+            node = node.setdefault(word, {})
+        node[_END] = (player_id, name)
+        self._most_words = max(self._most_words, len(words))
+
+
+# Names and the first words of plays repeat all season
+@functools.lru_cache(maxsize=8192)
+def normalize(word: str) -> str:
+    """Lowercase, without accents or punctuation, like Ja'Marr to jamarr and St. to st."""
+    if word.isascii():
+        return word.translate(_PUNCTUATION).lower()
+    decomposed = unicodedata.normalize("NFKD", word)
+    return (
+        "".join(c for c in decomposed if not unicodedata.combining(c))
+        .translate(_PUNCTUATION)
+        .casefold()
+    )
+
+
+def _words(name: str) -> list[str]:
+    return [w for w in (normalize(w) for w in name.split()) if w]
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import contextlib
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterator
+
+DEFAULT_INTERVAL_MS = 5
+# The report only shows the line that allocated, and every extra frame slows tracing down
+TRACEMALLOC_FRAMES = 1
+TOP_ALLOCATIONS = 10
+TOP_FUNCTIONS = 25
+
+
+@dataclass
+class StageStats:
+    name: str
+    seconds: float = 0.0
+    start_bytes: int = 0
+    end_bytes: int = 0
+    peak_bytes: int = 0
+    # (size_diff, count_diff, where) of the lines that allocated the most during the stage
+    top_allocations: list[tuple[int, int, str]] = field(default_factory=list)
+
+
+class RunProfiler:
+    """
+    Samples the CPU and traces allocations while a run processes one sport.
+
+    A thread samples the stack of the thread being profiled every interval_ms, and each
+    sample is charged to the stage running at the time. tracemalloc records the peak and
+    the lines that allocated the most in each stage. Nothing runs unless PROFILE_DIR is set,
+    where each run writes a report, and with PROFILE_COLLAPSED=true a collapsed stack file
+    for flamegraph.pl or speedscope.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        interval_ms: float = DEFAULT_INTERVAL_MS,
+        collapsed: bool = False,
+    ) -> None:
+        self.output_dir = output_dir
+        self.interval_ms = interval_ms
+        self.collapsed = collapsed
+        # "stage;outermost frame;...;innermost frame" -> samples
+        self.samples: Counter[str] = Counter()
+        self.stages: list[StageStats] = []
+        self._stage = "run"
+        # Peak so far of each stage we are in, outermost first
+        self._open_peaks: list[int] = []
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> RunProfiler | None:
+        output_dir = os.environ.get("PROFILE_DIR")
+        if not output_dir:
+            return None
+        return cls(
+            output_dir,
+            interval_ms=float(
+                os.environ.get("PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS)
+            ),
+            collapsed=os.environ.get("PROFILE_COLLAPSED", "false").lower() == "true",
+        )
+
+    @contextlib.contextmanager
+    def profile(self) -> Iterator[None]:
+        """Profile the current thread until the block exits."""
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._stopped.clear()
+        sampler = threading.Thread(
+            target=self._sample, args=(threading.get_ident(),), daemon=True
+        )
+        sampler.start()
+        try:
+            with self.stage("run"):
+                yield
+        finally:
+            self._stopped.set()
+            sampler.join()
+            if started_tracing:
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        outer = self._stage
+        self._stage = name
+        before = tracemalloc.take_snapshot()
+        start_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        # Resetting the peak for this stage would lose it for the stages around it
+        self._open_peaks = [max(p, peak_bytes) for p in self._open_peaks]
+        self._open_peaks.append(start_bytes)
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            end_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            peak_bytes = max(peak_bytes, self._open_peaks.pop())
+            after = tracemalloc.take_snapshot()
+            self._stage = outer
+            top = after.compare_to(before, "lineno")[:TOP_ALLOCATIONS]
+            self.stages.append(
+                StageStats(
+                    name=name,
+                    seconds=seconds,
+                    start_bytes=start_bytes,
+                    end_bytes=end_bytes,
+                    peak_bytes=peak_bytes,
+                    top_allocations=[
+                        (s.size_diff, s.count_diff, str(s.traceback[0])) for s in top
+                    ],
+                )
+            )
+
+    def report(self) -> str:
+        total = sum(self.samples.values())
+        lines = [f"{total} samples every {self.interval_ms:g}ms"]
+        lines.append("\nStages, in the order they finished")
+        for s in self.stages:
+            lines.append(
+                f"  {s.name}: {s.seconds:.2f}s, "
+                f"peak {_mib(s.peak_bytes)}, {_mib(s.start_bytes)} -> {_mib(s.end_bytes)}"
+            )
+            for size_diff, count_diff, where in s.top_allocations:
+                lines.append(
+                    f"    {size_diff / 1024:+9.0f} KiB {count_diff:+7} {where}"
+                )
+
+        own: Counter[str] = Counter()
+        cumulative: Counter[str] = Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                cumulative[frame] += count
+        lines.append("\nFunctions by own samples (own, cumulative)")
+        for frame, count in own.most_common(TOP_FUNCTIONS):
+            lines.append(
+                f"  {_percent(count, total)} {_percent(cumulative[frame], total)}  {frame}"
+            )
+        return "\n".join(lines)
+
+    def write(self, name: str) -> list[str]:
+        """Write the report, and the collapsed stacks if asked for. Returns the paths."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(
+            self.output_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        )
+        paths = [f"{base}.txt"]
+        with open(paths[0], "w") as f:
+            f.write(self.report() + "\n")
+        if self.collapsed:
+            paths.append(f"{base}.collapsed")
+            with open(paths[1], "w") as f:
+                for stack, count in sorted(self.samples.items()):
+                    f.write(f"{stack} {count}\n")
+        return paths
+
+    def _sample(self, thread_id: int) -> None:
+        interval = self.interval_ms / 1000
+        while not self._stopped.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            frames.append(self._stage)
+            self.samples[";".join(reversed(frames))] += 1
+
+
+def _mib(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MiB"
+
+
+def _percent(count: int, total: int) -> str:
+    return f"{100 * count / total if total else 0:5.1f}%"
+
+
+_active: RunProfiler | None = None
+
+
+@contextlib.contextmanager
+def profiled(name: str) -> Iterator[None]:
+    """Profile the block if PROFILE_DIR is set, and write the results as name-<time>.txt."""
+    global _active
+    profiler = RunProfiler.from_env()
+    if profiler is None:
+        yield
+        return
+    _active = profiler
+    try:
+        with profiler.profile():
+            yield
+    finally:
+        _active = None
+        for path in profiler.write(name):
+            print(f"Wrote profile {path}")
+
+
+def stage(name: str) -> contextlib.AbstractContextManager:
+    """Mark a stage of the profiled run. Does nothing when no run is being profiled."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import dataclasses
+import io
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from clients import deadline
+from my_types import ImageInput, Sport, State, clean_player_name
+
+DEFAULT_WORKERS = 4
+# What a matched tweet waits for a scorecard that is still rendering
+WAIT_SECONDS = 70
+
+
+@dataclass
+class SpeculationStats:
+    rendered: int = 0  # Guesses started
+    hits: int = 0  # Matched tweets whose scorecard was guessed
+    misses: int = 0  # Matched tweets that had to render theirs
+    discarded: int = 0  # Guesses dropped unused once the state moved on
+    seconds_saved: float = 0.0
+
+
+class ScorecardCache:
+    """
+    Renders the scorecards of a sport's likely next matches before they happen.
+
+    Whoever matches next, their scorecard only depends on the state and who they are. After
+    each run, every player seen in the active games whose name has the current letter, or
+    the one after it, gets theirs rendered in background threads, the players seen most
+    often first, up to max_renders. A matched tweet takes its scorecard from here if it was
+    guessed, waiting for it if it is still rendering. Guesses for letters the state has
+    moved past are dropped. Set SPECULATIVE_RENDERS to max_renders to use it.
+    """
+
+    def __init__(
+        self,
+        sport: Sport,
+        max_renders: int,
+        workers: int = DEFAULT_WORKERS,
+        render: Callable[[ImageInput], bytes] | None = None,
+    ) -> None:
+        self.sport = sport
+        self.max_renders = max_renders
+        self.workers = workers
+        self._render = render or _render_scorecard
+        self._executor: ThreadPoolExecutor | None = None
+        # Key of the image input to its (image, seconds it took to render)
+        self.renders: dict[str, Future[tuple[bytes, float]]] = {}
+        self.stats = SpeculationStats()
+
+    @classmethod
+    def from_env(cls, sport: Sport) -> ScorecardCache | None:
+        max_renders = int(os.environ.get("SPECULATIVE_RENDERS", "0"))
+        if max_renders < 1:
+            return None
+        return cls(sport, max_renders)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix=f"scorecards-{self.sport}"
+            )
+        return self._executor
+
+    def speculate(
+        self, state: State, players: Counter[tuple[int, str]], season_phrase: str
+    ) -> int:
+        """Start rendering for the likeliest next matches. Returns how many were started."""
+        wanted: dict[str, ImageInput] = {}
+        for letter_state in (state, _after_one_match(state)):
+            for (player_id, player_name), _ in players.most_common():
+                if len(wanted) >= self.max_renders:
+                    break
+                name_letters = clean_player_name(player_name)
+                if letter_state.current_letter not in name_letters:
+                    continue
+                # What the state would be after this player's match, like tweet_matched
+                after = dataclasses.replace(letter_state)
+                matching_letters = after.match_letters(name_letters)
+                image_input = ImageInput(
+                    completed_at=0,
+                    matching_letters=matching_letters,
+                    next_letter=after.current_letter,
+                    player_id=player_id,
+                    player_name=player_name,
+                    season_phrase=season_phrase,
+                    sport=self.sport,
+                    times_cycled=after.times_cycled,
+                    tweet_id="1",
+                )
+                wanted[_key(image_input)] = image_input
+
+        for key in list(self.renders):
+            if key not in wanted:
+                self.renders.pop(key).cancel()
+                self.stats.discarded += 1
+        started = 0
+        for key, image_input in wanted.items():
+            if key not in self.renders:
+                self.renders[key] = self.executor.submit(
+                    self._timed_render, image_input
+                )
+                started += 1
+        self.stats.rendered += started
+        return started
+
+    def get(self, image_input: ImageInput) -> io.BytesIO | None:
+        """The scorecard if it was guessed, None to render it as usual."""
+        future = self.renders.pop(_key(image_input), None)
+        if future is None:
+            self.stats.misses += 1
+            return None
+        waited_from = time.perf_counter()
+        try:
+            image, render_seconds = future.result(timeout=deadline.clamp(WAIT_SECONDS))
+        except Exception as e:
+            # A guess that failed is only a miss
+            print(f"Speculative scorecard for {image_input.player_name} failed: {e}")
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self.stats.seconds_saved += max(
+            0.0, render_seconds - (time.perf_counter() - waited_from)
+        )
+        return io.BytesIO(image)
+
+    def report(self) -> str:
+        s = self.stats
+        matched = s.hits + s.misses
+        hit_rate = s.hits / matched if matched else 0.0
+        saved = s.seconds_saved / matched if matched else 0.0
+        return (
+            f"{self.sport} speculative scorecards: {s.hits} of {matched} matched tweets "
+            f"({hit_rate:.0%}), {saved:.1f}s saved per matched tweet. "
+            f"{s.rendered} rendered, {s.discarded} discarded, {len(self.renders)} kept"
+        )
+
+    def _timed_render(self, image_input: ImageInput) -> tuple[bytes, float]:
+        started = time.perf_counter()
+        image = self._render(image_input)
+        return image, time.perf_counter() - started
+
+
+def _after_one_match(state: State) -> State:
+    after = dataclasses.replace(state, current_letter=state.next_letter)
+    if after.current_letter == "A":
+        after.times_cycled += 1
+    return after
+
+
+def _key(image_input: ImageInput) -> str:
+    return json.dumps(dataclasses.asdict(image_input), sort_keys=True)
+
+
+def _render_scorecard(image_input: ImageInput) -> bytes:
+    from clients.image_client import ImageClient
+
+    return ImageClient().get_tweet_image(image_input).getvalue()
+
+
+_caches: dict[str, ScorecardCache | None] = {}
+
+
+def get_scorecard_cache(sport: Sport) -> ScorecardCache | None:
+    """The sport's cache, kept while the instance is warm, if SPECULATIVE_RENDERS is set."""
+    if sport not in _caches:
+        _caches[sport] = ScorecardCache.from_env(sport)
+    return _caches[sport]
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import io
+import os
+import string
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+# Pillow 10.1 has no type hints
+from PIL import Image, ImageDraw, ImageFont  # type: ignore
+
+from clients.local_state import local_state_path
+from my_types import ImageInput, Sport
+
+if TYPE_CHECKING:
+    from clients.abstract_sports_client import AbstractSportsClient
+
+WIDTH, HEIGHT = 1200, 675  # What Twitter shows uncropped
+HEADSHOT_BOX = (60, 150, 460, 550)
+TILE_SIZE, TILE_GAP = 56, 10
+TILES_LEFT, TILES_TOP = 520, 330
+TILES_PER_ROW = 9
+JPEG_QUALITY = 88
+NAME_SIZES = (56, 48, 40, 32)
+
+# Background, accent, text
+SPORT_COLORS: dict[str, tuple[tuple[int, int, int], ...]] = {
+    "MLB": ((12, 35, 64), (191, 13, 62), (255, 255, 255)),
+    "NHL": ((17, 17, 17), (233, 158, 36), (255, 255, 255)),
+    "NBA": ((23, 64, 139), (200, 16, 46), (255, 255, 255)),
+    "NFL": ((1, 51, 105), (213, 10, 10), (255, 255, 255)),
+}
+DONE_COLOR = (90, 90, 90)
+TILE_COLOR = (50, 50, 50)
+
+
+class ScorecardRenderer:
+    """
+    Draws a sport's scorecards here instead of calling the get_custom_scorecard function.
+
+    The background, title and empty letter tiles of each sport are drawn once into a
+    template, so a scorecard is the template with the headshot, name and letters of its match
+    drawn on. Headshots are kept decoded and sized in memory, and their downloads on disk.
+    The same ImageInput always gives the same bytes. Set SCORECARD_RENDERER=local to use it.
+    """
+
+    def __init__(
+        self, sport: Sport, sports_client: AbstractSportsClient | None = None
+    ) -> None:
+        self.sport = sport
+        self._sports_client = sports_client
+        self._template: Image.Image | None = None
+        self.headshots: dict[int, Image.Image] = {}
+
+    @property
+    def sports_client(self) -> AbstractSportsClient:
+        if self._sports_client is None:
+            from clients.sports_clients import get_sports_client
+
+            self._sports_client = get_sports_client(self.sport, dry_run=True)
+        return self._sports_client
+
+    @property
+    def template(self) -> Image.Image:
+        if self._template is None:
+            self._template = self._draw_template()
+        return self._template
+
+    def render(self, image_input: ImageInput) -> io.BytesIO:
+        background, accent, text = SPORT_COLORS[self.sport]
+        image = self.template.copy()
+        image.paste(self.headshot(image_input.player_id), HEADSHOT_BOX[:2])
+        draw = ImageDraw.Draw(image)
+
+        draw.text(
+            (520, 150),
+            image_input.player_name,
+            font=_fitting_font(draw, image_input.player_name, WIDTH - 520 - 40),
+            fill=text,
+        )
+        draw.text(
+            (520, 230),
+            " ".join(image_input.matching_letters),
+            font=_font(56),
+            fill=accent,
+        )
+        for letter in string.ascii_uppercase:
+            if letter in image_input.matching_letters:
+                self._draw_tile(draw, letter, fill=accent, color=text)
+            elif letter == image_input.next_letter:
+                self._draw_tile(draw, letter, fill=TILE_COLOR, color=text, outline=text)
+            elif letter < image_input.next_letter:
+                self._draw_tile(draw, letter, fill=DONE_COLOR, color=background)
+
+        times = image_input.times_cycled
+        draw.text(
+            (60, 590),
+            f"Next up: {image_input.next_letter}. Cycled through the alphabet "
+            f"{times} time{'' if times == 1 else 's'} {image_input.season_phrase}.",
+            font=_font(30),
+            fill=text,
+        )
+
+        b = io.BytesIO()
+        # No EXIF or timestamps, so the bytes only depend on the pixels
+        image.save(b, format="JPEG", quality=JPEG_QUALITY, optimize=False)
+        b.seek(0)
+        return b
+
+    def headshot(self, player_id: int) -> Image.Image:
+        """The player's picture, sized for the scorecard."""
+        if player_id not in self.headshots:
+            size = (
+                HEADSHOT_BOX[2] - HEADSHOT_BOX[0],
+                HEADSHOT_BOX[3] - HEADSHOT_BOX[1],
+            )
+            try:
+                picture = Image.open(io.BytesIO(self._picture(player_id)))
+                picture.load()
+            except Exception as e:
+                print(f"No headshot for {player_id}, using the default: {e}")
+                picture = Image.open(io.BytesIO(self._picture(None)))
+            self.headshots[player_id] = _fit(picture, size)
+        return self.headshots[player_id]
+
+    def _picture(self, player_id: int | None) -> bytes:
+        """The downloaded picture, from disk if we downloaded it before."""
+        name = "default" if player_id is None else str(player_id)
+        path = local_state_path(f"headshot_{self.sport}_{name}")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        if player_id is None:
+            picture = self.sports_client.get_default_player_picture()
+        else:
+            picture = self.sports_client.get_player_picture(player_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(picture)
+        os.replace(tmp_path, path)
+        return picture
+
+    def _draw_template(self) -> Image.Image:
+        background, accent, text = SPORT_COLORS[self.sport]
+        image = Image.new("RGB", (WIDTH, HEIGHT), background)
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, WIDTH, 110), fill=accent)
+        draw.text(
+            (60, 28),
+            f"{self.sports_client.alphabet_game_name} Alphabet Game",
+            font=_font(52),
+            fill=text,
+        )
+        for letter in string.ascii_uppercase:
+            self._draw_tile(draw, letter, fill=TILE_COLOR, color=DONE_COLOR)
+        return image
+
+    def _draw_tile(
+        self,
+        draw: ImageDraw.ImageDraw,
+        letter: str,
+        fill: tuple[int, int, int],
+        color: tuple[int, int, int],
+        outline: tuple[int, int, int] | None = None,
+    ) -> None:
+        row, column = divmod(string.ascii_uppercase.index(letter), TILES_PER_ROW)
+        left = TILES_LEFT + column * (TILE_SIZE + TILE_GAP)
+        top = TILES_TOP + row * (TILE_SIZE + TILE_GAP)
+        draw.rectangle(
+            (left, top, left + TILE_SIZE, top + TILE_SIZE),
+            fill=fill,
+            outline=outline,
+            width=3,
+        )
+        draw.text(
+            (left + TILE_SIZE // 2, top + TILE_SIZE // 2),
+            letter,
+            font=_font(34),
+            fill=color,
+            anchor="mm",
+        )
+
+
+@lru_cache(maxsize=None)
+def _font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    path = os.environ.get("SCORECARD_FONT")
+    if path:
+        return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size)
+
+
+def _fitting_font(
+    draw: ImageDraw.ImageDraw, text: str, width: int
+) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """The largest name font that keeps text within width."""
+    for size in NAME_SIZES[:-1]:
+        if draw.textlength(text, font=_font(size)) <= width:
+            return _font(size)
+    return _font(NAME_SIZES[-1])
+
+
+def _fit(picture: Image.Image, size: tuple[int, int]) -> Image.Image:
+    """Scaled to cover size and cropped around the center, on the tile color if transparent."""
+    picture = picture.convert("RGBA")
+    scale = max(size[0] / picture.width, size[1] / picture.height)
+    scaled = picture.resize(
+        (round(picture.width * scale), round(picture.height * scale)),
+        Image.Resampling.LANCZOS,
+    )
+    left = (scaled.width - size[0]) // 2
+    top = (scaled.height - size[1]) // 2
+    cropped = scaled.crop((left, top, left + size[0], top + size[1]))
+    fitted = Image.new("RGB", size, TILE_COLOR)
+    fitted.paste(cropped, (0, 0), cropped)
+    return fitted
+
+
+_renderers: dict[str, ScorecardRenderer] = {}
+
+
+def get_scorecard_renderer(sport: Sport) -> ScorecardRenderer:
+    """The sport's renderer, kept while the instance is warm."""
+    if sport not in _renderers:
+        _renderers[sport] = ScorecardRenderer(sport)
+    return _renderers[sport]
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import time
+from typing import TYPE_CHECKING
+
+from clients.local_state import local_state_path
+from my_types import GameWindow, Sport
+
+if TYPE_CHECKING:
+    from clients.abstract_sports_client import AbstractSportsClient
+
+# Refresh once a day, but look far enough ahead that a failed refresh doesn't leave us blind
+LOOKAHEAD_DAYS = 7
+
+
+class SeasonCalendar:
+    """
+    The known game windows for one sport, kept on local disk and refreshed daily from the schedule endpoint.
+
+    It lets a run skip a sport without building its clients or opening any connection.
+    """
+
+    def __init__(self, sport: Sport) -> None:
+        self.sport = sport
+        self.path = local_state_path(f"season_calendar_{sport}.json")
+        self.refreshed_on: str | None = None
+        self.windows: list[GameWindow] = []
+        self._load()
+
+    @property
+    def is_stale(self) -> bool:
+        return self.refreshed_on != datetime.date.today().isoformat()
+
+    def is_idle(self, now: float | None = None) -> bool:
+        """True only if we refreshed today and no known game window is open."""
+        if self.is_stale:
+            return False
+        now = time.time() if now is None else now
+        return not any(w.start <= now <= w.end for w in self.windows)
+
+    def refresh_if_stale(self, sports_client: AbstractSportsClient) -> None:
+        if not self.is_stale:
+            return
+        today = datetime.date.today()
+        try:
+            windows = sports_client.get_game_windows(
+                today - datetime.timedelta(days=1),
+                today + datetime.timedelta(days=LOOKAHEAD_DAYS),
+            )
+        except Exception as e:
+            # Stay stale, so we do full runs and try again next time
+            print(f"Could not refresh the {self.sport} season calendar: {e}")
+            return
+        self.windows = windows
+        self.refreshed_on = today.isoformat()
+        self._save()
+        print(f"Refreshed the {self.sport} season calendar, {len(windows)} games")
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.refreshed_on = data["refreshed_on"]
+        self.windows = [GameWindow(start=w[0], end=w[1]) for w in data["windows"]]
+
+    def _save(self) -> None:
+        # Write and rename so a run killed mid-write can't leave a half file behind
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "refreshed_on": self.refreshed_on,
+                    "windows": [[w.start, w.end] for w in self.windows],
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from clients.abstract_sports_client import AbstractSportsClient
+from my_types import Sport
+
+
+def get_sports_client(sport: Sport, dry_run: bool) -> AbstractSportsClient:
+    """Build the client for a sport, importing only that one."""
+    if sport == "MLB":
+        from clients.mlb_client import MLBClient
+
+        return MLBClient(dry_run=dry_run)
+    elif sport == "NHL":
+        from clients.nhl_client import NHLClient
+
+        return NHLClient(dry_run=dry_run)
+    elif sport == "NBA":
+        from clients.nba_client import NBAClient
+
+        return NBAClient(dry_run=dry_run)
+    elif sport == "NFL":
+        from clients.nfl_client import NFLClient
+
+        return NFLClient(dry_run=dry_run)
+    raise ValueError(f"Unknown sport: {sport}")
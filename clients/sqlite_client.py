@@ -0,0 +1,461 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+
+from clients import deadline
+from clients.abstract_sports_client import AbstractSportsClient
+from clients.local_state import local_state_path
+from clients.storage_client import LEASE_SECONDS, StateConflictError, StorageClient
+from my_types import (
+    Game,
+    KnownPlays,
+    OutboxEntry,
+    SeasonPeriod,
+    State,
+    TweetablePlay,
+)
+
+# Same tables as MySQL, plus mirrored_games to know which games a mirror has copied, and
+# mirror_versions for the version of the MySQL state they were copied at
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    sport TEXT PRIMARY KEY,
+    current_letter TEXT NOT NULL,
+    times_cycled INTEGER NOT NULL,
+    season TEXT NOT NULL,
+    tweet_id INTEGER NOT NULL,
+    scores_since_last_match INTEGER,
+    version INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS completed_games (
+    game_id TEXT NOT NULL,
+    sport TEXT NOT NULL,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (sport, game_id)
+);
+CREATE TABLE IF NOT EXISTS tweetable_plays (
+    game_id TEXT NOT NULL,
+    play_id TEXT NOT NULL,
+    sport TEXT NOT NULL,
+    completed_at TEXT,
+    tweet_id INTEGER,
+    player_name TEXT,
+    season_phrase TEXT,
+    season_period TEXT,
+    next_letter TEXT,
+    times_cycled INTEGER,
+    score TEXT,
+    tweet_text TEXT,
+    player_id INTEGER,
+    team_id INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tweetable_plays_sport_game_play
+    ON tweetable_plays (sport, game_id, play_id);
+CREATE INDEX IF NOT EXISTS tweetable_plays_completed_at
+    ON tweetable_plays (sport, completed_at);
+CREATE TABLE IF NOT EXISTS tweet_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    sport TEXT NOT NULL,
+    game_id TEXT NOT NULL,
+    play_id TEXT NOT NULL,
+    status_text TEXT NOT NULL,
+    is_reply INTEGER NOT NULL,
+    image_input TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    tweet_id INTEGER,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    posted_at TEXT
+);
+CREATE INDEX IF NOT EXISTS tweet_outbox_sport_status ON tweet_outbox (sport, status);
+CREATE TABLE IF NOT EXISTS mirrored_games (
+    game_id TEXT NOT NULL,
+    sport TEXT NOT NULL,
+    PRIMARY KEY (sport, game_id)
+);
+CREATE TABLE IF NOT EXISTS mirror_versions (
+    sport TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteClient(StorageClient):
+    """An embedded database with the MySQL schema. Used offline, and as a local mirror of MySQL."""
+
+    def __init__(
+        self,
+        dry_run: bool,
+        sports_client: AbstractSportsClient,
+        path: str | None = None,
+        state_key: str | None = None,
+    ) -> None:
+        super().__init__(dry_run, sports_client, state_key)
+        self.path = path or os.environ.get(
+            "SQLITE_PATH", local_state_path("alphabet_game.sqlite3")
+        )
+        # How long to wait on another process's write lock
+        self.connection = sqlite3.connect(
+            self.path, isolation_level=None, timeout=deadline.clamp(5)
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self._add_missing_state_columns()
+
+    def get_active_games(self, games: list[Game]) -> list[Game]:
+        if not games:
+            return []
+        completed_game_ids = {
+            row["game_id"]
+            for row in self.connection.execute(
+                f"SELECT game_id FROM completed_games WHERE sport = ? AND game_id IN ({self._placeholders(games)})",
+                [self.sport, *[g.game_id for g in games]],
+            )
+        }
+        return [g for g in games if g.game_id not in completed_game_ids]
+
+    def set_completed_games(self, games: list[Game]) -> None:
+        complete_games = [g for g in games if g.is_complete]
+        if complete_games and not self.dry_run:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO completed_games (game_id, sport, completed_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
+                [(g.game_id, self.sport) for g in complete_games],
+            )
+
+    def get_known_plays(self, games: list[Game]) -> KnownPlays:
+        if not games:
+            return {}
+        known_plays: KnownPlays = {}
+        for row in self.connection.execute(
+            f"SELECT play_id, game_id FROM tweetable_plays WHERE sport = ? AND game_id IN ({self._placeholders(games)})",
+            [self.sport, *[g.game_id for g in games]],
+        ):
+            known_plays.setdefault(row["game_id"], []).append(row["play_id"])
+        return known_plays
+
+    def add_tweetable_play(
+        self, tweetable_play: TweetablePlay, state: State, is_match: bool
+    ) -> None:
+        if self.dry_run:
+            return
+        self.connection.execute(
+            """
+            INSERT OR REPLACE INTO tweetable_plays (game_id, play_id, sport, completed_at,
+            tweet_id, player_name, season_phrase, season_period, next_letter, times_cycled, score, tweet_text, player_id, team_id)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                tweetable_play.game_id,
+                tweetable_play.play_id,
+                self.sport,
+                tweetable_play.tweet_id or -1,
+                tweetable_play.player_name,
+                tweetable_play.season_phrase,
+                tweetable_play.season_period.value,
+                state.current_letter,
+                state.times_cycled,
+                tweetable_play.score,
+                tweetable_play.tweet_text,
+                tweetable_play.player_id,
+                tweetable_play.player_team_id,
+            ),
+        )
+
+    def get_initial_state(self) -> State:
+        row = self.connection.execute(
+            "SELECT current_letter, times_cycled, season, tweet_id, scores_since_last_match, version FROM state WHERE sport = ?",
+            (self.sport,),
+        ).fetchone()
+        if row is None:
+            # A new local database starts the game from scratch
+            print(f"No {self.sport} state in {self.path}, starting at A")
+            self.connection.execute(
+                "INSERT INTO state (sport, current_letter, times_cycled, season, tweet_id, scores_since_last_match) VALUES (?, 'A', 0, ?, 0, 0)",
+                (self.sport, SeasonPeriod.REGULAR_SEASON.value),
+            )
+            return self.get_initial_state()
+        return State(
+            current_letter=row["current_letter"],
+            initial_current_letter=row["current_letter"],
+            times_cycled=row["times_cycled"],
+            initial_times_cycled=row["times_cycled"],
+            season=row["season"],
+            initial_season=row["season"],
+            tweet_id=row["tweet_id"],
+            initial_tweet_id=row["tweet_id"],
+            scores_since_last_match=row["scores_since_last_match"],
+            initial_scores_since_last_match=row["scores_since_last_match"],
+            version=row["version"],
+        )
+
+    def update_state(self, state: State) -> None:
+        if self._state_unchanged(state):
+            print("No state change")
+            return
+        print("Updated state", state)
+        if not self.dry_run:
+            cursor = self.connection.execute(
+                "UPDATE state SET current_letter = ?, times_cycled = ?, season = ?, tweet_id = ?, scores_since_last_match = ?, version = version + 1 WHERE sport = ? AND version = ?",
+                (
+                    state.current_letter,
+                    state.times_cycled,
+                    state.season,
+                    state.tweet_id,
+                    state.scores_since_last_match,
+                    self.sport,
+                    state.version,
+                ),
+            )
+            if cursor.rowcount != 1:
+                raise StateConflictError(
+                    f"{self.sport} state is no longer at version {state.version}"
+                )
+            state.version += 1
+
+    def acquire_lease(self) -> bool:
+        if self.dry_run:
+            return True
+        # Make sure there is a row to lease
+        self.get_initial_state()
+        cursor = self.connection.execute(
+            """
+            UPDATE state SET lease_owner = ?, lease_expires_at = CAST(strftime('%s', 'now') AS INTEGER) + ?
+            WHERE sport = ? AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires_at < CAST(strftime('%s', 'now') AS INTEGER))
+            """,
+            (self.lease_owner, LEASE_SECONDS, self.sport, self.lease_owner),
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self) -> None:
+        if not self.dry_run:
+            self.connection.execute(
+                "UPDATE state SET lease_owner = NULL, lease_expires_at = NULL WHERE sport = ? AND lease_owner = ?",
+                (self.sport, self.lease_owner),
+            )
+
+    def record_play(
+        self,
+        tweetable_play: TweetablePlay,
+        state: State,
+        is_match: bool,
+        outbox_entry: OutboxEntry | None,
+    ) -> None:
+        if self.dry_run:
+            self.update_state(state)
+            return
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.update_state(state)
+            self.add_tweetable_play(tweetable_play, state, is_match)
+            if outbox_entry:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO tweet_outbox (idempotency_key, sport, game_id, play_id, status_text, is_reply, image_input) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    self._outbox_row(outbox_entry),
+                )
+
+    def get_pending_tweets(self) -> list[OutboxEntry]:
+        return [
+            self._outbox_entry(row)
+            for row in self.connection.execute(
+                "SELECT * FROM tweet_outbox WHERE sport = ? AND status IN ('pending', 'sending') ORDER BY id",
+                (self.sport,),
+            )
+        ]
+
+    def mark_tweet_sending(self, entry: OutboxEntry) -> None:
+        self._set_outbox_status(entry, "sending")
+
+    def mark_tweet_posted(self, entry: OutboxEntry, state: State) -> None:
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.update_state(state)
+            self.connection.execute(
+                "UPDATE tweetable_plays SET tweet_id = ? WHERE sport = ? AND game_id = ? AND play_id = ?",
+                (entry.tweet_id, self.sport, entry.game_id, entry.play_id),
+            )
+            self.connection.execute(
+                "UPDATE tweet_outbox SET status = 'posted', tweet_id = ?, posted_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (entry.tweet_id, entry.entry_id),
+            )
+        entry.status = "posted"
+
+    def mark_tweet_skipped(self, entry: OutboxEntry) -> None:
+        self._set_outbox_status(entry, "skipped")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _set_outbox_status(self, entry: OutboxEntry, status: str) -> None:
+        self.connection.execute(
+            "UPDATE tweet_outbox SET status = ? WHERE id = ?", (status, entry.entry_id)
+        )
+        entry.status = status
+
+    def unmirrored_games(self, games: list[Game], version: int) -> list[Game]:
+        """Games not copied yet. Every copy is forgotten once the state isn't at version."""
+        row = self.connection.execute(
+            "SELECT version FROM mirror_versions WHERE sport = ?", (self.sport,)
+        ).fetchone()
+        if row is None or row["version"] != version:
+            # Another instance wrote, so any game may have plays we haven't seen
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.execute(
+                    "DELETE FROM mirrored_games WHERE sport = ?", (self.sport,)
+                )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO mirror_versions (sport, version) VALUES (?, ?)",
+                    (self.sport, version),
+                )
+        if not games:
+            return []
+        mirrored_game_ids = {
+            row["game_id"]
+            for row in self.connection.execute(
+                f"SELECT game_id FROM mirrored_games WHERE sport = ? AND game_id IN ({self._placeholders(games)})",
+                [self.sport, *[g.game_id for g in games]],
+            )
+        }
+        return [g for g in games if g.game_id not in mirrored_game_ids]
+
+    def load_known_plays(self, games: list[Game], known_plays: KnownPlays) -> None:
+        """Copy known plays from the primary database, then trust the mirror for these games."""
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO tweetable_plays (game_id, play_id, sport) VALUES (?, ?, ?)",
+                [
+                    (game_id, play_id, self.sport)
+                    for game_id, play_ids in known_plays.items()
+                    for play_id in play_ids
+                ],
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO mirrored_games (game_id, sport) VALUES (?, ?)",
+                [(g.game_id, self.sport) for g in games],
+            )
+
+    def advance_mirrored_version(self, version: int, new_version: int) -> None:
+        """Our own write moved the state on, so the copies made at version are still current."""
+        if new_version != version:
+            self.connection.execute(
+                "UPDATE mirror_versions SET version = ? WHERE sport = ? AND version = ?",
+                (new_version, self.sport, version),
+            )
+
+    def _add_missing_state_columns(self) -> None:
+        # Databases created before state was versioned
+        columns = {
+            row["name"] for row in self.connection.execute("PRAGMA table_info(state)")
+        }
+        for column, definition in [
+            ("version", "INTEGER NOT NULL DEFAULT 0"),
+            ("lease_owner", "TEXT"),
+            ("lease_expires_at", "INTEGER"),
+        ]:
+            if column not in columns:
+                self.connection.execute(
+                    f"ALTER TABLE state ADD COLUMN {column} {definition}"
+                )
+
+    @staticmethod
+    def _placeholders(games: list[Game]) -> str:
+        return ",".join("?" for _ in games)
+
+
+class MirroredStorageClient(StorageClient):
+    """
+    MySQL stays the source of truth, but known plays are read from a local SQLite mirror.
+
+    A game's known plays are copied from MySQL the first time we see it, after that the
+    mirror is kept current by writing every play to both. The copies are only trusted while
+    the MySQL state is at the version our own writes left it at. Once another instance has
+    moved it on, like with leases or split sports, every game is copied again.
+    """
+
+    def __init__(self, primary: StorageClient, mirror: SQLiteClient) -> None:
+        self.sport = primary.sport
+        self.dry_run = primary.dry_run
+        self.primary = primary
+        self.mirror = mirror
+        # The state version of this run, as loaded and as our own writes left it
+        self.version: int | None = None
+
+    def get_active_games(self, games: list[Game]) -> list[Game]:
+        return self.primary.get_active_games(games)
+
+    def set_completed_games(self, games: list[Game]) -> None:
+        self.primary.set_completed_games(games)
+        self.mirror.set_completed_games(games)
+
+    def get_known_plays(self, games: list[Game]) -> KnownPlays:
+        # The run has normally loaded the state already, so MySQL isn't asked again
+        version = self.version
+        if version is None:
+            version = self.get_initial_state().version
+        unmirrored_games = self.mirror.unmirrored_games(games, version)
+        if unmirrored_games:
+            self.mirror.load_known_plays(
+                unmirrored_games, self.primary.get_known_plays(unmirrored_games)
+            )
+        return self.mirror.get_known_plays(games)
+
+    def add_tweetable_play(
+        self, tweetable_play: TweetablePlay, state: State, is_match: bool
+    ) -> None:
+        self.primary.add_tweetable_play(tweetable_play, state, is_match)
+        self.mirror.add_tweetable_play(tweetable_play, state, is_match)
+
+    def get_initial_state(self) -> State:
+        state = self.primary.get_initial_state()
+        self.version = state.version
+        return state
+
+    def update_state(self, state: State) -> None:
+        version = state.version
+        self.primary.update_state(state)
+        self._advance(version, state)
+
+    def acquire_lease(self) -> bool:
+        return self.primary.acquire_lease()
+
+    def release_lease(self) -> None:
+        self.primary.release_lease()
+
+    def record_play(
+        self,
+        tweetable_play: TweetablePlay,
+        state: State,
+        is_match: bool,
+        outbox_entry: OutboxEntry | None,
+    ) -> None:
+        version = state.version
+        self.primary.record_play(tweetable_play, state, is_match, outbox_entry)
+        self.mirror.add_tweetable_play(tweetable_play, state, is_match)
+        self._advance(version, state)
+
+    def get_pending_tweets(self) -> list[OutboxEntry]:
+        return self.primary.get_pending_tweets()
+
+    def mark_tweet_sending(self, entry: OutboxEntry) -> None:
+        self.primary.mark_tweet_sending(entry)
+
+    def mark_tweet_posted(self, entry: OutboxEntry, state: State) -> None:
+        version = state.version
+        self.primary.mark_tweet_posted(entry, state)
+        self._advance(version, state)
+
+    def mark_tweet_skipped(self, entry: OutboxEntry) -> None:
+        self.primary.mark_tweet_skipped(entry)
+
+    def close(self) -> None:
+        self.primary.close()
+        self.mirror.close()
+
+    def _advance(self, version: int, state: State) -> None:
+        self.mirror.advance_mirrored_version(version, state.version)
+        self.version = state.version
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+import socket
+import uuid
+from abc import ABC, abstractmethod
+
+from clients.abstract_sports_client import AbstractSportsClient
+from my_types import Game, ImageInput, KnownPlays, OutboxEntry, State, TweetablePlay
+
+# Longer than the function timeout, so a lease only outlives its run if the run was killed
+LEASE_SECONDS = 180
+
+
+class StateConflictError(Exception):
+    """Someone else updated the state since we read it."""
+
+
+class StorageClient(ABC):
+    """Where we keep the state, the completed games and the tweetable plays of one sport."""
+
+    def __init__(
+        self,
+        dry_run: bool,
+        sports_client: AbstractSportsClient,
+        state_key: str | None = None,
+    ) -> None:
+        # What the rows are keyed by. The sport, or a variant of its game, see variants.py.
+        self.sport: str = state_key or sports_client.sport
+        self.dry_run = dry_run
+        self.lease_owner = (
+            f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        )
+
+    @abstractmethod
+    def get_active_games(self, games: list[Game]) -> list[Game]:
+        pass
+
+    @abstractmethod
+    def set_completed_games(self, games: list[Game]) -> None:
+        pass
+
+    @abstractmethod
+    def get_known_plays(self, games: list[Game]) -> KnownPlays:
+        """
+        In prior runs, we should record which plays we've already processed.
+        """
+        pass
+
+    @abstractmethod
+    def add_tweetable_play(
+        self, tweetable_play: TweetablePlay, state: State, is_match: bool
+    ) -> None:
+        pass
+
+    @abstractmethod
+    def get_initial_state(self) -> State:
+        pass
+
+    @abstractmethod
+    def update_state(self, state: State) -> None:
+        """Compare and swap on state.version. Raises StateConflictError if it moved."""
+        pass
+
+    @abstractmethod
+    def acquire_lease(self) -> bool:
+        """Claim the sport for LEASE_SECONDS. False if another run holds it."""
+        pass
+
+    @abstractmethod
+    def release_lease(self) -> None:
+        pass
+
+    @abstractmethod
+    def record_play(
+        self,
+        tweetable_play: TweetablePlay,
+        state: State,
+        is_match: bool,
+        outbox_entry: OutboxEntry | None,
+    ) -> None:
+        """In one transaction: update the state, add the play and queue its tweet, if any."""
+        pass
+
+    @abstractmethod
+    def get_pending_tweets(self) -> list[OutboxEntry]:
+        """Queued and unconfirmed tweets, oldest first."""
+        pass
+
+    @abstractmethod
+    def mark_tweet_sending(self, entry: OutboxEntry) -> None:
+        pass
+
+    @abstractmethod
+    def mark_tweet_posted(self, entry: OutboxEntry, state: State) -> None:
+        """In one transaction: confirm the tweet, set its play's tweet_id and update the state."""
+        pass
+
+    @abstractmethod
+    def mark_tweet_skipped(self, entry: OutboxEntry) -> None:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _outbox_row(entry: OutboxEntry) -> tuple:
+        """Values for the insert columns of tweet_outbox, in order."""
+        return (
+            entry.idempotency_key,
+            entry.sport,
+            entry.game_id,
+            entry.play_id,
+            entry.status_text,
+            entry.is_reply,
+            json.dumps(dataclasses.asdict(entry.image_input))
+            if entry.image_input
+            else None,
+        )
+
+    @staticmethod
+    def _outbox_entry(row) -> OutboxEntry:
+        return OutboxEntry(
+            idempotency_key=row["idempotency_key"],
+            sport=row["sport"],
+            game_id=row["game_id"],
+            play_id=row["play_id"],
+            status_text=row["status_text"],
+            is_reply=bool(row["is_reply"]),
+            image_input=ImageInput(**json.loads(row["image_input"]))
+            if row["image_input"]
+            else None,
+            status=row["status"],
+            tweet_id=row["tweet_id"],
+            entry_id=row["id"],
+        )
+
+    @staticmethod
+    def _state_unchanged(state: State) -> bool:
+        return (
+            state.current_letter == state.initial_current_letter
+            and state.times_cycled == state.initial_times_cycled
+            and state.season == state.initial_season
+            and state.tweet_id == state.initial_tweet_id
+            and state.scores_since_last_match == state.initial_scores_since_last_match
+        )
+
+
+def get_storage_client(
+    dry_run: bool,
+    sports_client: AbstractSportsClient,
+    state_key: str | None = None,
+) -> StorageClient:
+    """
+    Pick the backend with STORAGE_BACKEND.
+
+    mysql (the default) is the real database. sqlite is a local file, for offline dry runs and tests.
+    mirror reads known plays from a local SQLite copy and writes through to both.
+    """
+    backend = os.environ.get("STORAGE_BACKEND", "mysql").lower()
+    if backend == "sqlite":
+        from clients.sqlite_client import SQLiteClient
+
+        return SQLiteClient(
+            dry_run=dry_run, sports_client=sports_client, state_key=state_key
+        )
+
+    from clients.mysql_client import MySQLClient
+
+    mysql_client = MySQLClient(
+        dry_run=dry_run, sports_client=sports_client, state_key=state_key
+    )
+    if backend == "mirror":
+        from clients.sqlite_client import MirroredStorageClient, SQLiteClient
+
+        return MirroredStorageClient(
+            primary=mysql_client,
+            mirror=SQLiteClient(
+                dry_run=dry_run, sports_client=sports_client, state_key=state_key
+            ),
+        )
+    return mysql_client
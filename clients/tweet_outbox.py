@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from clients import deadline
+from my_types import ImageInput, OutboxEntry, State, TweetablePlay
+
+if TYPE_CHECKING:
+    from clients.abstract_sports_client import AbstractSportsClient
+    from clients.storage_client import StorageClient
+    from clients.twitter_client import TwitterClient
+
+
+class TweetOutbox:
+    """
+    Detect first, post later.
+
+    enqueue() saves a play, its state change and the tweet it needs in one transaction, so
+    slow Twitter or scorecard calls never hold up detection. drain() then posts the queued
+    tweets in order. Each entry is marked as sending before it goes out, and an entry found
+    in that status on a later run is looked up on our timeline before it is posted again.
+    """
+
+    def __init__(
+        self,
+        storage_client: StorageClient,
+        sports_client: AbstractSportsClient,
+        dry_run: bool,
+    ) -> None:
+        self.storage_client = storage_client
+        self.sports_client = sports_client
+        self.dry_run = dry_run
+        self._twitter_client: TwitterClient | None = None
+        # A matched tweet queued this run starts a thread for unmatched plays to reply to
+        self._thread_queued = False
+
+    @property
+    def twitter_client(self) -> TwitterClient:
+        if self._twitter_client is None:
+            from clients.twitter_client import TwitterClient
+
+            self._twitter_client = TwitterClient(self.sports_client, self.dry_run)
+        return self._twitter_client
+
+    def enqueue(
+        self, tweetable_play: TweetablePlay, state: State, matching_letters: list[str]
+    ) -> None:
+        """Same state changes as TwitterClient.tweet_matched and tweet_unmatched, minus the posting."""
+        entry = None
+        if matching_letters:
+            tweetable_play.tweet_text = self.twitter_client.matched_text(
+                tweetable_play, state, matching_letters
+            )
+            entry = self._entry(
+                tweetable_play,
+                is_reply=False,
+                image_input=self.twitter_client.image_input(
+                    tweetable_play, state, matching_letters
+                ),
+            )
+            state.scores_since_last_match = 0
+            self._thread_queued = True
+        elif state.tweet_id or self._thread_queued:
+            if state.scores_since_last_match is not None:
+                state.scores_since_last_match += 1
+            tweetable_play.tweet_text = self.twitter_client.unmatched_text(
+                tweetable_play, state
+            )
+            if self.twitter_client.posts_unmatched(state):
+                entry = self._entry(tweetable_play, is_reply=True)
+            else:
+                tweetable_play.tweet_id = -1
+        print(tweetable_play.tweet_text)
+        self.storage_client.record_play(
+            tweetable_play, state, bool(matching_letters), entry
+        )
+
+    async def drain(self, state: State) -> None:
+        for entry in self.storage_client.get_pending_tweets():
+            # Whatever is left stays queued for the next run
+            deadline.check(
+                deadline.MATCHED_TWEET_SECONDS
+                if entry.image_input
+                else deadline.UNMATCHED_TWEET_SECONDS,
+                f"tweet {entry.idempotency_key}",
+            )
+            if entry.status == "sending":
+                # A run died between posting and saving the tweet id
+                entry.tweet_id = self.twitter_client.find_recent_tweet(
+                    entry.status_text
+                )
+                if entry.tweet_id:
+                    print(f"{entry.idempotency_key} was already posted")
+            if entry.tweet_id is None:
+                if entry.is_reply and not state.tweet_id:
+                    self.storage_client.mark_tweet_skipped(entry)
+                    continue
+                self.storage_client.mark_tweet_sending(entry)
+                entry.tweet_id = await self.twitter_client.post(
+                    entry.status_text,
+                    image_input=entry.image_input,
+                    in_reply_to=state.tweet_id if entry.is_reply else None,
+                )
+            state.tweet_id = entry.tweet_id
+            self.storage_client.mark_tweet_posted(entry, state)
+
+    def _entry(
+        self,
+        tweetable_play: TweetablePlay,
+        is_reply: bool,
+        image_input: ImageInput | None = None,
+    ) -> OutboxEntry:
+        return OutboxEntry(
+            idempotency_key=f"{self.sports_client.sport}:{tweetable_play.game_id}:{tweetable_play.play_id}",
+            sport=self.sports_client.sport,
+            game_id=tweetable_play.game_id,
+            play_id=tweetable_play.play_id,
+            status_text=tweetable_play.tweet_text,
+            is_reply=is_reply,
+            image_input=image_input,
+        )
@@ -1,15 +1,35 @@
 from __future__ import annotations
 
+import asyncio
+import html
+import io
+import os
 import random
+import time
+from typing import TYPE_CHECKING
 
 import tweepy  # type: ignore
 
+from clients import deadline
 from clients.abstract_sports_client import AbstractSportsClient
 from clients.image_client import ImageClient
+from clients.media_optimizer import (
+    DEFAULT_FILENAME,
+    MediaUpload,
+    ProcessedMedia,
+    get_media_optimizer,
+    get_upload_log,
+)
 from my_types import ImageInput, State, TweetablePlay
 
+if TYPE_CHECKING:
+    from clients.async_twitter_client import AsyncTwitterClient
+
 SAD_EMOJIS = ["😭", "😢", "❌", "😔"]
 
+# Per Twitter call, and never past the run's deadline
+TWEET_TIMEOUT_SECONDS = 30
+
 SAD_PHRASES = ["Darn", "Drats", "Oh shoot", "Oh no", "Bad luck", "Bummer", "Sigh"]
 
 
@@ -26,54 +46,43 @@ class TwitterClient:
         self.api = tweepy.API(auth)
         self.sports_client = sports_client
         self.dry_run = dry_run
+        self._async_api: AsyncTwitterClient | None = None
 
-    def tweet_matched(
-        self, tweetable_play: TweetablePlay, state: State, matching_letters: list[str]
-    ) -> None:
-        alert = self._alert(matching_letters)
-
-        tweet_text = self._tweet_text(alert, tweetable_play, state, matching_letters)
-        if len(tweet_text) > 280:
-            tweet_text = self._tweet_text(
-                alert, tweetable_play, state, matching_letters, use_short_phrase=True
+    @property
+    def async_api(self) -> AsyncTwitterClient | None:
+        """Posts from the event loop if TWITTER_CLIENT=async, otherwise tweepy posts."""
+        if os.environ.get("TWITTER_CLIENT", "tweepy") != "async":
+            return None
+        if self._async_api is None:
+            from clients.async_twitter_client import (
+                API_URL,
+                UPLOAD_URL,
+                AsyncTwitterClient,
             )
-        if len(tweet_text) > 280:
-            tweet_text = self._tweet_text(
-                alert,
-                tweetable_play,
-                state,
-                matching_letters,
-                use_short_phrase=True,
-                omit_score=True,
+
+            self._async_api = AsyncTwitterClient(
+                self.sports_client.twitter_credentials,
+                # Keeps its connections alive for the feeds and the tweets of the run
+                self.sports_client.fetch_scheduler.session,
+                api_url=os.environ.get("TWITTER_API_URL") or API_URL,
+                upload_url=os.environ.get("TWITTER_UPLOAD_URL") or UPLOAD_URL,
             )
+        return self._async_api
+
+    async def tweet_matched(
+        self, tweetable_play: TweetablePlay, state: State, matching_letters: list[str]
+    ) -> None:
+        tweet_text = self.matched_text(tweetable_play, state, matching_letters)
         print(tweet_text)
         tweetable_play.tweet_text = tweet_text
 
         if not self.dry_run:
-            image_client = ImageClient()
-
-            media = self.api.media_upload(
-                filename="dummy_string",
-                file=image_client.get_tweet_image(
-                    ImageInput(
-                        completed_at=0,  # Not actually used
-                        matching_letters=matching_letters,
-                        next_letter=state.current_letter,
-                        player_id=tweetable_play.player_id,
-                        player_name=tweetable_play.player_name,
-                        season_phrase=tweetable_play.season_phrase,
-                        sport=self.sports_client.sport,
-                        times_cycled=state.times_cycled,
-                        tweet_id="1",  # Not actually used
-                    ),
-                ),
-            )
-            tweet = self.api.update_status(
-                status=tweet_text,
-                media_ids=[media.media_id],  # type: ignore
+            tweet_id = await self.post(
+                tweet_text,
+                image_input=self.image_input(tweetable_play, state, matching_letters),
             )
-            state.tweet_id = tweet.id
-            tweetable_play.tweet_id = tweet.id
+            state.tweet_id = tweet_id
+            tweetable_play.tweet_id = tweet_id
         else:
             # Increment the tweet_id to test the MySQL logic
             state.tweet_id += 1
@@ -81,32 +90,23 @@ class TwitterClient:
 
         state.scores_since_last_match = 0
 
-    def tweet_unmatched(self, tweetable_play: TweetablePlay, state: State) -> None:
+    async def tweet_unmatched(
+        self, tweetable_play: TweetablePlay, state: State
+    ) -> None:
         if state.tweet_id:
             if state.scores_since_last_match is not None:
                 state.scores_since_last_match += 1
 
-            status = f"""{random.choice(SAD_EMOJIS)} {random.choice(SAD_PHRASES)}.
-
-{tweetable_play.player_name} just {self.sports_client.short_tweet_phrase}, but his name doesn't have the letter {state.current_letter}, so the next letter in the {self.sports_client.alphabet_game_name} Alphabet Game is still {state.current_letter}.{self._scores_since_with_spacing(state.scores_since_last_match)}{self._score_with_spacing(tweetable_play.score)}"""
+            status = self.unmatched_text(tweetable_play, state)
             print(status)
             tweetable_play.tweet_text = status
             if not self.dry_run:
-                # Only tweet every 10 unmatched plays, to account for Twitter having a lower API limit
-                # https://twitter.com/twitterdev/status/1623467618400374784
                 print("Scores since last match:", state.scores_since_last_match)
-                if (
-                    self.sports_client.sport
-                    == "NFL"  # NFL doesn't have very many touchdowns
-                    or (((state.scores_since_last_match or -1) % 10) == 0)
-                ):
+                if self.posts_unmatched(state):
                     print("Tweeting unmatched play")
-                    tweet = self.api.update_status(
-                        status=status,
-                        in_reply_to_status_id=state.tweet_id,
-                    )
-                    state.tweet_id = tweet.id
-                    tweetable_play.tweet_id = tweet.id
+                    tweet_id = await self.post(status, in_reply_to=state.tweet_id)
+                    state.tweet_id = tweet_id
+                    tweetable_play.tweet_id = tweet_id
                 else:
                     # Leave state alone, so we still reply to the last real tweet
                     # Mark tweet_id as -1 so it's still in the database
@@ -117,6 +117,129 @@ class TwitterClient:
                 state.tweet_id += 1
                 tweetable_play.tweet_id = state.tweet_id
 
+    def matched_text(
+        self, tweetable_play: TweetablePlay, state: State, matching_letters: list[str]
+    ) -> str:
+        alert = self._alert(matching_letters)
+
+        tweet_text = self._tweet_text(alert, tweetable_play, state, matching_letters)
+        if len(tweet_text) > 280:
+            tweet_text = self._tweet_text(
+                alert, tweetable_play, state, matching_letters, use_short_phrase=True
+            )
+        if len(tweet_text) > 280:
+            tweet_text = self._tweet_text(
+                alert,
+                tweetable_play,
+                state,
+                matching_letters,
+                use_short_phrase=True,
+                omit_score=True,
+            )
+        return tweet_text
+
+    def unmatched_text(self, tweetable_play: TweetablePlay, state: State) -> str:
+        return f"""{random.choice(SAD_EMOJIS)} {random.choice(SAD_PHRASES)}.
+
+{tweetable_play.player_name} just {self.sports_client.short_tweet_phrase}, but his name doesn't have the letter {state.current_letter}, so the next letter in the {self.sports_client.alphabet_game_name} Alphabet Game is still {state.current_letter}.{self._scores_since_with_spacing(state.scores_since_last_match)}{self._score_with_spacing(tweetable_play.score)}"""
+
+    def posts_unmatched(self, state: State) -> bool:
+        # Only tweet every 10 unmatched plays, to account for Twitter having a lower API limit
+        # https://twitter.com/twitterdev/status/1623467618400374784
+        return (
+            self.sports_client.sport == "NFL"  # NFL doesn't have very many touchdowns
+            or (((state.scores_since_last_match or -1) % 10) == 0)
+        )
+
+    def image_input(
+        self, tweetable_play: TweetablePlay, state: State, matching_letters: list[str]
+    ) -> ImageInput:
+        return ImageInput(
+            completed_at=0,  # Not actually used
+            matching_letters=matching_letters,
+            next_letter=state.current_letter,
+            player_id=tweetable_play.player_id,
+            player_name=tweetable_play.player_name,
+            season_phrase=tweetable_play.season_phrase,
+            sport=self.sports_client.sport,
+            times_cycled=state.times_cycled,
+            tweet_id="1",  # Not actually used
+        )
+
+    async def post(
+        self,
+        status: str,
+        image_input: ImageInput | None = None,
+        in_reply_to: int | None = None,
+    ) -> int:
+        """Post a tweet, with the scorecard for image_input if given. Returns the new tweet id."""
+        media_ids = None
+        if image_input:
+            # Rendering can take a while, the event loop keeps going meanwhile
+            image = await asyncio.to_thread(self._scorecard, image_input)
+            media_ids = [await self._upload(image.getvalue(), status)]
+        if self.async_api:
+            return await self.async_api.update_status(status, media_ids, in_reply_to)
+        self.api.timeout = deadline.clamp(TWEET_TIMEOUT_SECONDS)
+        tweet = self.api.update_status(
+            status=status, media_ids=media_ids, in_reply_to_status_id=in_reply_to
+        )
+        return tweet.id
+
+    def _scorecard(self, image_input: ImageInput) -> io.BytesIO:
+        from clients.scorecard_cache import get_scorecard_cache
+
+        # Rendered ahead of time if we guessed this match
+        scorecard_cache = get_scorecard_cache(self.sports_client.sport)
+        image = scorecard_cache.get(image_input) if scorecard_cache else None
+        return image or ImageClient().get_tweet_image(image_input)
+
+    async def _upload(self, image: bytes, status: str) -> int:
+        """Upload the image, made smaller first if MEDIA_BYTE_BUDGET is set. Returns its media id."""
+        optimizer = get_media_optimizer()
+        media = (
+            optimizer.process(image)
+            if optimizer
+            else ProcessedMedia(image, DEFAULT_FILENAME, len(image))
+        )
+        started = time.perf_counter()
+        if self.async_api:
+            media_id = await self.async_api.media_upload(
+                media.data, media.filename, chunked=media.chunked
+            )
+        else:
+            self.api.timeout = deadline.clamp(TWEET_TIMEOUT_SECONDS)
+            media_id = self.api.media_upload(
+                filename=media.filename,
+                file=io.BytesIO(media.data),
+                chunked=media.chunked,
+                media_category="tweet_image" if media.chunked else None,
+            ).media_id
+        get_upload_log().add(
+            MediaUpload(
+                tweet_status=status[:40],
+                original_bytes=media.original_bytes,
+                uploaded_bytes=len(media.data),
+                chunked=media.chunked,
+                cached=media.cached,
+                seconds=time.perf_counter() - started,
+            )
+        )
+        return media_id
+
+    def report(self) -> str:
+        """How the async posts went, if there were any."""
+        return self._async_api.report() if self._async_api else ""
+
+    def find_recent_tweet(self, status: str) -> int | None:
+        """The id of one of our latest tweets with this text, to check if a post we lost track of went out."""
+        self.api.timeout = deadline.clamp(TWEET_TIMEOUT_SECONDS)
+        for tweet in self.api.user_timeline(count=50, tweet_mode="extended"):
+            # Twitter escapes HTML and appends the media link
+            if html.unescape(tweet.full_text).startswith(status.strip()[:100]):
+                return tweet.id
+        return None
+
     def _alert(self, matching_letters: list[str]) -> str:
         if len(matching_letters) == 1:
             return ""
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import dataclasses
+import os
+import string
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from my_types import Game, State, TweetablePlay, clean_player_name
+
+if TYPE_CHECKING:
+    from clients.abstract_sports_client import AbstractSportsClient
+
+# The state always counts A to Z. A reverse game plays it on names with every letter
+# mirrored, so the state's A is the game's Z.
+_MIRROR = str.maketrans(string.ascii_uppercase, string.ascii_uppercase[::-1])
+
+
+@dataclass
+class Variant:
+    name: str  # Also the end of its state key, like NHL_last_name
+    last_name_only: bool = False
+    reverse: bool = False
+    team_id: int | None = None  # Only this team's plays
+
+    @classmethod
+    def parse(cls, name: str) -> Variant:
+        """last_name, reverse, team_<id>, or several of them joined by +."""
+        variant = cls(name)
+        for option in name.split("+"):
+            if option == "last_name":
+                variant.last_name_only = True
+            elif option == "reverse":
+                variant.reverse = True
+            elif option.startswith("team_"):
+                variant.team_id = int(option.removeprefix("team_"))
+            else:
+                raise ValueError(f"Unknown variant option {option} in {name}")
+        return variant
+
+    def accepts(self, play: TweetablePlay) -> bool:
+        return self.team_id is None or play.player_team_id == self.team_id
+
+    def name_letters(self, play: TweetablePlay) -> str:
+        """What the state's letters are matched against."""
+        letters = clean_player_name(play.player_name)
+        if self.last_name_only:
+            letters = letters.split(" ")[-1]
+        return letters.translate(_MIRROR) if self.reverse else letters
+
+    def letter(self, state_letter: str) -> str:
+        """A letter of the state, as it is in this game."""
+        return state_letter.translate(_MIRROR) if self.reverse else state_letter
+
+
+@dataclass
+class VariantResult:
+    variant: Variant
+    plays: int  # New to this variant
+    matches: int
+    letter: str  # The one it is on now
+
+
+class VariantEngine:
+    """
+    Plays more alphabet games off the plays the sport's own game already went through.
+
+    Nothing is fetched or parsed again. After a run's plays are tweeted, each variant takes
+    them in the same order, with its own state row and its own recorded plays, keyed
+    <sport>_<variant name> in the same tables. Variants don't tweet, the text each play
+    would have is recorded with it. Set VARIANTS, like VARIANTS=last_name,reverse,team_21.
+    """
+
+    def __init__(
+        self,
+        sports_client: AbstractSportsClient,
+        variants: list[Variant],
+        dry_run: bool = False,
+    ) -> None:
+        self.sports_client = sports_client
+        self.variants = variants
+        self.dry_run = dry_run
+
+    @classmethod
+    def from_env(
+        cls, sports_client: AbstractSportsClient, dry_run: bool = False
+    ) -> VariantEngine | None:
+        names = [n.strip() for n in os.environ.get("VARIANTS", "").split(",")]
+        variants = [Variant.parse(n) for n in names if n]
+        if not variants:
+            return None
+        return cls(sports_client, variants, dry_run)
+
+    def state_key(self, variant: Variant) -> str:
+        return f"{self.sports_client.sport}_{variant.name}"
+
+    def play(
+        self, games: list[Game], tweetable_plays: list[TweetablePlay]
+    ) -> list[VariantResult]:
+        """The result of each variant that could play. The others are logged and skipped."""
+        results = []
+        for v in self.variants:
+            try:
+                results.append(self._play(v, games, tweetable_plays))
+            except Exception as e:
+                # Like a missing state row. The sport's own game must still finish its run.
+                print(f"{self.state_key(v)} failed and misses these plays: {e!r}")
+        return results
+
+    def _play(
+        self, variant: Variant, games: list[Game], tweetable_plays: list[TweetablePlay]
+    ) -> VariantResult:
+        from clients.storage_client import get_storage_client
+
+        storage_client = get_storage_client(
+            self.dry_run, self.sports_client, state_key=self.state_key(variant)
+        )
+        try:
+            state = storage_client.get_initial_state()
+            state.check_for_season_period_change(games)
+
+            game_ids = {p.game_id for p in tweetable_plays}
+            # The sport's game can see a play again if its run ran out of time
+            known_plays = storage_client.get_known_plays(
+                [g for g in games if g.game_id in game_ids]
+            )
+            plays = matches = 0
+            for p in tweetable_plays:
+                if not variant.accepts(p) or p.play_id in known_plays.get(
+                    p.game_id, []
+                ):
+                    continue
+                matching_letters = state.match_letters(variant.name_letters(p))
+                text = self._text(variant, p, state, matching_letters)
+                if matching_letters:
+                    print(text)
+                # The state and the play in one transaction, like the sport's game
+                storage_client.record_play(
+                    dataclasses.replace(p, tweet_id=None, tweet_text=text),
+                    state,
+                    bool(matching_letters),
+                    None,
+                )
+                plays += 1
+                matches += bool(matching_letters)
+            if not plays:
+                # The season period may have changed
+                storage_client.update_state(state)
+        finally:
+            storage_client.close()
+        return VariantResult(
+            variant=variant,
+            plays=plays,
+            matches=matches,
+            letter=variant.letter(state.current_letter),
+        )
+
+    def _text(
+        self,
+        variant: Variant,
+        play: TweetablePlay,
+        state: State,
+        matching_letters: list[str],
+    ) -> str:
+        next_letter = variant.letter(state.current_letter)
+        if matching_letters:
+            letters = ", ".join(variant.letter(m) for m in matching_letters)
+            return (
+                f"{play.player_name} just {self.sports_client.short_tweet_phrase}, "
+                f"that's {letters} in the {variant.name} game. Next up: {next_letter}"
+            )
+        return (
+            f"{play.player_name} just {self.sports_client.short_tweet_phrase}, "
+            f"still on {next_letter} in the {variant.name} game"
+        )
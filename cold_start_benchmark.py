@@ -0,0 +1,125 @@
+"""
+Measure the cold start of the Cloud Function entry point.
+
+Every sample runs in a fresh interpreter, so nothing is imported yet. The schedule
+endpoints are stubbed to return no games, which is what most runs see: all four
+sports should stop right after their schedule check. Once the season calendars have
+been refreshed for the day, a run should not make any request at all.
+
+    python cold_start_benchmark.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Modules that only the non-idle path should import
+HEAVY_MODULES = ["tweepy", "google.cloud.storage", "MySQLdb", "aiohttp"]
+
+_IDLE_RUN_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import main
+
+imported = time.perf_counter()
+
+import requests
+
+EMPTY_SCHEDULES = {
+    "statsapi.mlb.com": {"dates": []},
+    "statsapi.web.nhl.com": {"dates": []},
+    "cdn.nba.com": {"leagueSchedule": {"gameDates": []}},
+    "site.api.espn.com": {"events": []},
+}
+first_request = None
+request_count = 0
+
+
+def fake_request(self, method, url, *args, **kwargs):
+    global first_request, request_count
+    request_count += 1
+    if first_request is None:
+        first_request = time.perf_counter()
+    response = requests.models.Response()
+    response.status_code = 200
+    response._content = b"{}"
+    for host, payload in EMPTY_SCHEDULES.items():
+        if host in url:
+            response._content = json.dumps(payload).encode()
+    return response
+
+
+requests.Session.request = fake_request
+run_start = time.perf_counter()
+main.run(None, None)
+finished = time.perf_counter()
+
+print(
+    json.dumps(
+        {
+            "import_seconds": imported - start,
+            "first_request_seconds": (first_request or finished) - start,
+            "idle_run_seconds": finished - start,
+            "run_seconds": finished - run_start,
+            "requests": request_count,
+            "heavy_modules": [m for m in %r if m in sys.modules],
+        }
+    )
+)
+"""
+
+
+def measure_idle_run(state_dir: str | None = None) -> dict:
+    """
+    Import main and do one idle run() in a fresh interpreter.
+
+    Pass the same state_dir again to measure a run that already has today's season calendars.
+    """
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-c", _IDLE_RUN_SCRIPT % HEAVY_MODULES],
+        cwd=repo_dir,
+        env={
+            **os.environ,
+            "DRY_RUN": "false",
+            "LOCAL_STATE_DIR": state_dir or tempfile.mkdtemp(),
+        },
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # main prints its progress, the measurements are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _report(title: str, samples: list[dict]) -> None:
+    print(title)
+    for key in [
+        "import_seconds",
+        "first_request_seconds",
+        "run_seconds",
+        "idle_run_seconds",
+    ]:
+        values = [s[key] for s in samples]
+        print(
+            f"  {key}: median {statistics.median(values) * 1000:.1f}ms, max {max(values) * 1000:.1f}ms"
+        )
+    print(f"  requests: {samples[-1]['requests']}")
+    print(f"  heavy modules: {samples[-1]['heavy_modules']}")
+
+
+if __name__ == "__main__":
+    _report("Cold, no season calendars", [measure_idle_run() for _ in range(5)])
+    state_dir = tempfile.mkdtemp()
+    measure_idle_run(state_dir)
+    _report(
+        "Cold, season calendars refreshed today",
+        [measure_idle_run(state_dir) for _ in range(5)],
+    )
@@ -0,0 +1,611 @@
+"""
+Generate synthetic slates, bigger than any real day, and find where a run stops scaling.
+
+Every sport gets a schedule and play-by-play feeds in its API's format, with a chosen number
+of games, plays per game and share of plays that score. Benchmark one or more slate sizes:
+
+    python load_generator.py NHL --games 1,15,30,60,120 --plays 400 --scoring-rate 0.02
+
+Each size is served from a local HTTP server and goes through get_tweetable_plays, with the
+fetch scheduler, then get_known_plays and the tweet loop on a temporary SQLite database,
+where known_fraction of the plays are already known. Tweets are dry runs, only the text is
+built. Or save a slate to replay it like a real day:
+
+    python load_generator.py NFL --games 16 --save synthetic --day 2023-01-01
+    python replay.py NFL 2023-01-01 2023-01-01 --archive-dir synthetic --workers 1
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from clients.abstract_sports_client import AbstractSportsClient
+from clients.sports_clients import get_sports_client
+from my_types import Game, Sport
+from replay import FeedDirectory
+
+SYLLABLES = "al bo car dan el fi gus ha ix jo ka lu mo ny or pe qui ro sa ti uv vic wes zed".split()
+PLAYERS_PER_TEAM = 25
+
+
+@dataclass
+class SlateSpec:
+    sport: Sport
+    games: int
+    plays_per_game: int = 300
+    scoring_rate: float = 0.02  # Share of plays that are tweetable
+    seed: int = 0
+
+
+@dataclass
+class Slate:
+    spec: SlateSpec
+    day: datetime.date
+    schedule: dict
+    feeds: dict[str, dict]  # Game id to play-by-play
+    scoring_plays: int
+    # NFL only, team id to {display name: player id}, what NFLClient.get_roster returns
+    rosters: dict[int, dict[str, int]] = field(default_factory=dict)
+    # NBA only, player id to name, what NBAClient._get_player_name returns
+    player_names: dict[int, str] = field(default_factory=dict)
+
+
+@dataclass
+class LoadResult:
+    games: int
+    feed_bytes: int
+    tweetable_plays: int
+    known_plays: int
+    new_plays: int
+    fetch_and_parse_seconds: float
+    known_plays_seconds: float
+    tweet_loop_seconds: float
+
+
+def generate_slate(spec: SlateSpec, day: datetime.date | None = None) -> Slate:
+    """A slate of live games, the same for the same spec and day."""
+    day = day or datetime.date.today()
+    generator = _GENERATORS[spec.sport](spec, day)
+    return generator.slate()
+
+
+class _SlateGenerator(ABC):
+    def __init__(self, spec: SlateSpec, day: datetime.date) -> None:
+        self.spec = spec
+        self.day = day
+        self.rng = random.Random(f"{spec.sport}-{spec.seed}-{day}")
+        self.sports_client = get_sports_client(spec.sport, dry_run=True)
+        self.team_ids = list(self.sports_client.team_to_abbrevation)
+        self.scoring_plays = 0
+        # Plays have to be in the past, NHL waits 5 minutes before it tweets a goal
+        self.latest_play_time = datetime.datetime.now(
+            datetime.timezone.utc
+        ) - datetime.timedelta(minutes=10)
+        self.start_time = datetime.datetime.combine(
+            day, datetime.time(), datetime.timezone.utc
+        )
+        self.rosters: dict[int, dict[str, int]] = {}
+        self.player_names: dict[int, str] = {}
+
+    def slate(self) -> Slate:
+        matchups = [self._matchup(i) for i in range(self.spec.games)]
+        feeds = {
+            game_id: self.feed(i, game_id, home, away)
+            for i, (game_id, home, away) in enumerate(matchups)
+        }
+        return Slate(
+            spec=self.spec,
+            day=self.day,
+            schedule=self.schedule(matchups),
+            feeds=feeds,
+            scoring_plays=self.scoring_plays,
+            rosters=self.rosters,
+            player_names=self.player_names,
+        )
+
+    @abstractmethod
+    def schedule(self, matchups: list[tuple[str, int, int]]) -> dict:
+        pass
+
+    @abstractmethod
+    def feed(self, index: int, game_id: str, home: int, away: int) -> dict:
+        pass
+
+    def game_id(self, index: int) -> str:
+        return str(900000 + index)
+
+    def scores(self) -> bool:
+        scored = self.rng.random() < self.spec.scoring_rate
+        self.scoring_plays += scored
+        return scored
+
+    def play_time(self, game_index: int, play_index: int) -> str:
+        # Games start a minute apart and last three hours
+        offset = game_index * 60 + play_index * 3 * 3600 / self.spec.plays_per_game
+        play_time = min(
+            self.start_time + datetime.timedelta(seconds=offset),
+            self.latest_play_time,
+        )
+        return play_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def name(self, words: int = 2) -> str:
+        return " ".join(
+            "".join(
+                self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(1, 3))
+            ).capitalize()
+            for _ in range(words)
+        )
+
+    def roster(self, team_id: int) -> list[tuple[int, str]]:
+        if team_id not in self.rosters:
+            roster: dict[str, int] = {}
+            while len(roster) < PLAYERS_PER_TEAM:
+                roster[self.name()] = team_id * 1000 + len(roster)
+            self.rosters[team_id] = roster
+        return [(player_id, name) for name, player_id in self.rosters[team_id].items()]
+
+    def _matchup(self, index: int) -> tuple[str, int, int]:
+        # More games than teams is fine for a load test, teams just play several times
+        home, away = self.rng.sample(self.team_ids, 2)
+        return self.game_id(index), home, away
+
+
+class _StatsApiGenerator(_SlateGenerator):
+    """MLB and NHL share the schedule format of statsapi."""
+
+    def schedule(self, matchups: list[tuple[str, int, int]]) -> dict:
+        return {
+            "dates": [
+                {
+                    "date": self.day.isoformat(),
+                    "games": [
+                        {
+                            "gamePk": int(game_id),
+                            "gameType": "R",
+                            "gameDate": self.play_time(i, 0),
+                            "status": {
+                                "abstractGameState": "Live",
+                                "detailedState": "In Progress",
+                            },
+                            "teams": {
+                                "home": {"team": {"id": home}},
+                                "away": {"team": {"id": away}},
+                            },
+                        }
+                        for i, (game_id, home, away) in enumerate(matchups)
+                    ],
+                }
+            ]
+        }
+
+
+class _MLBGenerator(_StatsApiGenerator):
+    def feed(self, index: int, game_id: str, home: int, away: int) -> dict:
+        plays = []
+        runs = {"away": 0, "home": 0}
+        for i in range(self.spec.plays_per_game):
+            is_top = (i // 6) % 2 == 0
+            batting_team = away if is_top else home
+            player_id, batter = self.rng.choice(self.roster(batting_team))
+            event_type = (
+                "home_run"
+                if self.scores()
+                else self.rng.choice(["strikeout", "field_out", "single", "walk"])
+            )
+            rbi = self.rng.randint(1, 4) if event_type == "home_run" else 0
+            runs["away" if is_top else "home"] += rbi
+            plays.append(
+                {
+                    "atBatIndex": i,
+                    "about": {
+                        "isComplete": True,
+                        "isTopInning": is_top,
+                        "inning": i // 12 + 1,
+                        "endTime": self.play_time(index, i),
+                    },
+                    "result": {
+                        "eventType": event_type,
+                        "rbi": rbi,
+                        "awayScore": runs["away"],
+                        "homeScore": runs["home"],
+                    },
+                    "matchup": {"batter": {"fullName": batter, "id": player_id}},
+                }
+            )
+        return {"allPlays": plays}
+
+
+class _NHLGenerator(_StatsApiGenerator):
+    def feed(self, index: int, game_id: str, home: int, away: int) -> dict:
+        plays = []
+        goals = {"away": 0, "home": 0}
+        for i in range(self.spec.plays_per_game):
+            team = self.rng.choice([home, away])
+            player_id, player = self.rng.choice(self.roster(team))
+            is_goal = self.scores()
+            if is_goal:
+                goals["home" if team == home else "away"] += 1
+            period = min(3, i * 3 // self.spec.plays_per_game + 1)
+            plays.append(
+                {
+                    "about": {
+                        "eventId": i,
+                        "dateTime": self.play_time(index, i),
+                        "goals": dict(goals),
+                        "ordinalNum": ["1st", "2nd", "3rd"][period - 1],
+                        "periodTimeRemaining": f"{self.rng.randint(0, 19):02d}:{self.rng.randint(0, 59):02d}",
+                    },
+                    "result": {
+                        "event": "Goal" if is_goal else "Shot",
+                        "description": f"{player} ({goals['home'] + goals['away']}) Wrist Shot",
+                    },
+                    "players": [
+                        {
+                            "playerType": "Scorer" if is_goal else "Shooter",
+                            "player": {"fullName": player, "id": player_id},
+                        }
+                    ],
+                    "team": {"id": team},
+                }
+            )
+        return {"allPlays": plays}
+
+
+class _NBAGenerator(_SlateGenerator):
+    def game_id(self, index: int) -> str:
+        return f"002{2200000 + index:07d}"
+
+    def schedule(self, matchups: list[tuple[str, int, int]]) -> dict:
+        return {
+            "leagueSchedule": {
+                "gameDates": [
+                    {
+                        "gameDate": self.day.strftime("%m/%d/%Y 00:00:00"),
+                        "games": [
+                            {
+                                "gameId": game_id,
+                                "gameStatus": 2,
+                                "gameDateTimeUTC": self.play_time(i, 0),
+                                "homeTeam": {"teamId": home},
+                                "awayTeam": {"teamId": away},
+                            }
+                            for i, (game_id, home, away) in enumerate(matchups)
+                        ],
+                    }
+                ]
+            }
+        }
+
+    def feed(self, index: int, game_id: str, home: int, away: int) -> dict:
+        actions = []
+        points = {"away": 0, "home": 0}
+        for i in range(self.spec.plays_per_game):
+            team = self.rng.choice([home, away])
+            player_id, player = self.rng.choice(self.roster(team))
+            self.player_names[player_id] = player
+            is_dunk = self.scores()
+            made = is_dunk or self.rng.random() < 0.45
+            if made:
+                points["home" if team == home else "away"] += 2
+            period = min(4, i * 4 // self.spec.plays_per_game + 1)
+            actions.append(
+                {
+                    "actionNumber": i + 1,
+                    "actionType": "2pt",
+                    "subType": "DUNK" if is_dunk else "Jump Shot",
+                    "shotResult": "Made" if made else "Missed",
+                    "personId": player_id,
+                    "teamId": team,
+                    "period": period,
+                    "clock": f"PT{self.rng.randint(0, 11):02d}M{self.rng.randint(0, 59):02d}.00S",
+                    "scoreAway": str(points["away"]),
+                    "scoreHome": str(points["home"]),
+                    "timeActual": self.play_time(index, i),
+                }
+            )
+        return {"game": {"gameId": game_id, "actions": actions}}
+
+
+class _NFLGenerator(_SlateGenerator):
+    def name(self, words: int = 2) -> str:
+        # Like the real rosters, some names have a suffix or three words
+        kind = self.rng.random()
+        if kind < 0.1:
+            return f"{super().name()} Jr."
+        return super().name(3 if kind < 0.2 else 2)
+
+    def schedule(self, matchups: list[tuple[str, int, int]]) -> dict:
+        return {
+            "events": [
+                {
+                    "id": game_id,
+                    "date": self.play_time(i, 0)[:16] + "Z",
+                    "season": {"slug": "regular-season"},
+                    "status": {"type": {"state": "in", "completed": False}},
+                    "competitions": [
+                        {
+                            "competitors": [
+                                {"homeAway": "home", "team": {"id": str(home)}},
+                                {"homeAway": "away", "team": {"id": str(away)}},
+                            ]
+                        }
+                    ],
+                }
+                for i, (game_id, home, away) in enumerate(matchups)
+            ]
+        }
+
+    def feed(self, index: int, game_id: str, home: int, away: int) -> dict:
+        # The summary endpoint has every play in drives, and the scores again in scoringPlays
+        plays = []
+        scoring_plays = []
+        points = {"away": 0, "home": 0}
+        for i in range(self.spec.plays_per_game):
+            team = self.rng.choice([home, away])
+            roster = self.roster(team)
+            _, player = self.rng.choice(roster)
+            # The parser finds the scorer by name, without the suffix
+            player = player.removesuffix(" Jr.")
+            yards = self.rng.randint(1, 60)
+            period = min(4, i * 4 // self.spec.plays_per_game + 1)
+            play: dict = {
+                "id": f"{game_id}{i:04d}",
+                "text": f"{player} {yards} Yd Run",
+                "period": {"number": period},
+                "clock": {
+                    "displayValue": f"{self.rng.randint(0, 14)}:{self.rng.randint(0, 59):02d}"
+                },
+                "team": {"id": str(team)},
+            }
+            if self.scores():
+                points["home" if team == home else "away"] += 7
+                _, kicker = self.rng.choice(roster)
+                play["text"] += f" ({kicker} Kick)"
+                play["scoringType"] = {"name": "touchdown"}
+                play["awayScore"] = points["away"]
+                play["homeScore"] = points["home"]
+                scoring_plays.append(play)
+            plays.append(play)
+        return {
+            "drives": {"previous": [{"plays": plays}]},
+            "scoringPlays": scoring_plays,
+        }
+
+
+_GENERATORS: dict[str, type[_SlateGenerator]] = {
+    "MLB": _MLBGenerator,
+    "NHL": _NHLGenerator,
+    "NBA": _NBAGenerator,
+    "NFL": _NFLGenerator,
+}
+
+
+def save_slate(slate: Slate, archive_dir: str) -> None:
+    """Write the slate where replay.py's FeedDirectory looks for a day."""
+    feeds = FeedDirectory(archive_dir)
+    sport = slate.spec.sport
+    feeds.save_schedule(sport, slate.day, slate.schedule)
+    for game_id, feed in slate.feeds.items():
+        feeds.save_feed(sport, slate.day, game_id, feed)
+    if slate.rosters and sport == "NFL":
+        feeds.save_rosters(sport, slate.rosters)
+    if slate.player_names:
+        feeds.save_player_names(sport, slate.player_names)
+
+
+def prepare_client(sports_client: AbstractSportsClient, slate: Slate) -> None:
+    """Fill the caches of the lookups that would otherwise go to the real APIs."""
+    if slate.rosters and slate.spec.sport == "NFL":
+        sports_client.known_rosters.update(slate.rosters)  # type: ignore
+    if slate.player_names:
+        sports_client.known_players.update(slate.player_names)  # type: ignore
+
+
+def run_load(slate: Slate, known_fraction: float = 0.9) -> LoadResult:
+    return asyncio.run(_run_load(slate, known_fraction))
+
+
+@contextlib.asynccontextmanager
+async def _serve(
+    slate: Slate,
+) -> AsyncIterator[tuple[AbstractSportsClient, list[Game], int]]:
+    """A client that fetches the slate's feeds from a local server, its games and the feed bytes."""
+    from aiohttp import web
+
+    bodies = {
+        game_id: json.dumps(feed).encode() for game_id, feed in slate.feeds.items()
+    }
+
+    async def feed_handler(request: web.Request) -> web.Response:
+        return web.Response(
+            body=bodies[request.match_info["game_id"]], content_type="application/json"
+        )
+
+    app = web.Application()
+    app.router.add_get("/{game_id}", feed_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    sports_client = get_sports_client(slate.spec.sport, dry_run=True)
+    prepare_client(sports_client, slate)
+    sports_client.play_by_play_url = lambda game_id: f"http://127.0.0.1:{port}/{game_id}"  # type: ignore
+    games = sports_client.games_from_schedule(slate.schedule, slate.day, slate.day)
+    try:
+        yield sports_client, games, sum(len(b) for b in bodies.values())
+    finally:
+        await sports_client.close()
+        await runner.cleanup()
+
+
+async def _run_load(slate: Slate, known_fraction: float) -> LoadResult:
+    from clients.sqlite_client import SQLiteClient
+    from clients.twitter_client import TwitterClient
+
+    async with _serve(slate) as (sports_client, games, feed_bytes):
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(
+            io.StringIO()
+        ):
+            storage_client = SQLiteClient(
+                dry_run=False,
+                sports_client=sports_client,
+                path=os.path.join(tmp, "load.sqlite3"),
+            )
+            try:
+                # Everything but the last plays of each game was tweeted by earlier runs
+                all_plays = await sports_client.get_tweetable_plays(games, {})
+                state = storage_client.get_initial_state()
+                known = _known_plays(all_plays, known_fraction)
+                for p in known:
+                    storage_client.add_tweetable_play(p, state, is_match=False)
+
+                started = time.perf_counter()
+                known_plays = storage_client.get_known_plays(games)
+                known_plays_seconds = time.perf_counter() - started
+
+                started = time.perf_counter()
+                new_plays = await sports_client.get_tweetable_plays(games, known_plays)
+                fetch_and_parse_seconds = time.perf_counter() - started
+
+                # What main does per play, without the network: tweets are dry runs
+                twitter_client = TwitterClient(sports_client, dry_run=True)
+                started = time.perf_counter()
+                for p in new_plays:
+                    matching_letters = state.find_matching_letters(p)
+                    if matching_letters:
+                        await twitter_client.tweet_matched(p, state, matching_letters)
+                    else:
+                        await twitter_client.tweet_unmatched(p, state)
+                    storage_client.update_state(state)
+                    storage_client.add_tweetable_play(p, state, bool(matching_letters))
+                tweet_loop_seconds = time.perf_counter() - started
+            finally:
+                storage_client.close()
+
+    return LoadResult(
+        games=len(games),
+        feed_bytes=feed_bytes,
+        tweetable_plays=len(all_plays),
+        known_plays=len(known),
+        new_plays=len(new_plays),
+        fetch_and_parse_seconds=fetch_and_parse_seconds,
+        known_plays_seconds=known_plays_seconds,
+        tweet_loop_seconds=tweet_loop_seconds,
+    )
+
+
+def measure_memory(slate: Slate) -> tuple[int, int]:
+    """
+    Peak bytes allocated while fetching and parsing the slate with get_tweetable_plays,
+    and the bytes still allocated once it returns: the plays, the games and whatever the
+    HTTP client keeps.
+    """
+    return asyncio.run(_measure_memory(slate))
+
+
+async def _measure_memory(slate: Slate) -> tuple[int, int]:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return await _measure_served_memory(slate)
+
+
+async def _measure_served_memory(slate: Slate) -> tuple[int, int]:
+    async with _serve(slate) as (sports_client, games, _):
+        # The first fetch opens the session and the connections, keep that out of it
+        await sports_client.get_tweetable_plays(games[:1], {})
+        tracemalloc.start()
+        try:
+            plays = await sports_client.get_tweetable_plays(games, {})
+            held, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del plays
+    return peak, held
+
+
+def _known_plays(plays: list, known_fraction: float) -> list:
+    by_game: dict[str, list] = {}
+    for p in plays:
+        by_game.setdefault(p.game_id, []).append(p)
+    known = []
+    for game_plays in by_game.values():
+        known.extend(game_plays[: int(len(game_plays) * known_fraction)])
+    return known
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("sport", choices=["MLB", "NHL", "NBA", "NFL"])
+    parser.add_argument(
+        "--games", default="1,5,15,30,60", help="Comma separated slate sizes"
+    )
+    parser.add_argument("--plays", type=int, default=300, help="Plays per game")
+    parser.add_argument("--scoring-rate", type=float, default=0.02)
+    parser.add_argument("--known-fraction", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--day", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Measure the memory of get_tweetable_plays instead of timing the run",
+    )
+    parser.add_argument(
+        "--save", help="Save the largest slate to this archive dir instead"
+    )
+    args = parser.parse_args()
+
+    sizes = [int(g) for g in args.games.split(",")]
+    specs = [
+        SlateSpec(args.sport, games, args.plays, args.scoring_rate, args.seed)
+        for games in sizes
+    ]
+    if args.save:
+        slate = generate_slate(specs[-1], args.day)
+        save_slate(slate, args.save)
+        print(
+            f"Saved {len(slate.feeds)} {args.sport} games with {slate.scoring_plays} scoring plays for {slate.day}"
+        )
+    elif args.memory:
+        print("games  feed KiB  peak KiB  held KiB")
+        for spec in specs:
+            slate = generate_slate(spec, args.day)
+            feed_bytes = sum(len(json.dumps(f)) for f in slate.feeds.values())
+            peak, held = measure_memory(slate)
+            print(
+                f"{spec.games:5} {feed_bytes / 1024:9.0f} {peak / 1024:9.0f} {held / 1024:9.0f}"
+            )
+    else:
+        print(
+            "games  feed KiB  tweetable  known  new  fetch+parse ms  known ms  tweet loop ms  us/new play"
+        )
+        for spec in specs:
+            r = run_load(generate_slate(spec, args.day), args.known_fraction)
+            per_play = (
+                (
+                    r.fetch_and_parse_seconds
+                    + r.known_plays_seconds
+                    + r.tweet_loop_seconds
+                )
+                / r.new_plays
+                * 1e6
+                if r.new_plays
+                else 0.0
+            )
+            print(
+                f"{r.games:5} {r.feed_bytes / 1024:9.0f} {r.tweetable_plays:10} {r.known_plays:6} "
+                f"{r.new_plays:4} {r.fetch_and_parse_seconds * 1000:15.1f} "
+                f"{r.known_plays_seconds * 1000:9.1f} {r.tweet_loop_seconds * 1000:14.1f} {per_play:12.0f}"
+            )
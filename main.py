@@ -2,119 +2,371 @@ from __future__ import annotations
 
 import asyncio
 import os
+from collections import Counter
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
 
-from clients.abstract_sports_client import AbstractSportsClient
-from clients.mlb_client import MLBClient
-from clients.mysql_client import MySQLClient
-from clients.nba_client import NBAClient, PlayerLookupError
-from clients.nfl_client import NFLClient
-from clients.nhl_client import NHLClient
-from clients.twitter_client import TwitterClient
+from clients import deadline, loop_monitor, run_profiler
+from clients.http_transport import get_http_transport
+from clients.media_optimizer import get_upload_log
+from clients.payload_archive import get_payload_archive
+from clients.season_calendar import SeasonCalendar
+
+# The clients are imported where they are first needed. Most runs find no active games,
+# so they should not pay for importing tweepy, MySQLdb, aiohttp or google-cloud-storage.
+if TYPE_CHECKING:
+    from clients.abstract_sports_client import AbstractSportsClient
+    from clients.storage_client import StorageClient
+    from clients.tweet_outbox import TweetOutbox
+    from my_types import Game, State, TweetablePlay
 
 load_dotenv()
 
 
 DRY_RUN = os.environ.get("DRY_RUN", "false").lower() == "true"
 
+# Save plays and their tweets first, then post them, see clients/tweet_outbox.py
+TWEET_OUTBOX = os.environ.get("TWEET_OUTBOX", "false").lower() == "true" and not DRY_RUN
+
+# The function times out at 120s. Keep some of it to save what we did and flush the archive.
+RUN_DEADLINE_SECONDS = float(os.environ.get("RUN_DEADLINE_SECONDS", "105"))
+
+# Another instance updated the state while we were processing the same sport
+STATE_CONFLICT_ATTEMPTS = 3
+
 
 async def main(sports_client: AbstractSportsClient):
-    mysql_client = MySQLClient(dry_run=DRY_RUN, sports_client=sports_client)
-    twitter_client = TwitterClient(sports_client, dry_run=DRY_RUN)
+    # Set PROFILE_DIR to write a CPU and memory profile of each sport's run
+    with run_profiler.profiled(sports_client.sport):
+        await _main(sports_client)
+
 
+async def _main(sports_client: AbstractSportsClient):
     # Poll for today's games and find all the plays we haven't processed yet
-    games = sports_client.get_current_games()
+    with run_profiler.stage("get_current_games"):
+        games = sports_client.get_current_games()
     print(f"Found {len(games)} games")
-    active_games = mysql_client.get_active_games(games)
+    if not games:
+        print("No incomplete games")
+        return
+
+    from clients.storage_client import StateConflictError, get_storage_client
+
+    storage_client = get_storage_client(dry_run=DRY_RUN, sports_client=sports_client)
+    try:
+        for attempt in range(1, STATE_CONFLICT_ATTEMPTS + 1):
+            try:
+                await process_games(sports_client, storage_client, games)
+                break
+            except StateConflictError as e:
+                # Every play we tweeted is recorded, so starting over from the new state is safe
+                print(f"{e}, attempt {attempt} of {STATE_CONFLICT_ATTEMPTS}")
+    finally:
+        storage_client.close()
+        await sports_client.close()
+
+
+async def process_games(
+    sports_client: AbstractSportsClient,
+    storage_client: StorageClient,
+    games: list[Game],
+):
+    with run_profiler.stage("get_active_games"):
+        active_games = storage_client.get_active_games(games)
 
     if not active_games:
         print("No incomplete games")
         return
     print(f"Found {len(active_games)} active games")
 
+    # Only one run at a time may process a sport, whichever instance it is on
+    if not storage_client.acquire_lease():
+        print(f"Another run is processing {sports_client.sport}, skipping")
+        return
+    try:
+        await process_active_games(sports_client, storage_client, active_games)
+    finally:
+        storage_client.release_lease()
+
+
+async def process_active_games(
+    sports_client: AbstractSportsClient,
+    storage_client: StorageClient,
+    active_games: list[Game],
+):
     # Get the previous state
-    state = mysql_client.get_initial_state()
+    state = storage_client.get_initial_state()
     print(f"Inital state: {state}")
 
     # Side effect of updating the state if season period changes
     relevant_games = state.check_for_season_period_change(active_games)
 
-    known_plays = mysql_client.get_known_plays(relevant_games)
+    with run_profiler.stage("get_known_plays"):
+        known_plays = storage_client.get_known_plays(relevant_games)
     num_known_plays = sum(len(plays) for plays in known_plays.values())
     print(f"Found {num_known_plays} known plays")
-    tweetable_plays = await sports_client.get_tweetable_plays(
-        relevant_games, known_plays
-    )
+    # Set SPECULATIVE_RENDERS to render the scorecards of likely next matches ahead of time
+    from clients.scorecard_cache import get_scorecard_cache
+
+    scorecard_cache = get_scorecard_cache(sports_client.sport)
+    if scorecard_cache:
+        sports_client.active_players = Counter()
+    with run_profiler.stage("get_tweetable_plays"):
+        tweetable_plays = await sports_client.get_tweetable_plays(
+            relevant_games, known_plays
+        )
     print(f"Found {len(tweetable_plays)} tweetable plays")
 
+    outbox = None
+    if TWEET_OUTBOX:
+        from clients.tweet_outbox import TweetOutbox
+
+        outbox = TweetOutbox(storage_client, sports_client, dry_run=DRY_RUN)
+
+    with run_profiler.stage("tweets"):
+        tweeted = await tweet_plays(
+            sports_client, storage_client, state, outbox, tweetable_plays
+        )
+        tweeted += await retry_deferred_plays(
+            sports_client, storage_client, state, outbox, relevant_games
+        )
+        if outbox:
+            # Games only complete once their tweets are out, so a failed post is retried next run.
+            # Also drains tweets left over from a run that died while posting.
+            await outbox.drain(state)
+
+    # Set VARIANTS to play more alphabet games off the same plays
+    from clients.variants import VariantEngine
+
+    variant_engine = VariantEngine.from_env(sports_client, dry_run=DRY_RUN)
+    if variant_engine and tweeted:
+        left = deadline.remaining()
+        if left is not None and left < deadline.UNMATCHED_TWEET_SECONDS:
+            print("No time for the variants, they miss this run's plays")
+        else:
+            with run_profiler.stage("variants"):
+                for result in variant_engine.play(relevant_games, tweeted):
+                    print(
+                        f"{variant_engine.state_key(result.variant)}: {result.matches} of "
+                        f"{result.plays} new plays matched, on {result.letter}"
+                    )
+
+    if scorecard_cache and sports_client.active_players and relevant_games:
+        started = scorecard_cache.speculate(
+            state,
+            sports_client.active_players,
+            # The games all have the same season period once checked
+            sports_client.season_phrase(relevant_games[0].season_period),
+        )
+        print(f"Started rendering {started} scorecards")
+        print(scorecard_cache.report())
+
+    # Games stay active while they have deferred plays, so the next run fetches them again
+    deferred_game_ids = sports_client.deferred_plays.game_ids()
+    storage_client.set_completed_games(
+        [g for g in active_games if g.game_id not in deferred_game_ids]
+    )
+    if not tweeted:
+        storage_client.update_state(state)
+
+
+async def retry_deferred_plays(
+    sports_client: AbstractSportsClient,
+    storage_client: StorageClient,
+    state: State,
+    outbox: TweetOutbox | None,
+    games: list[Game],
+) -> list[TweetablePlay]:
+    """
+    Fetch the games with deferred plays again, if they are due soon and the run has time.
+
+    Returns the plays tweeted.
+    """
+    from clients.deferred_plays import FAST_RETRY_MAX_SECONDS
+
+    deferred_plays = sports_client.deferred_plays
+    wait = deferred_plays.due_within(FAST_RETRY_MAX_SECONDS)
+    if wait is None:
+        return []
+    left = deadline.remaining()
+    if left is not None and left < wait + deadline.MATCHED_TWEET_SECONDS:
+        print("No time to retry deferred plays, leaving them for the next run")
+        return []
+
+    print(f"Retrying deferred plays in {wait:.0f}s")
+    await asyncio.sleep(wait)
+    deferred_game_ids = deferred_plays.game_ids()
+    retry_games = [g for g in games if g.game_id in deferred_game_ids]
+    # Including whatever was just tweeted
+    known_plays = storage_client.get_known_plays(retry_games)
+    tweetable_plays = await sports_client.get_tweetable_plays(retry_games, known_plays)
+    print(f"Found {len(tweetable_plays)} tweetable plays on retry")
+    print(deferred_plays.report())
+    return await tweet_plays(
+        sports_client, storage_client, state, outbox, tweetable_plays
+    )
+
+
+async def tweet_plays(
+    sports_client: AbstractSportsClient,
+    storage_client: StorageClient,
+    state: State,
+    outbox: TweetOutbox | None,
+    tweetable_plays: list[TweetablePlay],
+) -> list[TweetablePlay]:
+    """Tweet the plays in order, or queue them in the outbox. Returns those it did."""
     # Keep only 5 tweetable plays in dry run to speed things up
     if DRY_RUN:
         tweetable_plays = tweetable_plays[:5]
-
     if not tweetable_plays:
-        mysql_client.set_completed_games(active_games)
-        mysql_client.update_state(state)
-        mysql_client.connection.close()
-        return
+        return []
+
+    from clients.deferred_plays import NBA_PLAYER_LOOKUP, Deferral
+    from clients.nba_client import NBAClient, PlayerLookupError
+    from clients.twitter_client import TwitterClient
+
+    twitter_client = TwitterClient(sports_client, dry_run=DRY_RUN)
 
+    tweeted: list[TweetablePlay] = []
     for p in tweetable_plays:
         # NBA player name lookup is expensive, so do it only for new tweetable plays
         if isinstance(sports_client, NBAClient):
             try:
                 p.player_name = sports_client._get_player_name(p.player_id)
             except PlayerLookupError:
-                # The way we get player name is slightly flaky. If we can't find it, just skip and get it next time
+                # The way we get player name is slightly flaky. If we can't find it, skip it for now
+                sports_client.deferred_plays.add(
+                    [Deferral(p.game_id, p.play_id, NBA_PLAYER_LOOKUP)]
+                )
                 continue
 
         matching_letters = state.find_matching_letters(p)
+        # Stop before starting a tweet we may not finish. Games stay active, so the rest
+        # of the plays are picked up next run from the state saved so far.
+        deadline.check(
+            deadline.MATCHED_TWEET_SECONDS
+            if matching_letters
+            else deadline.UNMATCHED_TWEET_SECONDS,
+            f"play {p.play_id}",
+        )
+        tweeted.append(p)
+        if outbox:
+            outbox.enqueue(p, state, matching_letters)
+            continue
         is_match = False
 
         if matching_letters:
             # Tweet it
             is_match = True
-            twitter_client.tweet_matched(p, state, matching_letters)
+            await twitter_client.tweet_matched(p, state, matching_letters)
 
         else:
-            twitter_client.tweet_unmatched(p, state)
+            await twitter_client.tweet_unmatched(p, state)
 
-        mysql_client.update_state(state)
-        mysql_client.add_tweetable_play(p, state, is_match)
+        try:
+            storage_client.update_state(state)
+        finally:
+            # Record the play even if the state moved under us, so nobody tweets it again
+            storage_client.add_tweetable_play(p, state, is_match)
+    report = twitter_client.report()
+    if report:
+        print(report)
+    return tweeted
 
-    mysql_client.set_completed_games(active_games)
-    mysql_client.connection.close()
+
+def _outside_game_windows(calendar: SeasonCalendar) -> bool:
+    # Dry runs should always exercise the full path, even on yesterday's games
+    if DRY_RUN or not calendar.is_idle():
+        return False
+    print(f"No {calendar.sport} games scheduled right now, skipping")
+    return True
 
 
 async def main_mlb():
+    calendar = SeasonCalendar("MLB")
+    if _outside_game_windows(calendar):
+        return
     print("Starting MLB")
+    from clients.mlb_client import MLBClient
+
     mlb_client = MLBClient(dry_run=DRY_RUN)
+    calendar.refresh_if_stale(mlb_client)
+    if _outside_game_windows(calendar):
+        return
     await main(mlb_client)
     print("Ending MLB")
 
 
 async def main_nhl():
+    calendar = SeasonCalendar("NHL")
+    if _outside_game_windows(calendar):
+        return
     print("Starting NHL")
+    from clients.nhl_client import NHLClient
+
     nhl_client = NHLClient(dry_run=DRY_RUN)
+    calendar.refresh_if_stale(nhl_client)
+    if _outside_game_windows(calendar):
+        return
     await main(nhl_client)
     print("Ending NHL")
 
 
 async def main_nba():
+    calendar = SeasonCalendar("NBA")
+    if _outside_game_windows(calendar):
+        return
     print("Starting NBA")
+    from clients.nba_client import NBAClient
+
     nba_client = NBAClient(dry_run=DRY_RUN)
+    calendar.refresh_if_stale(nba_client)
+    if _outside_game_windows(calendar):
+        return
     await main(nba_client)
     print("Ending NBA")
 
 
 async def main_nfl():
+    calendar = SeasonCalendar("NFL")
+    if _outside_game_windows(calendar):
+        return
     print("Starting NFL")
+    from clients.nfl_client import NFLClient
+
     nfl_client = NFLClient(dry_run=DRY_RUN)
+    calendar.refresh_if_stale(nfl_client)
+    if _outside_game_windows(calendar):
+        return
     await main(nfl_client)
     print("Ending NFL")
 
 
+SPORT_RUNNERS = {"MLB": main_mlb, "NHL": main_nhl, "NFL": main_nfl, "NBA": main_nba}
+
+
 def run(event, context):
-    asyncio.run(main_mlb())
-    asyncio.run(main_nhl())
-    asyncio.run(main_nfl())
-    asyncio.run(main_nba())
+    # Split the sports over several functions with SPORTS=NBA,NHL, the leases keep runs of a sport apart
+    with deadline.deadline(RUN_DEADLINE_SECONDS):
+        for sport in os.environ.get("SPORTS", "MLB,NHL,NFL,NBA").split(","):
+            try:
+                asyncio.run(
+                    loop_monitor.monitored(
+                        SPORT_RUNNERS[sport.strip().upper()](), sport.strip().upper()
+                    )
+                )
+            except deadline.DeadlineExceeded as e:
+                print(f"Out of time at {sport}, leaving the rest for the next run: {e}")
+                break
+    # The instance may be frozen once we return, so finish writing the archived payloads now
+    archive = get_payload_archive()
+    if archive:
+        archive.flush()
+    report = get_http_transport().report()
+    if report:
+        print(report)
+    upload_log = get_upload_log()
+    if upload_log.uploads:
+        print(upload_log.report())
+        upload_log.clear()
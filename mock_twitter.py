@@ -0,0 +1,239 @@
+"""
+A local stand-in for the Twitter v1.1 endpoints we post to, and a posting benchmark against it.
+
+It takes simple and chunked media uploads and status updates, checks each request's OAuth
+signature, and can add latency and fail the first requests with a status to exercise the
+retries. Post tweets with scorecard-sized images through AsyncTwitterClient, several at once:
+
+    python mock_twitter.py --tweets 200 --concurrency 1 --latency-ms 50 --image-kb 150
+
+Or point a dry run's TwitterClient at it with TWITTER_CLIENT=async and the URLs it prints:
+
+    python mock_twitter.py --serve
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from aiohttp import web
+from oauthlib.common import Request  # type: ignore
+from oauthlib.oauth1.rfc5849 import signature  # type: ignore
+
+from clients.async_twitter_client import AsyncTwitterClient
+from my_types import TwitterCredentials
+
+CREDENTIALS = TwitterCredentials("consumer", "consumer-secret", "token", "token-secret")
+
+
+@dataclass
+class MockTwitter:
+    credentials: TwitterCredentials = field(default_factory=lambda: CREDENTIALS)
+    latency: float = 0.0  # Seconds before each response
+    fail_with: list[int] = field(default_factory=list)  # Statuses for the next requests
+    # Tweet id to (status, media ids, in reply to)
+    statuses: dict[int, tuple[str, list[int], int | None]] = field(default_factory=dict)
+    media: dict[int, bytes] = field(default_factory=dict)
+    requests: int = 0
+    # Client addresses seen, one per connection
+    connections: set[tuple[str, int]] = field(default_factory=set)
+    _ids: itertools.count = field(default_factory=lambda: itertools.count(1000))
+
+    def app(self) -> web.Application:
+        app = web.Application(
+            client_max_size=16 * 1024 * 1024, middlewares=[_rejections]
+        )
+        app.router.add_post("/1.1/media/upload.json", self.upload)
+        app.router.add_get("/1.1/media/upload.json", self.upload_status)
+        app.router.add_post("/1.1/statuses/update.json", self.update_status)
+        return app
+
+    async def upload(self, request: web.Request) -> web.Response:
+        form = await self._check(request)
+        command = form.get("command")
+        if command is None:
+            media_id = next(self._ids)
+            self.media[media_id] = form["media"].file.read()
+        elif command == "INIT":
+            media_id = next(self._ids)
+            self.media[media_id] = b""
+        elif command == "APPEND":
+            media_id = int(form["media_id"])
+            self.media[media_id] += form["media"].file.read()
+            return web.Response(status=204)
+        elif command == "FINALIZE":
+            media_id = int(form["media_id"])
+        else:
+            return _error(400, f"Unknown command {command}")
+        return web.json_response(
+            {"media_id": media_id, "media_id_string": str(media_id)}
+        )
+
+    async def upload_status(self, request: web.Request) -> web.Response:
+        await self._check(request)
+        media_id = request.query["media_id"]
+        return web.json_response(
+            {"media_id_string": media_id, "processing_info": {"state": "succeeded"}}
+        )
+
+    async def update_status(self, request: web.Request) -> web.Response:
+        form = await self._check(request)
+        media_ids = [int(m) for m in form.get("media_ids", "").split(",") if m]
+        if any(m not in self.media for m in media_ids):
+            return _error(400, "Unknown media id")
+        in_reply_to = form.get("in_reply_to_status_id")
+        if in_reply_to and int(in_reply_to) not in self.statuses:
+            return _error(400, "Replying to a tweet that doesn't exist")
+        tweet_id = next(self._ids)
+        self.statuses[tweet_id] = (
+            form["status"],
+            media_ids,
+            int(in_reply_to) if in_reply_to else None,
+        )
+        return web.json_response({"id": tweet_id, "id_str": str(tweet_id)})
+
+    async def _check(self, request: web.Request):
+        """The request's form, once its signature checks out and any delay or failure is done."""
+        self.requests += 1
+        if request.transport:
+            self.connections.add(request.transport.get_extra_info("peername"))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_with:
+            raise Rejected(self.fail_with.pop(0), "Failing as asked")
+        form = await request.post()
+        body = None
+        if request.content_type == "application/x-www-form-urlencoded":
+            body = await request.text()
+        oauth_request = Request(
+            str(request.url), request.method, body, dict(request.headers)
+        )
+        oauth_request.params = signature.collect_parameters(
+            uri_query=oauth_request.uri_query,
+            body=oauth_request.body,
+            headers=oauth_request.headers,
+        )
+        oauth_request.signature = dict(
+            signature.collect_parameters(
+                headers=oauth_request.headers, exclude_oauth_signature=False
+            )
+        ).get("oauth_signature")
+        if not oauth_request.signature or not signature.verify_hmac_sha1(
+            oauth_request,
+            self.credentials.consumer_secret,
+            self.credentials.access_token_secret,
+        ):
+            raise Rejected(401, "Could not authenticate you")
+        return form
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@web.middleware
+async def _rejections(request: web.Request, handler) -> web.StreamResponse:
+    try:
+        return await handler(request)
+    except Rejected as e:
+        return _error(e.status, str(e))
+
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({"errors": [{"message": message}]}, status=status)
+
+
+@contextlib.asynccontextmanager
+async def serve(mock: MockTwitter) -> AsyncIterator[str]:
+    """The base URL of the mock while it is being served, like http://127.0.0.1:1234/1.1"""
+    runner = web.AppRunner(mock.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    try:
+        yield f"http://127.0.0.1:{port}/1.1"
+    finally:
+        await runner.cleanup()
+
+
+async def benchmark(
+    tweets: int, concurrency: int, latency: float, image_bytes: int
+) -> dict[str, float]:
+    """Tweets per second and the median and p95 seconds of a tweet, upload included."""
+    import aiohttp
+
+    mock = MockTwitter(latency=latency)
+    image = bytes(range(256)) * (image_bytes // 256)
+    async with serve(mock) as url, aiohttp.ClientSession() as session:
+        client = AsyncTwitterClient(CREDENTIALS, session, api_url=url, upload_url=url)
+        slots = asyncio.Semaphore(concurrency)
+        latencies: list[float] = []
+
+        async def tweet(i: int) -> None:
+            async with slots:
+                started = time.perf_counter()
+                media_id = await client.media_upload(image, "scorecard.jpg")
+                await client.update_status(f"Tweet {i}", media_ids=[media_id])
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(tweet(i) for i in range(tweets)))
+        seconds = time.perf_counter() - started
+    assert len(mock.statuses) == tweets
+    return {
+        "tweets_per_second": tweets / seconds,
+        "p50": statistics.median(latencies),
+        "p95": statistics.quantiles(latencies, n=20)[-1],
+    }
+
+
+async def _serve_forever(port: int) -> None:
+    runner = web.AppRunner(MockTwitter().app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    url = f"http://127.0.0.1:{port}/1.1"
+    print(f"TWITTER_API_URL={url}\nTWITTER_UPLOAD_URL={url}")
+    c = CREDENTIALS
+    print(
+        f"Credentials: {c.consumer_key} {c.consumer_secret} {c.access_token} "
+        f"{c.access_token_secret}"
+    )
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tweets", type=int, default=200)
+    parser.add_argument(
+        "--concurrency", type=int, default=1, help="The bot posts one at a time"
+    )
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--image-kb", type=int, default=150)
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(_serve_forever(args.port))
+    else:
+        r = asyncio.run(
+            benchmark(
+                args.tweets,
+                args.concurrency,
+                args.latency_ms / 1000,
+                args.image_kb * 1024,
+            )
+        )
+        print(
+            f"{r['tweets_per_second']:.1f} tweets/s, p50 {r['p50'] * 1000:.0f}ms, "
+            f"p95 {r['p95'] * 1000:.0f}ms"
+        )
@@ -1,13 +1,33 @@
 from __future__ import annotations
 
+import dataclasses
+import sys
 from dataclasses import dataclass
 from enum import Enum
-from typing import Literal
-
-from unidecode import unidecode
+from typing import Literal, TypeVar
 
 Sport = Literal["NBA", "MLB", "NHL", "NFL"]
 
+T = TypeVar("T")
+
+
+def slotted(cls: type[T]) -> type[T]:
+    """
+    dataclass(slots=True) for Python 3.9. Put it above @dataclass.
+
+    An instance keeps its fields in slots instead of a __dict__, which is about half the
+    memory for the thousands of plays and games a big slate makes.
+    """
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(f.name for f in dataclasses.fields(cls))  # type: ignore
+    cls_dict["__slots__"] = field_names
+    # Defaults are already baked into __init__, and would clash with the slots
+    for name in field_names:
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    return type(cls.__name__, cls.__bases__, cls_dict)  # type: ignore
+
 
 class SeasonPeriod(Enum):
     PRESEASON = "preseason"
@@ -37,22 +57,20 @@ class State:
     initial_tweet_id: int
     scores_since_last_match: int | None
     initial_scores_since_last_match: int | None
+    version: int = (
+        0  # Bumped on every update, so a stale writer can't overwrite newer state
+    )
 
     @property
     def next_letter(self) -> str:
         return chr(ord(self.current_letter) + 1) if self.current_letter != "Z" else "A"
 
     def find_matching_letters(self, play: TweetablePlay) -> list[str]:
+        return self.match_letters(clean_player_name(play.player_name))
+
+    def match_letters(self, cleaned_name: str) -> list[str]:
+        """Move past every letter in a row that the name has. See clean_player_name."""
         matching_letters: list[str] = []
-        cleaned_name = (
-            unidecode(play.player_name)
-            .upper()
-            .removesuffix(" JR.")
-            .removesuffix(" SR.")
-            .removesuffix(" III")
-            .removesuffix(" II")
-            .removesuffix(" IV")
-        )
         while self.current_letter in cleaned_name:
             matching_letters.append(self.current_letter)
             self.current_letter = self.next_letter
@@ -137,6 +155,22 @@ class State:
         self.scores_since_last_match = 0
 
 
+def clean_player_name(player_name: str) -> str:
+    """Upper case ASCII, without a suffix, the letters that count for the alphabet game."""
+    from unidecode import unidecode
+
+    return (
+        unidecode(player_name)
+        .upper()
+        .removesuffix(" JR.")
+        .removesuffix(" SR.")
+        .removesuffix(" III")
+        .removesuffix(" II")
+        .removesuffix(" IV")
+    )
+
+
+@slotted
 @dataclass
 class TweetablePlay:
     """A play that if tweetable, assuming we are on the right letter. We need to record the list of seen plays on end run."""
@@ -156,6 +190,14 @@ class TweetablePlay:
     season_phrase: str  # "in the 2022-23 season". Can be simplified once we don't need to support partial MLB season anymore.
     tweet_id: int | None = None
     tweet_text: str = ""
+    description: str = ""  # NHL's own words for the goal, it changes with the details
+
+    def __post_init__(self) -> None:
+        # Repeated on every play of a game or a player, keep one copy of each
+        self.player_name = sys.intern(self.player_name)
+        self.image_name = sys.intern(self.image_name)
+        self.tweet_phrase = sys.intern(self.tweet_phrase)
+        self.season_phrase = sys.intern(self.season_phrase)
 
 
 KnownPlays = dict[str, list[str]]
@@ -174,6 +216,31 @@ class ImageInput:
     tweet_id: str  # "1613770857377136640"
 
 
+@dataclass
+class OutboxEntry:
+    """A tweet waiting to be posted, saved together with its play and state change."""
+
+    idempotency_key: str  # MLB:717465:61, one tweet per play
+    sport: Sport
+    game_id: str
+    play_id: str
+    status_text: str
+    is_reply: bool  # Unmatched plays reply to whatever the latest tweet is when they are posted
+    image_input: ImageInput | None = None  # Only matched plays have a scorecard
+    status: str = (
+        "pending"  # pending, sending (sent but not confirmed), posted or skipped
+    )
+    tweet_id: int | None = None
+    entry_id: int | None = None
+
+
+@dataclass
+class GameWindow:
+    start: float  # Epoch seconds, a little before the scheduled start
+    end: float  # Epoch seconds, once even a long game must be over
+
+
+@slotted
 @dataclass
 class Game:
     game_id: str  # NBA needs strings like "0012200002"
@@ -181,4 +248,4 @@ class Game:
     home_team_id: int
     away_team_id: int
     season_period: SeasonPeriod
-    payload: dict | None = None
+    payload: dict | None = None  # Only while get_tweetable_plays parses this game
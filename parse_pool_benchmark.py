@@ -0,0 +1,89 @@
+"""
+Find how many games it takes for the parse pool to beat parsing in the event loop's thread.
+
+Feeds come from load_generator.py and are already in memory, so only decoding and parsing
+are timed, both ways. The pool is started before timing, as it is on a warm instance.
+
+    python parse_pool_benchmark.py NHL --workers 4 --plays 400
+
+Set PARSE_POOL_MIN_GAMES to the crossover it prints.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import time
+
+from clients.fetch_scheduler import FetchResult
+from clients.parse_pool import ParsePool
+from clients.sports_clients import get_sports_client
+from load_generator import SlateSpec, generate_slate, prepare_client
+
+RUNS = 5
+
+
+def benchmark(
+    sport: str, games: int, plays_per_game: int, pool: ParsePool
+) -> tuple[float, float]:
+    """Median seconds to parse the slate in this process, and in the pool."""
+    slate = generate_slate(SlateSpec(sport, games, plays_per_game))  # type: ignore
+    sports_client = get_sports_client(slate.spec.sport, dry_run=True)
+    prepare_client(sports_client, slate)
+    schedule_games = sports_client.games_from_schedule(
+        slate.schedule, slate.day, slate.day
+    )
+    feeds = {
+        game_id: FetchResult(200, "application/json", json.dumps(feed).encode())
+        for game_id, feed in slate.feeds.items()
+    }
+
+    inline, pooled = [], []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        sports_client._parse_feeds(schedule_games, feeds, {})
+        inline.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        asyncio.run(pool.parse(sports_client, schedule_games, feeds, {}))
+        pooled.append(time.perf_counter() - started)
+    return statistics.median(inline), statistics.median(pooled)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("sport", choices=["MLB", "NHL", "NBA", "NFL"])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--plays", type=int, default=400, help="Plays per game")
+    parser.add_argument("--games", default="1,2,4,8,16,32,64")
+    args = parser.parse_args()
+
+    pool = ParsePool(args.workers, min_games=1)
+    started = time.perf_counter()
+    # Start every worker and let each import the clients
+    list(pool.executor.map(time.sleep, [0.1] * args.workers))
+    print(f"Started {args.workers} workers in {time.perf_counter() - started:.2f}s")
+
+    crossover = None
+    print("games  inline ms  pool ms  speedup")
+    try:
+        for games in [int(g) for g in args.games.split(",")]:
+            # NHL prints the odd missing score
+            with contextlib.redirect_stdout(io.StringIO()):
+                inline, pooled = benchmark(args.sport, games, args.plays, pool)
+            print(
+                f"{games:5} {inline * 1000:10.1f} {pooled * 1000:8.1f} {inline / pooled:8.2f}x"
+            )
+            if crossover is None and pooled < inline:
+                crossover = games
+    finally:
+        pool.close()
+    if crossover:
+        print(
+            f"The pool pays off from {crossover} games: PARSE_POOL_MIN_GAMES={crossover}"
+        )
+    else:
+        print("The pool never paid off")
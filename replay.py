@@ -0,0 +1,429 @@
+"""
+Replay archived schedules and play-by-play feeds through the live parsers and State machine.
+
+The archive is a directory with a folder per sport and day:
+
+    <archive_dir>/MLB/2022-04-07/schedule.json
+    <archive_dir>/MLB/2022-04-07/661032.json
+
+Backfill it from the APIs once, then replay it as often as needed:
+
+    python replay.py MLB 2022-04-07 2022-10-05 --backfill
+    python replay.py MLB 2022-04-07 2022-10-05 --output mlb_2022.jsonl
+
+Or replay what the live runs saw, from their PAYLOAD_ARCHIVE_DIR:
+
+    python replay.py NHL 2023-03-01 2023-03-31 --payload-archive /tmp/payloads
+
+Feed parsing is spread over a process pool. The plays are then put in time order and run
+through State in this process, so the output is the same for any number of workers.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from clients import http_transport
+from clients.abstract_sports_client import AbstractSportsClient
+from clients.payload_archive import ArchiveReader
+from clients.sports_clients import get_sports_client
+from my_types import Game, Sport, State, TweetablePlay
+
+
+class FeedDirectory:
+    """Schedules and play-by-play feeds saved as plain JSON files."""
+
+    def __init__(self, archive_dir: str) -> None:
+        self.archive_dir = archive_dir
+
+    def load_schedule(self, sport: Sport, day: datetime.date) -> dict | None:
+        # NBA has one schedule for the whole season
+        return self._load(self._day_path(sport, day, "schedule")) or self._load(
+            os.path.join(self.archive_dir, sport, "schedule.json")
+        )
+
+    def games_for_day(
+        self, sports_client: AbstractSportsClient, day: datetime.date
+    ) -> list[Game]:
+        schedule = self.load_schedule(sports_client.sport, day)
+        if schedule is None:
+            return []
+        return sports_client.games_from_schedule(schedule, day, day)
+
+    def load_feed(self, sport: Sport, day: datetime.date, game_id: str) -> dict | None:
+        return self._load(self._day_path(sport, day, game_id))
+
+    def has_feed(self, sport: Sport, day: datetime.date, game_id: str) -> bool:
+        return os.path.exists(self._day_path(sport, day, game_id))
+
+    def save_schedule(
+        self, sport: Sport, day: datetime.date | None, schedule: dict
+    ) -> None:
+        if day is None:
+            self._save(os.path.join(self.archive_dir, sport, "schedule.json"), schedule)
+        else:
+            self._save(self._day_path(sport, day, "schedule"), schedule)
+
+    def save_feed(
+        self, sport: Sport, day: datetime.date, game_id: str, feed: dict
+    ) -> None:
+        self._save(self._day_path(sport, day, game_id), feed)
+
+    def load_rosters(self, sport: Sport) -> dict[int, dict[str, int]]:
+        """NFL rosters saved with the feeds, like load_generator.py does. Empty if there are none."""
+        rosters = self._load(os.path.join(self.archive_dir, sport, "rosters.json"))
+        return {int(team_id): r for team_id, r in (rosters or {}).items()}
+
+    def save_rosters(self, sport: Sport, rosters: dict[int, dict[str, int]]) -> None:
+        self._save(os.path.join(self.archive_dir, sport, "rosters.json"), rosters)
+
+    def load_player_names(self, sport: Sport) -> dict[int, str]:
+        """NBA player names saved with the feeds. Empty if there are none."""
+        names = self._load(os.path.join(self.archive_dir, sport, "player_names.json"))
+        return {int(player_id): name for player_id, name in (names or {}).items()}
+
+    def save_player_names(self, sport: Sport, names: dict[int, str]) -> None:
+        self._save(os.path.join(self.archive_dir, sport, "player_names.json"), names)
+
+    def _day_path(self, sport: Sport, day: datetime.date, name: str) -> str:
+        return os.path.join(self.archive_dir, sport, day.isoformat(), f"{name}.json")
+
+    @staticmethod
+    def _load(path: str) -> dict | None:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _save(path: str, payload: dict) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(payload, f, separators=(",", ":"))
+
+
+class ArchiveFeedSource:
+    """The schedules and feeds the live runs saw, from a PayloadArchive."""
+
+    def __init__(self, archive_dir: str) -> None:
+        self.archive_dir = archive_dir
+        self._reader: ArchiveReader | None = None
+        self._first_fetched: dict[str, float] = {}
+
+    def __getstate__(self) -> dict:
+        # Sent to the workers, which open their own memory maps
+        return {"archive_dir": self.archive_dir, "_reader": None, "_first_fetched": {}}
+
+    @property
+    def reader(self) -> ArchiveReader:
+        if self._reader is None:
+            self._reader = ArchiveReader(self.archive_dir)
+        return self._reader
+
+    def games_for_day(
+        self, sports_client: AbstractSportsClient, day: datetime.date
+    ) -> list[Game]:
+        """The games first fetched on this day, as described by the latest schedule that had them."""
+        sport = sports_client.sport
+        if not self._first_fetched:
+            for e in self.reader.entries(sport, "play_by_play"):
+                self._first_fetched.setdefault(e.game_id, e.fetched_at)
+        day_start = datetime.datetime.combine(day, datetime.time()).timestamp()
+        day_end = day_start + 24 * 60 * 60
+        game_ids = {
+            game_id
+            for game_id, fetched_at in self._first_fetched.items()
+            if day_start <= fetched_at < day_end
+        }
+
+        games: dict[str, Game] = {}
+        schedules = self.reader.entries(sport, "schedule", end=day_end + 24 * 60 * 60)
+        # The latest schedule usually has every game, so stop as soon as we found them all
+        for e in reversed(schedules):
+            if len(games) == len(game_ids):
+                break
+            for g in sports_client.games_from_schedule(
+                self.reader.read_json(e),
+                day - datetime.timedelta(days=1),
+                day + datetime.timedelta(days=1),
+            ):
+                if g.game_id in game_ids and g.game_id not in games:
+                    games[g.game_id] = g
+        return [games[game_id] for game_id in sorted(games)]
+
+    def load_feed(self, sport: Sport, day: datetime.date, game_id: str) -> dict | None:
+        entry = self.reader.latest(sport, "play_by_play", game_id)
+        return self.reader.read_json(entry) if entry else None
+
+
+@dataclass
+class ReplayShard:
+    source: FeedDirectory | ArchiveFeedSource
+    sport: Sport
+    day: datetime.date
+    games: list[Game]
+
+
+@dataclass
+class ShardResult:
+    # (day, game index, play index, play), enough to put every play in a stable order
+    plays: list[tuple[str, int, int, TweetablePlay]] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+def days_between(start: datetime.date, end: datetime.date) -> Iterator[datetime.date]:
+    day = start
+    while day <= end:
+        yield day
+        day += datetime.timedelta(days=1)
+
+
+def backfill(
+    sport: Sport, start: datetime.date, end: datetime.date, archive_dir: str
+) -> None:
+    """Download the schedule and every missing feed for start through end."""
+    feeds = FeedDirectory(archive_dir)
+    sports_client = get_sports_client(sport, dry_run=True)
+    # NBA has one schedule URL for the whole season, so only fetch and save it once
+    season_schedule: dict | None = None
+    if sports_client.schedule_url(start, start) == sports_client.schedule_url(end, end):
+        season_schedule = http_transport.get(
+            sports_client.schedule_url(start, end)
+        ).json()
+        feeds.save_schedule(sport, None, season_schedule)
+
+    for day in days_between(start, end):
+        schedule = season_schedule
+        if schedule is None:
+            schedule = http_transport.get(sports_client.schedule_url(day, day)).json()
+            feeds.save_schedule(sport, day, schedule)
+
+        games = [
+            g
+            for g in sports_client.games_from_schedule(schedule, day, day)
+            if not feeds.has_feed(sport, day, g.game_id)
+        ]
+        asyncio.run(_fetch_feeds(sports_client, games))
+        for g in games:
+            if g.payload:
+                feeds.save_feed(sport, day, g.game_id, g.payload)
+        print(f"{day}: saved {sum(1 for g in games if g.payload)} new {sport} feeds")
+
+
+async def _fetch_feeds(sports_client: AbstractSportsClient, games: list[Game]) -> None:
+    # Each day runs in its own event loop, and the feed session belongs to it
+    try:
+        await sports_client.fetch_play_by_play(games)
+    finally:
+        await sports_client.close()
+
+
+_worker_client: AbstractSportsClient | None = None
+
+
+def _init_worker(sport: Sport, known_rosters: dict) -> None:
+    global _worker_client
+    _worker_client = _replay_client(sport, known_rosters)
+
+
+def _replay_client(sport: Sport, known_rosters: dict) -> AbstractSportsClient:
+    sports_client = get_sports_client(sport, dry_run=True)
+    if sport == "NBA":
+        # Looked up once for the whole replay, in the parent process
+        sports_client.lookup_player_names = False  # type: ignore
+    elif sport == "NFL":
+        sports_client.known_rosters = known_rosters  # type: ignore
+    return sports_client
+
+
+def _parse_shard(shard: ReplayShard) -> ShardResult:
+    sports_client = _worker_client or _replay_client(shard.sport, {})
+    result = ShardResult()
+    for game_index, g in enumerate(shard.games):
+        g.payload = shard.source.load_feed(shard.sport, shard.day, g.game_id)
+        if not g.payload:
+            result.errors.append(f"{shard.day} {g.game_id}: no feed")
+            continue
+        try:
+            plays = sports_client.parse_tweetable_plays([g], {})
+        except Exception as e:
+            result.errors.append(f"{shard.day} {g.game_id}: {e!r}")
+            continue
+        finally:
+            # The parsed plays are all we need, don't send the feed back to the parent
+            g.payload = None
+        for play_index, p in enumerate(plays):
+            result.plays.append((shard.day.isoformat(), game_index, play_index, p))
+    return result
+
+
+def replay(
+    sport: Sport,
+    start: datetime.date,
+    end: datetime.date,
+    source: FeedDirectory | ArchiveFeedSource,
+    workers: int | None = None,
+) -> list[dict]:
+    """Regenerate the tweetable_plays rows for start through end from the archive."""
+    sports_client = _replay_client(sport, {})
+
+    shards: list[ReplayShard] = []
+    for day in days_between(start, end):
+        games = source.games_for_day(sports_client, day)
+        if games:
+            shards.append(ReplayShard(source, sport, day, games))
+
+    # Rosters are fetched once here instead of once per worker
+    known_rosters: dict = {}
+    if sport == "NFL":
+        if isinstance(source, FeedDirectory):
+            sports_client.known_rosters.update(source.load_rosters(sport))  # type: ignore
+        for shard in shards:
+            for g in shard.games:
+                for team_id in [g.home_team_id, g.away_team_id]:
+                    sports_client.get_roster(team_id)  # type: ignore
+        known_rosters = sports_client.known_rosters  # type: ignore
+
+    results: list[ShardResult]
+    if workers == 1:
+        _init_worker(sport, known_rosters)
+        results = [_parse_shard(shard) for shard in shards]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(sport, known_rosters),
+        ) as pool:
+            results = list(pool.map(_parse_shard, shards))
+
+    plays: list[tuple[str, int, int, TweetablePlay]] = []
+    for r in results:
+        plays.extend(r.plays)
+        for error in r.errors:
+            print(f"Skipped {error}")
+    # NFL has no play times, so its plays stay in feed order within each game
+    plays.sort(key=lambda x: (x[0], x[3].end_time, x[1], x[3].tiebreaker, x[2]))
+
+    if sport == "NBA":
+        if isinstance(source, FeedDirectory):
+            sports_client.known_players.update(source.load_player_names(sport))  # type: ignore
+        _set_player_names(sports_client, [p for _, _, _, p in plays])
+
+    return _apply_state(shards, plays)
+
+
+def _set_player_names(sports_client: AbstractSportsClient, plays: list[TweetablePlay]):
+    from clients.nba_client import PlayerLookupError
+
+    for p in plays:
+        try:
+            p.player_name = sports_client._get_player_name(p.player_id)  # type: ignore
+        except PlayerLookupError:
+            pass
+
+
+def _apply_state(
+    shards: list[ReplayShard], plays: list[tuple[str, int, int, TweetablePlay]]
+) -> list[dict]:
+    if not shards:
+        return []
+    first_period = shards[0].games[0].season_period
+    state = State(
+        current_letter="A",
+        initial_current_letter="A",
+        times_cycled=0,
+        initial_times_cycled=0,
+        season=first_period.value,
+        initial_season=first_period.value,
+        tweet_id=0,
+        initial_tweet_id=0,
+        scores_since_last_match=0,
+        initial_scores_since_last_match=0,
+    )
+
+    plays_by_day: dict[str, list[TweetablePlay]] = {}
+    for day, _, _, p in plays:
+        plays_by_day.setdefault(day, []).append(p)
+
+    rows: list[dict] = []
+    for shard in shards:
+        day = shard.day.isoformat()
+        # Same as a live run: the season period can reset the state or rule out some games
+        relevant_game_ids = {
+            g.game_id for g in state.check_for_season_period_change(shard.games)
+        }
+        for p in plays_by_day.get(day, []):
+            if p.game_id not in relevant_game_ids or not p.player_name:
+                continue
+            matching_letters = state.find_matching_letters(p)
+            if matching_letters:
+                state.scores_since_last_match = 0
+            elif state.scores_since_last_match is not None:
+                state.scores_since_last_match += 1
+            rows.append(
+                {
+                    "date": day,
+                    "game_id": p.game_id,
+                    "play_id": p.play_id,
+                    "sport": p.sport,
+                    "end_time": p.end_time,
+                    "player_name": p.player_name,
+                    "player_id": p.player_id,
+                    "team_id": p.player_team_id,
+                    "season_period": state.season,
+                    "next_letter": state.current_letter,
+                    "times_cycled": state.times_cycled,
+                    "score": p.score,
+                    "is_match": bool(matching_letters),
+                }
+            )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("sport", choices=["MLB", "NHL", "NBA", "NFL"])
+    parser.add_argument("start", type=datetime.date.fromisoformat)
+    parser.add_argument("end", type=datetime.date.fromisoformat)
+    parser.add_argument("--archive-dir", default="archive")
+    parser.add_argument(
+        "--payload-archive",
+        help="Replay a PAYLOAD_ARCHIVE_DIR instead of --archive-dir",
+    )
+    parser.add_argument(
+        "--backfill", action="store_true", help="Download missing feeds first"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", help="Write the replayed plays as JSON lines")
+    args = parser.parse_args()
+
+    if args.backfill:
+        backfill(args.sport, args.start, args.end, args.archive_dir)
+
+    source: FeedDirectory | ArchiveFeedSource = (
+        ArchiveFeedSource(args.payload_archive)
+        if args.payload_archive
+        else FeedDirectory(args.archive_dir)
+    )
+    started = time.perf_counter()
+    rows = replay(args.sport, args.start, args.end, source, args.workers)
+    elapsed = time.perf_counter() - started
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+    matches = sum(1 for r in rows if r["is_match"])
+    print(f"Replayed {len(rows)} plays with {matches} matches in {elapsed:.1f}s")
+    if rows:
+        print(
+            f"Ended on {rows[-1]['next_letter']} after cycling {rows[-1]['times_cycled']} times"
+        )
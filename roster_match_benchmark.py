@@ -0,0 +1,94 @@
+"""
+Compare finding the NFL scorer with the roster trie to probing the roster with the first words.
+
+Rosters and play texts come from load_generator.py. Every play's text is matched, not only
+touchdowns, to have enough of them to time. Building the index is timed on its own, since
+it happens once per roster load.
+
+    python roster_match_benchmark.py --games 16 --plays 400
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from clients.roster_index import RosterIndex
+from load_generator import SlateSpec, generate_slate
+
+RUNS = 5
+
+
+def probe_match(roster: dict[str, int], play_text: str) -> tuple[int, str] | None:
+    """How NFLClient found the scorer before the index."""
+    first_two_words = " ".join(play_text.split(" ")[:2])
+    first_three_words = " ".join(play_text.split(" ")[:3])
+    try:
+        return (
+            roster.get(first_two_words)
+            or roster.get(first_two_words + " Jr.")
+            or roster[first_two_words + " Sr."]
+        ), first_two_words
+    except KeyError:
+        try:
+            return (
+                roster.get(first_three_words)
+                or roster.get(first_three_words + " Jr.")
+                or roster[first_three_words + " Sr."]
+            ), first_three_words
+        except KeyError:
+            return None
+
+
+def benchmark(games: int, plays_per_game: int) -> dict[str, float]:
+    slate = generate_slate(SlateSpec("NFL", games, plays_per_game))
+    texts = [
+        (int(p["team"]["id"]), p["text"])
+        for feed in slate.feeds.values()
+        for drive in feed["drives"]["previous"]
+        for p in drive["plays"]
+    ]
+
+    build, probe, trie = [], [], []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        indexes = {t: RosterIndex(roster) for t, roster in slate.rosters.items()}
+        build.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        probed = [probe_match(slate.rosters[t], text) for t, text in texts]
+        probe.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        matched = [indexes[t].match(text) for t, text in texts]
+        trie.append(time.perf_counter() - started)
+
+    return {
+        "texts": len(texts),
+        "rosters": len(slate.rosters),
+        "build_ms": statistics.median(build) * 1000,
+        "probe_us": statistics.median(probe) / len(texts) * 1e6,
+        "trie_us": statistics.median(trie) / len(texts) * 1e6,
+        "probe_misses": sum(m is None for m in probed),
+        "trie_misses": sum(m is None for m in matched),
+        # Probing stops at the first two words that are a name, even if three are
+        "different": sum(
+            p is not None and m is not None and p[0] != m.player_id
+            for p, m in zip(probed, matched)
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--games", type=int, default=16)
+    parser.add_argument("--plays", type=int, default=400, help="Plays per game")
+    args = parser.parse_args()
+
+    r = benchmark(args.games, args.plays)
+    print(
+        f"{r['texts']:.0f} texts, {r['rosters']:.0f} rosters indexed in {r['build_ms']:.1f}ms"
+    )
+    print(f"probe: {r['probe_us']:.2f}us per text, {r['probe_misses']:.0f} not found")
+    print(f"trie:  {r['trie_us']:.2f}us per text, {r['trie_misses']:.0f} not found")
+    print(f"{r['different']:.0f} texts matched a different player")
@@ -0,0 +1,118 @@
+"""
+Time drawing scorecards with ScorecardRenderer, and optionally the get_custom_scorecard call it replaces.
+
+Headshots are made up at each sport's download size, so nothing is fetched unless --remote
+is given. The first render of a sport also draws its template, the first render of a player
+also decodes and sizes their headshot, and every later one only draws the match.
+
+    python scorecard_render_benchmark.py NHL --players 20 --renders 200
+    python scorecard_render_benchmark.py NHL --remote 3
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from PIL import Image  # type: ignore
+
+from clients.scorecard_renderer import ScorecardRenderer
+from clients.sports_clients import get_sports_client
+from my_types import ImageInput, Sport
+
+# The size each sport's get_player_picture downloads
+HEADSHOT_SIZES = {
+    "MLB": (667, 1000),
+    "NHL": (336, 336),
+    "NBA": (1040, 760),
+    "NFL": (1378, 1000),
+}
+
+
+def image_input(sport: Sport, player_id: int) -> ImageInput:
+    return ImageInput(
+        completed_at=0,
+        matching_letters=["A", "B", "C"][: player_id % 3 + 1],
+        next_letter="KLM"[player_id % 3],
+        player_id=player_id,
+        player_name=f"Player Number{player_id} Longname",
+        season_phrase="in the 2022-23 season",
+        sport=sport,
+        times_cycled=22,
+        tweet_id="1",
+    )
+
+
+def headshot(sport: Sport, player_id: int) -> bytes:
+    b = io.BytesIO()
+    color = (player_id * 37 % 256, player_id * 91 % 256, 128, 255)
+    Image.new("RGBA", HEADSHOT_SIZES[sport], color).save(b, format="PNG")
+    return b.getvalue()
+
+
+def benchmark(sport: Sport, players: int, renders: int) -> dict[str, float]:
+    """Milliseconds for the first render, a new player's first render, and the median render."""
+    sports_client = get_sports_client(sport, dry_run=True)
+    sports_client.get_player_picture = lambda player_id: headshot(  # type: ignore
+        sport, player_id
+    )
+    renderer = ScorecardRenderer(sport, sports_client)
+
+    started = time.perf_counter()
+    renderer.render(image_input(sport, 0))
+    first = time.perf_counter() - started
+
+    new_player = []
+    for player_id in range(1, players):
+        started = time.perf_counter()
+        renderer.render(image_input(sport, player_id))
+        new_player.append(time.perf_counter() - started)
+
+    warm = []
+    for i in range(renders):
+        started = time.perf_counter()
+        renderer.render(image_input(sport, i % players))
+        warm.append(time.perf_counter() - started)
+
+    return {
+        "first_ms": first * 1000,
+        "new_player_ms": statistics.median(new_player) * 1000 if new_player else 0.0,
+        "render_ms": statistics.median(warm) * 1000,
+        "render_p95_ms": statistics.quantiles(warm, n=20)[-1] * 1000,
+    }
+
+
+def remote_benchmark(sport: Sport, calls: int) -> float:
+    """Median milliseconds for get_custom_scorecard to draw one."""
+    from clients.image_client import ImageClient
+
+    times = []
+    for player_id in range(calls):
+        started = time.perf_counter()
+        ImageClient()._get_remote_image(image_input(sport, player_id))
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("sport", choices=["MLB", "NHL", "NBA", "NFL"])
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--renders", type=int, default=200)
+    parser.add_argument(
+        "--remote", type=int, default=0, help="Also time this many remote renders"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Made up headshots stay out of the real download cache
+        os.environ["LOCAL_STATE_DIR"] = directory
+        r = benchmark(args.sport, args.players, args.renders)
+    print(f"first render, with the template: {r['first_ms']:.1f}ms")
+    print(f"first render of a player: {r['new_player_ms']:.1f}ms")
+    print(f"render: {r['render_ms']:.1f}ms, p95 {r['render_p95_ms']:.1f}ms")
+    if args.remote:
+        print(f"remote render: {remote_benchmark(args.sport, args.remote):.0f}ms")
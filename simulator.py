@@ -0,0 +1,208 @@
+"""
+Play the alphabet game over a season of plays under many rule variants at once.
+
+Takes the plays in order, either replay.py output (JSON lines) or a CSV export of tweetable_plays:
+
+    SELECT player_name, season_period FROM tweetable_plays WHERE sport = 'NBA' ORDER BY completed_at
+
+    python simulator.py nba_plays.csv --all-start-letters
+
+Every distinct name is encoded once as a 26-bit letter mask. For each alphabet order we then
+precompute how far each name moves the game from each letter, so a play is a single array
+lookup for every (variant, start letter) pair together. Needs numpy, which only this analysis
+script uses: pip install numpy
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import string
+from dataclasses import dataclass
+
+import numpy as np  # type: ignore
+from unidecode import unidecode
+
+from my_types import clean_player_name
+
+LETTERS = 26
+
+
+@dataclass(frozen=True)
+class Variant:
+    name: str
+    alphabet: str = string.ascii_uppercase  # The order the letters are looked for in
+    keep_suffixes: bool = False  # Jr., III and so on count as letters too
+    last_name_only: bool = False
+
+    def clean_name(self, player_name: str) -> str:
+        # The live game's own cleaning, unless a rule here changes it
+        if self.keep_suffixes:
+            cleaned = unidecode(player_name).upper()
+        else:
+            cleaned = clean_player_name(player_name)
+        if self.last_name_only:
+            cleaned = cleaned.split(" ", 1)[-1]
+        return cleaned
+
+
+VARIANTS = {
+    v.name: v
+    for v in [
+        Variant("live"),
+        Variant("keep_suffixes", keep_suffixes=True),
+        Variant("last_name_only", last_name_only=True),
+        Variant("reverse", alphabet=string.ascii_uppercase[::-1]),
+    ]
+}
+
+
+@dataclass
+class SimulationResult:
+    variant: str
+    start_letter: str
+    final_letter: str
+    times_cycled: int
+    matches: int  # Plays that matched at least one letter
+    letters: int  # Letters matched in total
+    longest_drought: int  # Most plays in a row without a match
+
+
+def name_masks(names: list[str]) -> np.ndarray:
+    """Bit i is set if the name has the letter chr(ord('A') + i)."""
+    masks = np.zeros(len(names), dtype=np.uint32)
+    for i, name in enumerate(names):
+        mask = 0
+        for c in name:
+            if "A" <= c <= "Z":
+                mask |= 1 << (ord(c) - ord("A"))
+        masks[i] = mask
+    return masks
+
+
+def advance_table(masks: np.ndarray, alphabet: str) -> np.ndarray:
+    """
+    How many letters in a row each name matches, from each position in the alphabet.
+
+    Shape is (names, 26). Capped at 26, where State.find_matching_letters would loop forever.
+    """
+    bits = np.array([1 << (ord(c) - ord("A")) for c in alphabet], dtype=np.uint32)
+    # has_letter[u, k] is whether name u has the k-th letter of this alphabet
+    has_letter = (masks[:, None] & bits[None, :]) != 0
+    positions = np.arange(LETTERS)
+    run = np.zeros((len(masks), LETTERS), dtype=np.int64)
+    still_matching = np.ones((len(masks), LETTERS), dtype=bool)
+    for k in range(LETTERS):
+        still_matching &= has_letter[:, (positions + k) % LETTERS]
+        run += still_matching
+    return run
+
+
+def simulate(
+    player_names: list[str],
+    variants: list[Variant],
+    start_letters: str = "A",
+    season_periods: list[str] | None = None,
+) -> list[SimulationResult]:
+    """Run every variant from every start letter over the plays, in order."""
+    # Variants that clean names the same way share the name encoding
+    rules = sorted({(v.keep_suffixes, v.last_name_only) for v in variants})
+    play_name_index: dict[tuple, np.ndarray] = {}
+    rule_masks: dict[tuple, np.ndarray] = {}
+    for rule in rules:
+        cleaner = Variant("", keep_suffixes=rule[0], last_name_only=rule[1])
+        cleaned = [cleaner.clean_name(n) for n in player_names]
+        unique_names, index = np.unique(np.array(cleaned), return_inverse=True)
+        play_name_index[rule] = index.reshape(-1)
+        rule_masks[rule] = name_masks(list(unique_names))
+
+    # One row per (variant, start letter), with the table lookups stacked so a play is one gather
+    tables = [
+        advance_table(rule_masks[(v.keep_suffixes, v.last_name_only)], v.alphabet)
+        for v in variants
+    ]
+    rows = [(vi, s) for vi in range(len(variants)) for s in start_letters]
+    variant_of_row = np.array([vi for vi, _ in rows])
+    start_positions = np.array(
+        [variants[vi].alphabet.index(s) for vi, s in rows], dtype=np.int64
+    )
+    plays_by_variant = np.stack(
+        [play_name_index[(v.keep_suffixes, v.last_name_only)] for v in variants]
+    )
+    offsets = np.cumsum([0] + [len(t) for t in tables[:-1]])
+    stacked_tables = np.concatenate(tables)
+
+    positions = start_positions.copy()
+    times_cycled = np.zeros(len(rows), dtype=np.int64)
+    matches = np.zeros(len(rows), dtype=np.int64)
+    letters = np.zeros(len(rows), dtype=np.int64)
+    drought = np.zeros(len(rows), dtype=np.int64)
+    longest_drought = np.zeros(len(rows), dtype=np.int64)
+
+    previous_period = None
+    for i in range(len(player_names)):
+        # A new season period resets the game, like State.check_for_season_period_change
+        if season_periods and season_periods[i] != previous_period:
+            if previous_period is not None:
+                positions[:] = start_positions
+                times_cycled[:] = 0
+                drought[:] = 0
+            previous_period = season_periods[i]
+
+        name_rows = offsets[variant_of_row] + plays_by_variant[variant_of_row, i]
+        run = stacked_tables[name_rows, positions]
+        matched = run > 0
+        letters += run
+        matches += matched
+        times_cycled += (positions + run) // LETTERS
+        positions = (positions + run) % LETTERS
+        drought = np.where(matched, 0, drought + 1)
+        np.maximum(longest_drought, drought, out=longest_drought)
+
+    return [
+        SimulationResult(
+            variant=variants[vi].name,
+            start_letter=s,
+            final_letter=variants[vi].alphabet[positions[r]],
+            times_cycled=int(times_cycled[r]),
+            matches=int(matches[r]),
+            letters=int(letters[r]),
+            longest_drought=int(longest_drought[r]),
+        )
+        for r, (vi, s) in enumerate(rows)
+    ]
+
+
+def load_plays(path: str) -> tuple[list[str], list[str]]:
+    """Player names and season periods from replay.py output or a tweetable_plays CSV export."""
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [r["player_name"] for r in rows], [r.get("season_period", "") for r in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("plays")
+    parser.add_argument(
+        "--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS)
+    )
+    parser.add_argument("--all-start-letters", action="store_true")
+    args = parser.parse_args()
+
+    player_names, season_periods = load_plays(args.plays)
+    results = simulate(
+        player_names,
+        [VARIANTS[v] for v in args.variants],
+        string.ascii_uppercase if args.all_start_letters else "A",
+        season_periods,
+    )
+    print(f"{len(player_names)} plays")
+    for r in results:
+        print(
+            f"{r.variant:>15} from {r.start_letter}: cycled {r.times_cycled}, on {r.final_letter}, "
+            f"{r.matches} matches for {r.letters} letters, longest drought {r.longest_drought}"
+        )
@@ -0,0 +1,105 @@
+"""
+Compare the database time of one run on each storage backend.
+
+    python storage_benchmark.py
+
+A run here is what main() does with 15 active games and 5 new plays. SQLite and the mirror
+use a temporary file. MySQL is only measured when MYSQL_HOST is set, and always as a dry
+run so nothing is written: its write timings only cover building the queries.
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+from clients.sports_clients import get_sports_client
+from clients.storage_client import StorageClient
+from my_types import Game, SeasonPeriod, TweetablePlay
+
+RUNS = 20
+
+
+def _games(count: int) -> list[Game]:
+    return [
+        Game(
+            game_id=str(700000 + i),
+            is_complete=False,
+            home_team_id=108,
+            away_team_id=109,
+            season_period=SeasonPeriod.REGULAR_SEASON,
+        )
+        for i in range(count)
+    ]
+
+
+def _play(game: Game, play_id: str) -> TweetablePlay:
+    return TweetablePlay(
+        play_id=play_id,
+        game_id=game.game_id,
+        end_time="",
+        image_name="Solo Home Run",
+        tweet_phrase="hit a solo homer",
+        player_name="Gregory Finley",
+        player_id=1,
+        player_team_id=108,
+        tiebreaker=0,
+        score="",
+        sport="MLB",
+        season_period=SeasonPeriod.REGULAR_SEASON,
+        season_phrase="in the 2023 season",
+    )
+
+
+def time_run(storage_client: StorageClient, run: int) -> float:
+    games = _games(15)
+    # The clients print every state update, keep that out of the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _time_run(storage_client, games, run)
+
+
+def _time_run(storage_client: StorageClient, games: list[Game], run: int) -> float:
+    started = time.perf_counter()
+    active_games = storage_client.get_active_games(games)
+    state = storage_client.get_initial_state()
+    storage_client.get_known_plays(active_games)
+    for i in range(5):
+        state.tweet_id += 1
+        storage_client.update_state(state)
+        storage_client.add_tweetable_play(
+            _play(active_games[i], f"{run}-{i}"), state, is_match=False
+        )
+    storage_client.set_completed_games(active_games)
+    return time.perf_counter() - started
+
+
+def benchmark(backend: str, dry_run: bool) -> list[float]:
+    os.environ["STORAGE_BACKEND"] = backend
+    from clients.storage_client import get_storage_client
+
+    storage_client = get_storage_client(dry_run, get_sports_client("MLB", dry_run))
+    try:
+        return [time_run(storage_client, run) for run in range(RUNS)]
+    finally:
+        storage_client.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+    backends = [("sqlite", False)]
+    if os.environ.get("MYSQL_HOST"):
+        backends += [("mysql", True), ("mirror", True)]
+    else:
+        print("MYSQL_HOST is not set, only measuring SQLite")
+
+    for backend, dry_run in backends:
+        timings = benchmark(backend, dry_run)
+        print(
+            f"{backend}: median {statistics.median(timings) * 1000:.2f}ms per run, max {max(timings) * 1000:.2f}ms"
+        )
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from clients.async_twitter_client import (  # noqa: E402
+    CHUNK_BYTES,
+    AsyncTwitterClient,
+    TwitterApiError,
+)
+from mock_twitter import CREDENTIALS, MockTwitter, serve  # noqa: E402
+from my_types import TwitterCredentials  # noqa: E402
+
+
+async def with_client(mock, run, credentials=CREDENTIALS):
+    async with serve(mock) as url, aiohttp.ClientSession() as session:
+        client = AsyncTwitterClient(
+            credentials, session, api_url=url, upload_url=url, retries=2
+        )
+        return await run(client)
+
+
+def test_posts_and_replies_on_one_connection():
+    mock = MockTwitter()
+
+    async def run(client):
+        media_id = await client.media_upload(b"scorecard", "scorecard.jpg")
+        tweet_id = await client.update_status("A, B!", media_ids=[media_id])
+        reply_id = await client.update_status("No C", in_reply_to=tweet_id)
+        return media_id, tweet_id, reply_id
+
+    media_id, tweet_id, reply_id = asyncio.run(with_client(mock, run))
+    assert mock.media[media_id] == b"scorecard"
+    assert mock.statuses == {
+        tweet_id: ("A, B!", [media_id], None),
+        reply_id: ("No C", [], tweet_id),
+    }
+    assert len(mock.connections) == 1
+
+
+def test_chunked_upload():
+    mock = MockTwitter()
+    image = bytes(range(256)) * (CHUNK_BYTES * 2 // 256 + 10)
+
+    async def run(client):
+        return await client.media_upload(image, "scorecard.jpg", chunked=True)
+
+    media_id = asyncio.run(with_client(mock, run))
+    assert mock.media[media_id] == image
+
+
+def test_bad_signature():
+    wrong = TwitterCredentials("consumer", "wrong", "token", "token-secret")
+
+    async def run(client):
+        await client.update_status("A!")
+
+    with pytest.raises(TwitterApiError) as e:
+        asyncio.run(with_client(MockTwitter(), run, credentials=wrong))
+    assert e.value.status == 401
+
+
+def test_uploads_are_retried_statuses_only_when_asked_to_wait(monkeypatch):
+    monkeypatch.setattr("clients.async_twitter_client.BACKOFF_SECONDS", 0.001)
+
+    mock = MockTwitter(fail_with=[503, 502])
+
+    async def run(client):
+        media_id = await client.media_upload(b"scorecard", "scorecard.jpg")
+        # A 429 means it wasn't posted
+        mock.fail_with.append(429)
+        tweet_id = await client.update_status("A!", media_ids=[media_id])
+        return client, tweet_id
+
+    client, tweet_id = asyncio.run(with_client(mock, run))
+    assert tweet_id in mock.statuses
+    assert client.stats["/1.1/media/upload.json"].retries == 2
+    assert client.stats["/1.1/statuses/update.json"].retries == 1
+
+    # A 503 might have posted it
+    mock = MockTwitter(fail_with=[503])
+
+    async def post(client):
+        await client.update_status("A!")
+
+    with pytest.raises(TwitterApiError):
+        asyncio.run(with_client(mock, post))
+    assert mock.requests == 1
+
+
+def test_twitter_client_posts_through_it(monkeypatch):
+    from clients.sports_clients import get_sports_client
+    from clients.twitter_client import TwitterClient
+    from my_types import ImageInput
+
+    for name, value in (
+        ("CONSUMER_KEY", CREDENTIALS.consumer_key),
+        ("CONSUMER_SECRET", CREDENTIALS.consumer_secret),
+        ("ACCESS_TOKEN", CREDENTIALS.access_token),
+        ("ACCESS_SECRET", CREDENTIALS.access_token_secret),
+    ):
+        monkeypatch.setenv(f"NHL_TWITTER_{name}", value)
+    monkeypatch.setenv("TWITTER_CLIENT", "async")
+    monkeypatch.delenv("MEDIA_BYTE_BUDGET", raising=False)
+    mock = MockTwitter()
+
+    async def run():
+        async with serve(mock) as url:
+            monkeypatch.setenv("TWITTER_API_URL", url)
+            monkeypatch.setenv("TWITTER_UPLOAD_URL", url)
+            nhl = get_sports_client("NHL", dry_run=False)
+            twitter_client = TwitterClient(nhl, dry_run=False)
+            monkeypatch.setattr(
+                twitter_client, "_scorecard", lambda image_input: _bytes_io()
+            )
+            try:
+                image_input = ImageInput(0, ["A"], "B", 1, "", "", "NHL", 0, "1")
+                tweet_id = await twitter_client.post("A!", image_input=image_input)
+                return tweet_id, await twitter_client.post("No B", in_reply_to=tweet_id)
+            finally:
+                await nhl.close()
+
+    tweet_id, reply_id = asyncio.run(run())
+    assert mock.statuses[reply_id] == ("No B", [], tweet_id)
+    (media_id,) = mock.statuses[tweet_id][1]
+    assert mock.media[media_id] == b"scorecard"
+
+
+def _bytes_io():
+    import io
+
+    return io.BytesIO(b"scorecard")
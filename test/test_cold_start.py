@@ -0,0 +1,21 @@
+from cold_start_benchmark import measure_idle_run
+
+# Generous for a cold CI runner. Importing every client up front took well over this.
+IDLE_RUN_BUDGET_SECONDS = 1.0
+
+
+def test_idle_run_skips_heavy_imports():
+    sample = measure_idle_run()
+    assert sample["heavy_modules"] == []
+
+
+def test_idle_run_within_budget():
+    sample = measure_idle_run()
+    assert sample["idle_run_seconds"] < IDLE_RUN_BUDGET_SECONDS
+
+
+def test_idle_run_with_fresh_calendars_makes_no_requests(tmp_path):
+    measure_idle_run(str(tmp_path))
+    sample = measure_idle_run(str(tmp_path))
+    assert sample["requests"] == 0
+    assert sample["heavy_modules"] == []
@@ -0,0 +1,44 @@
+import pytest
+
+from clients.completed_games_index import RECONCILE_SECONDS, CompletedGamesIndex
+from my_types import Game, SeasonPeriod
+
+
+@pytest.fixture(autouse=True)
+def local_state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCAL_STATE_DIR", str(tmp_path))
+
+
+def game(game_id: str) -> Game:
+    return Game(
+        game_id=game_id,
+        is_complete=True,
+        home_team_id=1,
+        away_team_id=2,
+        season_period=SeasonPeriod.REGULAR_SEASON,
+    )
+
+
+def test_new_index_needs_reconcile():
+    assert CompletedGamesIndex("NBA").needs_reconcile()
+
+
+def test_write_through_survives_a_restart():
+    index = CompletedGamesIndex("NBA")
+    index.reconcile({"1"})
+    index.add([game("2")])
+
+    index = CompletedGamesIndex("NBA")
+    assert not index.needs_reconcile()
+    assert [
+        g.game_id for g in index.active_games([game("1"), game("2"), game("3")])
+    ] == ["3"]
+
+
+def test_reconcile_replaces_the_index():
+    index = CompletedGamesIndex("NBA")
+    index.reconcile({"1"})
+    index.add([game("2")])
+    index.reconcile({"3"})
+    assert index.game_ids == {"3"}
+    assert index.needs_reconcile(now=index.reconciled_at + RECONCILE_SECONDS + 1)  # type: ignore
@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+import pytest
+
+from clients import deadline
+from clients.http_transport import HttpTransport
+
+
+def test_no_deadline_by_default():
+    assert deadline.remaining() is None
+    deadline.check(1000)
+    assert deadline.clamp(30) == 30
+
+
+def test_nested_deadline_only_gets_earlier():
+    with deadline.deadline(10):
+        with deadline.deadline(100):
+            assert deadline.remaining() <= 10
+        with deadline.deadline(1):
+            assert deadline.clamp(30) <= 1
+    assert deadline.remaining() is None
+
+
+def test_check_raises_without_enough_time():
+    with deadline.deadline(1):
+        deadline.check(0.5)
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.check(5, "a tweet")
+
+
+def test_tasks_share_the_deadline():
+    async def left():
+        return deadline.remaining()
+
+    with deadline.deadline(10):
+        assert 0 < asyncio.run(left()) <= 10
+
+
+def test_no_request_after_the_deadline():
+    transport = HttpTransport()
+    with deadline.deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(deadline.DeadlineExceeded):
+            transport.get("http://127.0.0.1:1/schedule")
+    assert transport.stats["127.0.0.1:1"].requests == 0
@@ -0,0 +1,149 @@
+import json
+
+import pytest
+
+from clients.deferred_plays import (
+    FEED_NOT_JSON,
+    MAX_ATTEMPTS,
+    NBA_PLAYER_LOOKUP,
+    NFL_SCORER_NOT_ON_ROSTER,
+    NHL_UNSETTLED,
+    RETRY_SECONDS,
+    Deferral,
+    DeferredPlays,
+)
+from clients.fetch_scheduler import FetchResult
+from clients.sports_clients import get_sports_client
+from my_types import Game, SeasonPeriod, TweetablePlay
+
+NOW = 1_700_000_000.0
+GAMES = [Game("1", False, 1, 2, SeasonPeriod.REGULAR_SEASON)]
+
+
+@pytest.fixture(autouse=True)
+def local_state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCAL_STATE_DIR", str(tmp_path))
+
+
+def dunk(play_id: str) -> TweetablePlay:
+    return TweetablePlay(
+        play_id=play_id,
+        game_id="1",
+        end_time="",
+        image_name="Slam Dunk",
+        tweet_phrase="dunked",
+        player_name="LeBron James",
+        player_id=2544,
+        player_team_id=1,
+        tiebreaker=0,
+        score="",
+        sport="NBA",
+        season_period=SeasonPeriod.REGULAR_SEASON,
+        season_phrase="in the 2022-23 season",
+    )
+
+
+def test_deferred_play_is_resolved_with_its_time_to_tweetable():
+    deferred = DeferredPlays("NBA")
+    deferred.update(GAMES, [], [Deferral("1", "7", NBA_PLAYER_LOOKUP)], now=NOW)
+    assert deferred.game_ids() == {"1"}
+    assert deferred.due_within(1, now=NOW) is None
+    assert deferred.due_within(30, now=NOW) == RETRY_SECONDS[NBA_PLAYER_LOOKUP]
+
+    # Still failing, then found
+    deferred.update(GAMES, [], [Deferral("1", "7", NBA_PLAYER_LOOKUP)], now=NOW + 5)
+    assert deferred.plays["1:7"].attempts == 2
+    deferred.update(GAMES, [dunk("7")], [], now=NOW + 12)
+    assert deferred.plays == {}
+    stats = deferred.stats[NBA_PLAYER_LOOKUP]
+    assert (stats.deferred, stats.resolved, stats.max_delay_seconds) == (1, 1, 12)
+
+    # Kept on disk
+    assert DeferredPlays("NBA").stats[NBA_PLAYER_LOOKUP].resolved == 1
+
+
+def test_deferred_play_gone_from_its_game_is_dropped():
+    deferred = DeferredPlays("NBA")
+    deferred.update(GAMES, [], [Deferral("1", "7", NBA_PLAYER_LOOKUP)], now=NOW)
+    # Another game was polled, this one wasn't
+    other = [Game("2", False, 1, 2, SeasonPeriod.REGULAR_SEASON)]
+    deferred.update(other, [], [], now=NOW + 1)
+    assert "1:7" in deferred.plays
+    deferred.update(GAMES, [], [], now=NOW + 5)
+    assert deferred.plays == {}
+    assert deferred.stats[NBA_PLAYER_LOOKUP].resolved == 0
+
+
+def test_play_deferred_on_every_poll_is_given_up_on():
+    deferred = DeferredPlays("NFL")
+    deferral = Deferral("1", "7", NFL_SCORER_NOT_ON_ROSTER)
+    # Two minute polls
+    for poll in range(MAX_ATTEMPTS[NFL_SCORER_NOT_ON_ROSTER]):
+        deferred.update(GAMES, [], [deferral], now=NOW + poll * 120)
+    assert deferred.plays["1:7"].attempts == MAX_ATTEMPTS[NFL_SCORER_NOT_ON_ROSTER]
+
+    deferred.update(GAMES, [], [deferral], now=NOW + 3600)
+    assert deferred.plays == {}
+    assert deferred.game_ids() == set()
+    assert deferred.due_within(30, now=NOW + 3600) is None
+    stats = deferred.stats[NFL_SCORER_NOT_ON_ROSTER]
+    assert (stats.deferred, stats.resolved, stats.unresolved) == (1, 0, 1)
+
+    # Not deferred again while the game goes on
+    deferred.update(GAMES, [], [deferral], now=NOW + 3720)
+    assert deferred.plays == {}
+    assert DeferredPlays("NFL").given_up == {"1:7": NOW + 3600}
+
+
+def test_dry_run_does_not_save():
+    DeferredPlays("NBA", dry_run=True).add([Deferral("1", "7", NBA_PLAYER_LOOKUP)])
+    assert DeferredPlays("NBA").plays == {}
+
+
+def test_feed_that_is_not_json_defers_the_game():
+    nhl = get_sports_client("NHL", dry_run=True)
+    feeds = {"1": FetchResult(502, "text/html", b"<html>Bad gateway</html>")}
+    assert nhl._parse_feeds(GAMES, feeds, {}) == []
+    deferrals = nhl.deferrals.take()
+    assert deferrals == [Deferral("1", "", FEED_NOT_JSON)]
+
+    nhl.deferred_plays.update(GAMES, [], deferrals)
+    assert nhl.deferred_plays.game_ids() == {"1"}
+    # The feed came back, with nothing new in it
+    nhl.deferred_plays.update(GAMES, [], [])
+    assert nhl.deferred_plays.stats[FEED_NOT_JSON].resolved == 1
+
+
+def test_unsettled_nhl_goal_is_deferred():
+    nhl = get_sports_client("NHL", dry_run=True)
+    feed = {
+        "allPlays": [
+            {
+                "about": {
+                    "eventId": 7,
+                    "goals": {"away": 1, "home": 0},
+                    "ordinalNum": "1st",
+                    "periodTimeRemaining": "10:00",
+                    # Just now, so only a second poll releases it
+                    "dateTime": "2100-01-01T00:00:00Z",
+                },
+                "result": {
+                    "event": "Goal",
+                    "description": "Jack Hughes (1) Wrist Shot",
+                },
+                "players": [
+                    {
+                        "playerType": "Scorer",
+                        "player": {"id": 8481559, "fullName": "Jack Hughes"},
+                    }
+                ],
+                "team": {"id": 1},
+            }
+        ]
+    }
+    feeds = {"1": FetchResult(200, "application/json", json.dumps(feed).encode())}
+    plays = nhl._parse_feeds(GAMES, feeds, {})
+    assert nhl.hold_plays(plays, GAMES) == []
+    assert nhl.deferrals.take() == [Deferral("1", "7", NHL_UNSETTLED)]
+    assert [p.play_id for p in nhl.hold_plays(plays, GAMES)] == ["7"]
+    assert nhl.deferrals.take() == []
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from clients.fetch_scheduler import (
+    INITIAL_LIMIT,
+    PRIORITY_FINISHED,
+    PRIORITY_LIVE,
+    FetchScheduler,
+    HostLimiter,
+)
+
+web = pytest.importorskip("aiohttp.web")
+
+
+def test_limit_grows_while_latency_holds():
+    host = HostLimiter()
+    for i in range(50):
+        host.on_success(0.1, 100, now=i)
+    assert host.limit > INITIAL_LIMIT + 4
+
+
+def test_limit_shrinks_on_slow_responses_and_errors():
+    host = HostLimiter()
+    host.on_success(0.1, 100, now=0)
+    host.on_success(0.5, 100, now=1)
+    assert host.limit < INITIAL_LIMIT
+    limit = host.limit
+    host.on_error(0.1, now=2)
+    assert host.limit == pytest.approx(limit / 2)
+
+
+async def serve(order):
+    async def feed(request):
+        order.append(request.match_info["game_id"])
+        await asyncio.sleep(0.01)
+        return web.json_response({"game_id": request.match_info["game_id"]})
+
+    app = web.Application()
+    app.router.add_get("/feed/{game_id}", feed)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_waiting_requests_go_out_by_priority():
+    async def run():
+        order = []
+        runner, base_url = await serve(order)
+        async with FetchScheduler() as scheduler:
+            first = asyncio.ensure_future(scheduler.fetch(base_url + "/feed/first"))
+            await asyncio.sleep(0)
+            (host,) = scheduler.hosts.values()
+            host.limit = 1
+            finished = scheduler.fetch(base_url + "/feed/finished", PRIORITY_FINISHED)
+            live = scheduler.fetch(base_url + "/feed/live", PRIORITY_LIVE)
+            results = await asyncio.gather(first, finished, live)
+        await runner.cleanup()
+        return order, results
+
+    order, results = asyncio.run(run())
+    assert order == ["first", "live", "finished"]
+    assert all(r.is_json and r.status == 200 for r in results)
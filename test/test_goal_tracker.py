@@ -0,0 +1,101 @@
+import dataclasses
+import datetime
+
+import pytest
+
+from clients.goal_tracker import FIXED_DELAY_SECONDS, GRACE_SECONDS, GoalTracker
+from my_types import Game, SeasonPeriod, TweetablePlay
+
+GOAL_TIME = datetime.datetime(2023, 1, 14, 1, 0, tzinfo=datetime.timezone.utc)
+GAMES = [Game("1", False, 1, 2, SeasonPeriod.REGULAR_SEASON)]
+
+
+@pytest.fixture(autouse=True)
+def local_state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCAL_STATE_DIR", str(tmp_path))
+
+
+def goal(player_name: str, player_id: int, play_id: str = "7") -> TweetablePlay:
+    return TweetablePlay(
+        play_id=play_id,
+        game_id="1",
+        end_time=GOAL_TIME.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        image_name="Goal",
+        tweet_phrase="scored a goal",
+        player_name=player_name,
+        player_id=player_id,
+        player_team_id=1,
+        tiebreaker=0,
+        score="",
+        sport="NHL",
+        season_period=SeasonPeriod.REGULAR_SEASON,
+        season_phrase="in the 2022-23 season",
+    )
+
+
+def at(seconds_after_goal: float) -> float:
+    return GOAL_TIME.timestamp() + seconds_after_goal
+
+
+def test_goal_is_released_on_the_second_poll_that_agrees():
+    tracker = GoalTracker()
+    assert tracker.release([goal("Jack Hughes", 1)], GAMES, now=at(30)) == []
+
+    # A new run on the same instance
+    tracker = GoalTracker()
+    assert tracker.release([goal("Jack Hughes", 1)], GAMES, now=at(60)) == [
+        goal("Jack Hughes", 1)
+    ]
+    assert tracker.stats.released_early == 1
+    assert tracker.stats.seconds_saved == FIXED_DELAY_SECONDS - 60
+
+
+def test_scorer_change_starts_over():
+    tracker = GoalTracker()
+    tracker.release([goal("Jack Hughes", 1)], GAMES, now=at(30))
+    assert tracker.release([goal("Nico Hischier", 2)], GAMES, now=at(60)) == []
+    assert tracker.stats.corrections == 1
+    assert tracker.release([goal("Nico Hischier", 2)], GAMES, now=at(90)) == [
+        goal("Nico Hischier", 2)
+    ]
+
+
+def test_description_change_starts_over():
+    first = dataclasses.replace(goal("Jack Hughes", 1), description="Jack Hughes (10)")
+    assisted = dataclasses.replace(
+        first, description="Jack Hughes (10) Wrist Shot, assists: Nico Hischier (20)"
+    )
+    tracker = GoalTracker()
+    tracker.release([first], GAMES, now=at(30))
+    assert tracker.release([assisted], GAMES, now=at(60)) == []
+    assert tracker.stats.corrections == 1
+    assert tracker.release([assisted], GAMES, now=at(90)) == [assisted]
+
+
+def test_late_correction_starts_the_grace_window_over():
+    tracker = GoalTracker()
+    tracker.release([goal("Jack Hughes", 1)], GAMES, now=at(30))
+    # Two minute polls, the next one after the goal's grace window
+    later = at(30 + GRACE_SECONDS + 20)
+    assert tracker.release([goal("Nico Hischier", 2)], GAMES, now=later) == []
+    assert tracker.release([goal("Nico Hischier", 2)], GAMES, now=later + 120) == [
+        goal("Nico Hischier", 2)
+    ]
+
+
+def test_old_goal_is_released_on_first_sight():
+    assert GoalTracker().release(
+        [goal("Jack Hughes", 1)], GAMES, now=at(GRACE_SECONDS)
+    ) == [goal("Jack Hughes", 1)]
+
+
+def test_overturned_goal_is_forgotten():
+    tracker = GoalTracker()
+    tracker.release([goal("Jack Hughes", 1)], GAMES, now=at(30))
+    tracker.release([], GAMES, now=at(60))
+    assert tracker.goals == {}
+
+
+def test_dry_run_does_not_save():
+    GoalTracker(dry_run=True).release([goal("Jack Hughes", 1)], GAMES, now=at(30))
+    assert GoalTracker().goals == {}
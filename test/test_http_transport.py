@@ -0,0 +1,66 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from clients.http_transport import HttpTransport
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Status codes to answer with, in order, then 200
+    statuses: list[int] = []
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def _respond(self):
+        status = FlakyHandler.statuses.pop(0) if FlakyHandler.statuses else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = HTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    FlakyHandler.statuses = []
+
+
+def test_get_retries_retryable_statuses(server_url):
+    FlakyHandler.statuses = [503, 502]
+    transport = HttpTransport(backoff_seconds=0)
+    assert transport.get(server_url + "/schedule").json() == {"ok": True}
+
+    (stats,) = transport.stats.values()
+    assert (stats.requests, stats.errors, stats.retries) == (3, 2, 2)
+    assert stats.bytes_received == 3 * len(b'{"ok": true}')
+    assert sum(stats.latency_buckets) == 3
+
+
+def test_post_is_not_retried_unless_idempotent(server_url):
+    FlakyHandler.statuses = [503, 503]
+    transport = HttpTransport(backoff_seconds=0)
+    assert transport.post(server_url).status_code == 503
+    assert transport.post(server_url, idempotent=True).status_code == 200
+
+
+def test_connection_is_reused(server_url):
+    transport = HttpTransport()
+    transport.get(server_url)
+    transport.get(server_url)
+    (session,) = transport._sessions.values()
+    (pool,) = session.get_adapter(server_url).poolmanager.pools._container.values()
+    assert pool.num_connections == 1
@@ -0,0 +1,67 @@
+import datetime
+
+import pytest
+
+from clients.sports_clients import get_sports_client
+from load_generator import (
+    SlateSpec,
+    generate_slate,
+    measure_memory,
+    prepare_client,
+    run_load,
+    save_slate,
+)
+from replay import FeedDirectory, replay
+
+DAY = datetime.date(2023, 1, 1)
+
+
+@pytest.mark.parametrize("sport", ["MLB", "NHL", "NBA", "NFL"])
+def test_every_scoring_play_is_tweetable(sport):
+    slate = generate_slate(SlateSpec(sport, games=3, plays_per_game=200), DAY)
+    sports_client = get_sports_client(sport, dry_run=True)
+    prepare_client(sports_client, slate)
+
+    games = sports_client.games_from_schedule(slate.schedule, DAY, DAY)
+    for g in games:
+        g.payload = slate.feeds[g.game_id]
+    plays = sports_client.parse_tweetable_plays(games, {})
+
+    assert len(games) == 3
+    assert slate.scoring_plays > 0
+    assert len(plays) == slate.scoring_plays
+    assert all(p.player_name for p in plays)
+
+
+def test_slates_are_reproducible():
+    spec = SlateSpec("NHL", games=2, plays_per_game=50, seed=7)
+    assert generate_slate(spec, DAY) == generate_slate(spec, DAY)
+
+
+@pytest.mark.parametrize("sport", ["NBA", "NFL"])
+def test_saved_slate_replays_without_the_network(tmp_path, sport):
+    slate = generate_slate(SlateSpec(sport, games=2, plays_per_game=200), DAY)
+    save_slate(slate, str(tmp_path))
+
+    rows = replay(sport, DAY, DAY, FeedDirectory(str(tmp_path)), 1)
+
+    assert len(rows) == slate.scoring_plays
+
+
+def test_run_load_tweets_only_the_new_plays():
+    slate = generate_slate(SlateSpec("MLB", games=4, plays_per_game=200), DAY)
+
+    result = run_load(slate, known_fraction=0.5)
+
+    assert result.games == 4
+    assert result.tweetable_plays == slate.scoring_plays
+    assert result.known_plays + result.new_plays == result.tweetable_plays
+    assert result.tweet_loop_seconds > 0
+
+
+def test_feeds_are_released_after_parsing():
+    slate = generate_slate(SlateSpec("NHL", games=3, plays_per_game=200), DAY)
+
+    peak, held = measure_memory(slate)
+
+    assert held < peak
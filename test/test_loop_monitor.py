@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+from clients.loop_monitor import LoopMonitor
+
+
+def blocking_lookup():
+    threading.Event().wait(0.3)  # A library call, unlike time.sleep which has no frame
+
+
+async def pipeline():
+    await asyncio.sleep(0.05)
+    blocking_lookup()
+    await asyncio.sleep(0.05)
+
+
+def test_stall_is_charged_to_the_blocking_call_site():
+    monitor = LoopMonitor(threshold_ms=100)
+    asyncio.run(monitor.watch(pipeline()))
+
+    ((site, stats),) = monitor.sites.items()
+    line = blocking_lookup.__code__.co_firstlineno + 1
+    our_frame, blocked_in = site.removesuffix(")").split(" (blocked in ")
+    assert our_frame == f"test/test_loop_monitor.py:{line} in blocking_lookup"
+    assert blocked_in.startswith("threading.py:") and blocked_in.endswith(" in wait")
+    assert stats.stalls == 1
+    assert 0.25 < stats.total_seconds < 0.5
+
+
+def test_quiet_loop_has_no_stalls():
+    monitor = LoopMonitor(threshold_ms=100)
+    asyncio.run(monitor.watch(asyncio.sleep(0.1)))
+    assert monitor.sites == {}
+    assert "never blocked" in monitor.report()
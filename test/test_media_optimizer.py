@@ -0,0 +1,113 @@
+import asyncio
+import io
+import random
+
+from PIL import Image  # type: ignore
+
+from clients.media_optimizer import (
+    CHUNKED_MIN_BYTES,
+    MediaOptimizer,
+    MediaUpload,
+    ProcessedMedia,
+    UploadLog,
+)
+
+
+def noisy_jpeg(size=(1378, 1000), **save_args) -> bytes:
+    # Noise doesn't compress, so it stands in for a detailed headshot
+    noise = random.Random(0).randbytes(size[0] * size[1] * 3)
+    image = Image.frombytes("RGB", size, noise)
+    b = io.BytesIO()
+    image.save(b, format="JPEG", quality=95, **save_args)
+    return b.getvalue()
+
+
+def test_small_enough_is_left_alone():
+    small = noisy_jpeg(size=(200, 100))
+    processed = MediaOptimizer(byte_budget=len(small)).process(small)
+    assert processed.data == small
+    assert (processed.filename, processed.chunked) == ("scorecard.jpg", False)
+
+
+def test_resized_recompressed_and_stripped():
+    exif = Image.Exif()
+    exif[0x010F] = "Camera"  # Make
+    original = noisy_jpeg(exif=exif.tobytes())
+    optimizer = MediaOptimizer(byte_budget=150_000)
+    processed = optimizer.process(original)
+
+    assert len(processed.data) <= 150_000
+    assert processed.original_bytes == len(original)
+    image = Image.open(io.BytesIO(processed.data))
+    assert max(image.size) <= 1600
+    assert "exif" not in image.info
+
+
+def test_processed_once_per_content():
+    original = noisy_jpeg(size=(1800, 900))
+    optimizer = MediaOptimizer(byte_budget=10_000_000, cache_size=1)
+    first = optimizer.process(original)
+    again = optimizer.process(original)
+    assert Image.open(io.BytesIO(first.data)).size == (1600, 800)
+    assert (first.cached, again.cached, again.data) == (False, True, first.data)
+
+    # Only the latest is kept
+    optimizer.process(noisy_jpeg(size=(200, 100)))
+    assert not optimizer.process(original).cached
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.delenv("MEDIA_BYTE_BUDGET", raising=False)
+    assert MediaOptimizer.from_env() is None
+    monkeypatch.setenv("MEDIA_BYTE_BUDGET", "300000")
+    optimizer = MediaOptimizer.from_env()
+    assert optimizer is not None and optimizer.byte_budget == 300_000
+
+
+def test_large_media_is_chunked():
+    assert ProcessedMedia(b"x" * CHUNKED_MIN_BYTES, "scorecard.jpg", 0).chunked
+
+
+def test_report():
+    log = UploadLog()
+    assert log.report() == ""
+    log.add(MediaUpload("A, B!", 2048 * 1024, 200 * 1024, False, False, 0.5))
+    log.add(MediaUpload("C!", 2048 * 1024, 200 * 1024, False, True, 0.25))
+    assert log.report() == (
+        "'A, B!': 200 KiB of 2048 KiB in 0.50s\n"
+        "'C!': 200 KiB of 2048 KiB in 0.25s (cached)\n"
+        "2 uploads: 400 KiB of 4096 KiB, 0.38s each"
+    )
+
+
+def test_twitter_client_uploads_processed_media(monkeypatch):
+    monkeypatch.delenv("TWITTER_CLIENT", raising=False)
+    from clients import media_optimizer
+    from clients.sports_clients import get_sports_client
+    from clients.twitter_client import TwitterClient
+
+    class FakeApi:
+        timeout = None
+
+        def __init__(self):
+            self.uploads = []
+
+        def media_upload(self, filename, file, chunked, media_category):
+            self.uploads.append((filename, len(file.read()), chunked, media_category))
+            return type("Media", (), {"media_id": 7})
+
+    monkeypatch.setattr(media_optimizer, "_media_optimizer", MediaOptimizer(150_000))
+    monkeypatch.setattr(media_optimizer, "_upload_log", UploadLog())
+    twitter_client = TwitterClient.__new__(TwitterClient)
+    twitter_client.sports_client = get_sports_client("NHL", dry_run=True)
+    twitter_client.api = FakeApi()
+    twitter_client._async_api = None
+
+    original = noisy_jpeg()
+    upload = twitter_client._upload(original, "Alex Ovechkin just scored")
+    assert asyncio.run(upload) == 7
+    ((filename, uploaded, chunked, media_category),) = twitter_client.api.uploads
+    assert (filename, chunked, media_category) == ("scorecard.jpg", False, None)
+    assert uploaded <= 150_000
+    (upload,) = media_optimizer.get_upload_log().uploads
+    assert (upload.original_bytes, upload.uploaded_bytes) == (len(original), uploaded)
@@ -0,0 +1,37 @@
+import pickle
+
+from my_types import Game, SeasonPeriod, TweetablePlay
+
+
+def play(player_name: str) -> TweetablePlay:
+    return TweetablePlay(
+        play_id="1",
+        game_id="1",
+        end_time="",
+        image_name="Goal",
+        tweet_phrase="scored a goal",
+        player_name=player_name,
+        player_id=1,
+        player_team_id=1,
+        tiebreaker=0,
+        score="",
+        sport="NHL",
+        season_period=SeasonPeriod.REGULAR_SEASON,
+        season_phrase="".join(["in the 2022-23", " season"]),
+    )
+
+
+def test_plays_and_games_have_slots_instead_of_a_dict():
+    p = play("Alex Ovechkin")
+    g = Game("1", False, 1, 2, SeasonPeriod.REGULAR_SEASON)
+
+    assert not hasattr(p, "__dict__") and not hasattr(g, "__dict__")
+    assert p.tweet_id is None and p.tweet_text == "" and g.payload is None
+    assert pickle.loads(pickle.dumps(p)) == p
+
+
+def test_repeated_strings_are_shared():
+    first, second = play("".join(["Alex ", "Ovechkin"])), play("Alex Ovechkin")
+
+    assert first.player_name is second.player_name
+    assert first.season_phrase is second.season_phrase
@@ -0,0 +1,65 @@
+import asyncio
+import datetime
+import json
+
+import pytest
+
+from clients.fetch_scheduler import FetchResult
+from clients.parse_pool import ParsePool
+from clients.sports_clients import get_sports_client
+from load_generator import SlateSpec, generate_slate, prepare_client
+
+DAY = datetime.date(2023, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ParsePool(workers=2, min_games=1)
+    yield pool
+    pool.close()
+
+
+def parse_both_ways(sport, pool, end_first_game=False):
+    slate = generate_slate(SlateSpec(sport, games=4, plays_per_game=200), DAY)
+    if end_first_game:
+        actions = next(iter(slate.feeds.values()))["game"]["actions"]
+        actions.append({"actionNumber": 999, "actionType": "game", "subType": "end"})
+    feeds = {
+        game_id: FetchResult(200, "application/json", json.dumps(feed).encode())
+        for game_id, feed in slate.feeds.items()
+    }
+    results = []
+    for use_pool in [False, True]:
+        sports_client = get_sports_client(sport, dry_run=True)
+        prepare_client(sports_client, slate)
+        games = sports_client.games_from_schedule(slate.schedule, DAY, DAY)
+        known_plays = {games[0].game_id: ["1", "2", "3"]}
+        if use_pool:
+            plays = asyncio.run(pool.parse(sports_client, games, feeds, known_plays))
+        else:
+            plays = sports_client._parse_feeds(games, feeds, known_plays)
+        results.append((plays, [g.is_complete for g in games]))
+    return results
+
+
+@pytest.mark.parametrize("sport", ["MLB", "NHL", "NFL"])
+def test_pool_finds_the_same_plays(sport, pool):
+    (inline, _), (pooled, _) = parse_both_ways(sport, pool)
+
+    def key(p):
+        # MLB picks a random home run phrase
+        return (p.game_id, p.play_id, p.player_name, p.player_id, p.score)
+
+    assert inline and [key(p) for p in inline] == [key(p) for p in pooled]
+
+
+def test_nba_names_and_game_ends_come_back_from_the_pool(pool):
+    (inline, inline_complete), (pooled, pooled_complete) = parse_both_ways(
+        "NBA", pool, end_first_game=True
+    )
+
+    assert [(p.play_id, p.player_name) for p in inline] == [
+        (p.play_id, p.player_name) for p in pooled
+    ]
+    assert all(p.player_name for p in pooled)
+    assert inline_complete == pooled_complete == [True, False, False, False]
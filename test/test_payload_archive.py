@@ -0,0 +1,56 @@
+from clients.payload_archive import ArchiveReader, PayloadArchive
+
+
+def test_records_read_back_across_segments(tmp_path):
+    archive = PayloadArchive(str(tmp_path), segment_bytes=64)
+    for i in range(10):
+        archive.append(
+            "NHL", "play_by_play", str(i % 3), f'{{"poll": {i}}}'.encode(), i
+        )
+    archive.append("NHL", "schedule", "", b'{"dates": []}', 10)
+    archive.flush()
+
+    reader = ArchiveReader(str(tmp_path))
+
+    assert len({e.segment for e in reader.entries("NHL")}) > 1
+    assert [
+        reader.read_json(e)["poll"] for e in reader.entries("NHL", "play_by_play", "1")
+    ] == [1, 4, 7]
+    assert reader.read_json(reader.latest("NHL", "play_by_play", "2")) == {"poll": 8}  # type: ignore
+    assert reader.read(reader.latest("NHL", "schedule")) == b'{"dates": []}'  # type: ignore
+    assert [e.fetched_at for e in reader.entries("NHL", start=3, end=5)] == [3, 4]
+
+
+def test_half_written_records_are_skipped(tmp_path):
+    archive = PayloadArchive(str(tmp_path))
+    archive.append("MLB", "play_by_play", "1", b"{}", 1)
+    archive.flush()
+    [segment] = [p for p in tmp_path.joinpath("MLB").iterdir() if p.suffix == ".idx"]
+    with open(segment, "a") as f:
+        f.write(
+            '{"kind": "play_by_play", "game_id": "1", "fetched_at": 2, "offset": 10, "length": 5}\n{"kind": "pl'
+        )
+
+    assert len(ArchiveReader(str(tmp_path)).entries("MLB")) == 1
+
+
+def test_oldest_segments_are_deleted_over_max_bytes(tmp_path):
+    archive = PayloadArchive(str(tmp_path), segment_bytes=64, max_bytes=1024)
+    for i in range(100):
+        sport = "NHL" if i % 2 else "NBA"
+        archive.append(sport, "play_by_play", "1", f'{{"poll": {i}}}'.encode(), i)
+    archive.flush()
+
+    files = [p for sport in ("NHL", "NBA") for p in tmp_path.joinpath(sport).iterdir()]
+    # Give or take the segments still being written, whose tiny records index big here
+    assert sum(p.stat().st_size for p in files) <= 2 * 1024
+    # Every segment kept has its index
+    assert sorted(p.stem for p in files if p.suffix == ".dat") == sorted(
+        p.stem for p in files if p.suffix == ".idx"
+    )
+    # Only the latest polls are left
+    polls = [
+        ArchiveReader(str(tmp_path)).read_json(e)["poll"]
+        for e in ArchiveReader(str(tmp_path)).entries("NHL")
+    ]
+    assert polls[0] > 1 and polls == list(range(polls[0], 100, 2))
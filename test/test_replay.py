@@ -0,0 +1,127 @@
+import datetime
+import json
+
+from clients.payload_archive import PayloadArchive
+from replay import ArchiveFeedSource, FeedDirectory, replay
+
+
+def schedule(*game_ids: int) -> dict:
+    return {
+        "dates": [
+            {
+                "games": [
+                    {
+                        "gamePk": game_id,
+                        "gameType": "R",
+                        "status": {
+                            "abstractGameState": "Final",
+                            "detailedState": "Final",
+                        },
+                        "teams": {
+                            "home": {"team": {"id": 108}},
+                            "away": {"team": {"id": 109}},
+                        },
+                    }
+                    for game_id in game_ids
+                ]
+            }
+        ]
+    }
+
+
+def home_run(index: int, batter: str, end_time: str) -> dict:
+    return {
+        "atBatIndex": index,
+        "about": {
+            "isComplete": True,
+            "isTopInning": True,
+            "inning": 1,
+            "endTime": end_time,
+        },
+        "result": {"eventType": "home_run", "rbi": 1, "awayScore": 1, "homeScore": 0},
+        "matchup": {"batter": {"fullName": batter, "id": index}},
+    }
+
+
+def make_archive(archive_dir: str) -> None:
+    feeds = FeedDirectory(archive_dir)
+    day_one = datetime.date(2022, 4, 7)
+    day_two = datetime.date(2022, 4, 8)
+    feeds.save_schedule("MLB", day_one, schedule(1, 2))
+    feeds.save_schedule("MLB", day_two, schedule(3))
+    # Game 2's homer is earlier than game 1's, so it has to go first
+    feeds.save_feed(
+        "MLB",
+        day_one,
+        "1",
+        {"allPlays": [home_run(0, "Bo Bichette", "2022-04-07T20:00:00Z")]},
+    )
+    feeds.save_feed(
+        "MLB",
+        day_one,
+        "2",
+        {"allPlays": [home_run(0, "Abe Alvarez", "2022-04-07T19:00:00Z")]},
+    )
+    feeds.save_feed(
+        "MLB",
+        day_two,
+        "3",
+        {"allPlays": [home_run(5, "Carl Crawford", "2022-04-08T19:00:00Z")]},
+    )
+
+
+def test_replay_applies_state_in_time_order(tmp_path):
+    make_archive(str(tmp_path))
+
+    rows = replay(
+        "MLB",
+        datetime.date(2022, 4, 7),
+        datetime.date(2022, 4, 8),
+        FeedDirectory(str(tmp_path)),
+        1,
+    )
+
+    assert [(r["game_id"], r["next_letter"], r["is_match"]) for r in rows] == [
+        ("2", "C", True),
+        ("1", "D", True),
+        ("3", "E", True),
+    ]
+
+
+def test_replay_is_the_same_with_a_process_pool(tmp_path):
+    make_archive(str(tmp_path))
+    args = (
+        "MLB",
+        datetime.date(2022, 4, 7),
+        datetime.date(2022, 4, 8),
+        FeedDirectory(str(tmp_path)),
+    )
+
+    assert replay(*args, 1) == replay(*args, 2)  # type: ignore
+
+
+def test_replay_from_payload_archive(tmp_path):
+    make_archive(str(tmp_path / "directory"))
+    feeds = FeedDirectory(str(tmp_path / "directory"))
+    archive = PayloadArchive(str(tmp_path / "archive"))
+    for day in [datetime.date(2022, 4, 7), datetime.date(2022, 4, 8)]:
+        noon = datetime.datetime.combine(day, datetime.time(12)).timestamp()
+        archive.append(
+            "MLB",
+            "schedule",
+            "",
+            json.dumps(feeds.load_schedule("MLB", day)).encode(),
+            noon,
+        )
+        for game_id in ["1", "2", "3"]:
+            feed = feeds.load_feed("MLB", day, game_id)
+            if feed:
+                archive.append(
+                    "MLB", "play_by_play", game_id, json.dumps(feed).encode(), noon
+                )
+    archive.flush()
+    args = ("MLB", datetime.date(2022, 4, 7), datetime.date(2022, 4, 8))
+
+    assert replay(*args, ArchiveFeedSource(str(tmp_path / "archive")), 2) == replay(  # type: ignore
+        *args, feeds, 1  # type: ignore
+    )
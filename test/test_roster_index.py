@@ -0,0 +1,135 @@
+import pytest
+
+from clients.deferred_plays import NFL_PASSER_ONLY, NFL_SCORER_NOT_ON_ROSTER, Deferral
+from clients.roster_index import RosterIndex, normalize
+from clients.sports_clients import get_sports_client
+from my_types import Game, SeasonPeriod
+
+ROSTER = {
+    name: player_id
+    for player_id, name in enumerate(
+        [
+            "Jalen Hurts",
+            "DeVonta Smith",
+            "A.J. Brown",
+            "Kenneth Walker III",
+            "Odell Beckham Jr.",
+            "Amon-Ra St. Brown",
+            "Equanimeous St. Brown",
+            "Ja'Marr Chase",
+            "D'Andre Swift",
+            "Michael Pittman Jr.",
+            "Marvin Harrison",
+            "Marvin Harrison Jr.",
+            "Gardner Minshew II",
+            "Kyle Van Noy",
+            "Tomás Ramírez",
+            "Ronnie Van Der Merwe",
+        ]
+    )
+}
+
+# Touchdown texts the way the feed writes them, and who scored
+CORPUS = [
+    ("Jalen Hurts 1 Yd Rush (Jake Elliott Kick)", "Jalen Hurts"),
+    (
+        "DeVonta Smith Pass From Jalen Hurts for 7 Yds, shotgun TWO-POINT CONVERSION ATTEMPT. "
+        "M.Sanders rushes up the middle. ATTEMPT FAILS.",
+        "DeVonta Smith",
+    ),
+    ("A.J. Brown 45 Yd pass from Jalen Hurts (Jake Elliott Kick)", "A.J. Brown"),
+    ("AJ Brown 45 Yd pass from Jalen Hurts (Jake Elliott Kick)", "A.J. Brown"),
+    ("Kenneth Walker III 12 Yd Run (Jason Myers Kick)", "Kenneth Walker III"),
+    ("Kenneth Walker 12 Yd Run (Jason Myers Kick)", "Kenneth Walker III"),
+    ("Odell Beckham Jr. 11 Yd pass from Matthew Stafford", "Odell Beckham Jr."),
+    ("Odell Beckham 11 Yd pass from Matthew Stafford", "Odell Beckham Jr."),
+    ("Amon-Ra St. Brown 5 Yd pass from Jared Goff", "Amon-Ra St. Brown"),
+    ("Equanimeous St. Brown 1 Yd pass from Justin Fields", "Equanimeous St. Brown"),
+    ("Ja'Marr Chase 32 Yd pass from Joe Burrow", "Ja'Marr Chase"),
+    ("Ja’Marr Chase 32 Yd pass from Joe Burrow", "Ja'Marr Chase"),
+    ("D'Andre Swift 2 Yd Run (Michael Badgley Kick)", "D'Andre Swift"),
+    ("Michael Pittman Jr. 4 Yd pass from Matt Ryan", "Michael Pittman Jr."),
+    ("Marvin Harrison 6 Yd pass from Kyler Murray", "Marvin Harrison"),
+    ("Marvin Harrison Jr. 6 Yd pass from Kyler Murray", "Marvin Harrison Jr."),
+    ("Gardner Minshew II 3 Yd Run (Matt Gay Kick)", "Gardner Minshew II"),
+    ("Kyle Van Noy 20 Yd Fumble Return (Nick Folk Kick)", "Kyle Van Noy"),
+    ("Tomas Ramirez 35 Yd Interception Return", "Tomás Ramírez"),
+    ("Ronnie Van Der Merwe 1 Yd Run", "Ronnie Van Der Merwe"),
+]
+
+
+@pytest.mark.parametrize("text,player_name", CORPUS)
+def test_scorer_is_found(text, player_name):
+    match = RosterIndex(ROSTER).match(text)
+    assert match is not None
+    assert (match.player_name, match.player_id) == (player_name, ROSTER[player_name])
+
+
+def test_rest_is_the_text_after_the_name():
+    match = RosterIndex(ROSTER).match("Jalen Hurts Pass for 7 Yds, DeVonta Smith")
+    assert match is not None and match.rest == "Pass for 7 Yds, DeVonta Smith"
+
+
+def test_no_match():
+    index = RosterIndex(ROSTER)
+    assert index.match("Patrick Mahomes 2 Yd Run") is None
+    # A name has to be whole
+    assert index.match("Kyle Van 20 Yd Fumble Return") is None
+    assert index.match("") is None
+
+
+def test_normalize():
+    assert normalize("Ja’Marr") == "jamarr"
+    assert normalize("A.J.") == "aj"
+    assert normalize("Ramírez") == "ramirez"
+    assert normalize("Amon-Ra") == "amon-ra"
+
+
+def scoring_play(play_id: str, text: str) -> dict:
+    return {
+        "id": play_id,
+        "scoringType": {"name": "touchdown"},
+        "team": {"id": "21"},
+        "text": text,
+        "period": {"number": 1},
+        "clock": {"displayValue": "10:00"},
+        "awayScore": 7,
+        "homeScore": 0,
+    }
+
+
+def test_nfl_client_matches_with_the_index():
+    nfl = get_sports_client("NFL", dry_run=True)
+    nfl.known_rosters = {21: dict(ROSTER)}
+    game = Game("1", False, 6, 21, SeasonPeriod.REGULAR_SEASON)
+    game.payload = {
+        "scoringPlays": [
+            scoring_play("1", "Kenneth Walker 12 Yd Run (Jake Elliott Kick)"),
+            scoring_play("2", "Jalen Hurts Pass for 7 Yds, DeVonta Smith"),
+            scoring_play("3", "Patrick Mahomes 2 Yd Run"),
+        ]
+    }
+    plays = nfl.parse_tweetable_plays([game], {})
+    assert [(p.play_id, p.player_name) for p in plays] == [("1", "Kenneth Walker III")]
+    assert nfl.deferrals.take() == [
+        Deferral("1", "2", NFL_PASSER_ONLY),
+        Deferral("1", "3", NFL_SCORER_NOT_ON_ROSTER),
+    ]
+    # Loaded again next time, in case the scorer was just signed
+    assert 21 not in nfl.known_rosters
+
+
+def test_scorer_found_once_the_roster_is_loaded_again(monkeypatch):
+    nfl = get_sports_client("NFL", dry_run=True)
+    rosters = [dict(ROSTER), {**ROSTER, "Patrick Mahomes": 3139477}]
+    monkeypatch.setattr(nfl, "get_roster", lambda team_id: rosters.pop(0))
+    game = Game("1", False, 6, 21, SeasonPeriod.REGULAR_SEASON)
+    game.payload = {"scoringPlays": [scoring_play("3", "Patrick Mahomes 2 Yd Run")]}
+
+    assert nfl.parse_tweetable_plays([game], {}) == []
+    # Keeps the game active, so it is fetched again
+    assert nfl.deferrals.take() == [Deferral("1", "3", NFL_SCORER_NOT_ON_ROSTER)]
+
+    plays = nfl.parse_tweetable_plays([game], {})
+    assert [(p.play_id, p.player_id) for p in plays] == [("3", 3139477)]
+    assert nfl.deferrals.take() == []
@@ -0,0 +1,52 @@
+import time
+
+from clients import run_profiler
+
+
+def parse_feed():
+    # Keep the CPU busy long enough for plenty of samples
+    end = time.perf_counter() + 0.2
+    while time.perf_counter() < end:
+        sum(range(1000))
+    return [str(i) * 10 for i in range(20_000)]
+
+
+def test_writes_stages_samples_and_collapsed_stacks(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_COLLAPSED", "true")
+
+    with run_profiler.profiled("NHL"):
+        with run_profiler.stage("get_tweetable_plays"):
+            plays = parse_feed()
+        del plays
+
+    [report] = tmp_path.glob("NHL-*.txt")
+    [collapsed] = tmp_path.glob("NHL-*.collapsed")
+    text = report.read_text()
+    assert "get_tweetable_plays: " in text and "run: " in text
+    assert "test_run_profiler.py" in text
+    stacks = collapsed.read_text().splitlines()
+    assert any(
+        s.startswith("get_tweetable_plays;") and "parse_feed (test_run_profiler.py" in s
+        for s in stacks
+    )
+
+
+def test_peak_of_the_run_includes_its_stages(tmp_path):
+    profiler = run_profiler.RunProfiler(str(tmp_path))
+    with profiler.profile():
+        with profiler.stage("get_tweetable_plays"):
+            plays = parse_feed()
+        del plays
+
+    inner, outer = profiler.stages
+    assert inner.peak_bytes > 1024 * 1024
+    assert outer.name == "run" and outer.peak_bytes >= inner.peak_bytes
+
+
+def test_does_nothing_without_profile_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv("PROFILE_DIR", raising=False)
+    with run_profiler.profiled("NHL"):
+        with run_profiler.stage("get_tweetable_plays"):
+            pass
+    assert run_profiler._active is None
@@ -0,0 +1,99 @@
+import threading
+from collections import Counter
+
+from clients.scorecard_cache import ScorecardCache
+from my_types import ImageInput, State
+
+
+def state(current_letter: str, times_cycled: int = 3) -> State:
+    return State(
+        current_letter=current_letter,
+        initial_current_letter=current_letter,
+        times_cycled=times_cycled,
+        initial_times_cycled=times_cycled,
+        season="season",
+        initial_season="season",
+        tweet_id=1,
+        initial_tweet_id=1,
+        scores_since_last_match=0,
+        initial_scores_since_last_match=0,
+    )
+
+
+PLAYERS = Counter(
+    {
+        (1, "Alex Ovechkin"): 5,  # K, L, no M
+        (2, "Jack Hughes"): 3,
+        (3, "Tomas Hertl"): 1,  # L, M
+        (4, "Jonathan Toews"): 1,  # No K or L
+    }
+)
+SEASON_PHRASE = "in the 2022-23 season"
+
+
+def image_input(player_id, player_name, matching_letters, next_letter, times_cycled=3):
+    return ImageInput(
+        completed_at=0,
+        matching_letters=matching_letters,
+        next_letter=next_letter,
+        player_id=player_id,
+        player_name=player_name,
+        season_phrase=SEASON_PHRASE,
+        sport="NHL",
+        times_cycled=times_cycled,
+        tweet_id="1",
+    )
+
+
+class FakeRenderer:
+    def __init__(self):
+        self.rendered = []
+        self.lock = threading.Lock()
+
+    def __call__(self, image_input: ImageInput) -> bytes:
+        with self.lock:
+            self.rendered.append(image_input.player_name)
+        return f"{image_input.player_name} {image_input.matching_letters}".encode()
+
+
+def test_likely_matches_are_rendered_and_used():
+    renderer = FakeRenderer()
+    cache = ScorecardCache("NHL", max_renders=10, render=renderer)
+    # Ovechkin and Hughes for K, then Ovechkin and Hertl for L
+    assert cache.speculate(state("K"), PLAYERS, SEASON_PHRASE) == 4
+
+    hit = cache.get(image_input(3, "Tomas Hertl", ["L", "M"], "N"))
+    assert hit is not None and hit.getvalue() == b"Tomas Hertl ['L', 'M']"
+    assert cache.get(image_input(4, "Jonathan Toews", ["K"], "L")) is None
+    assert sorted(renderer.rendered) == [
+        "Alex Ovechkin",
+        "Alex Ovechkin",
+        "Jack Hughes",
+        "Tomas Hertl",
+    ]
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+    assert "1 of 2 matched tweets (50%)" in cache.report()
+
+
+def test_guesses_are_dropped_once_the_state_moves_on():
+    cache = ScorecardCache("NHL", max_renders=10, render=FakeRenderer())
+    cache.speculate(state("K"), PLAYERS, SEASON_PHRASE)
+    # On L now. The L guesses made on K stay, the K ones go, and Hertl is guessed for M.
+    assert cache.speculate(state("L"), PLAYERS, SEASON_PHRASE) == 1
+    assert cache.stats.discarded == 2
+    assert len(cache.renders) == 3
+
+
+def test_likeliest_first_and_capped():
+    renderer = FakeRenderer()
+    cache = ScorecardCache("NHL", max_renders=1, render=renderer)
+    cache.speculate(state("K"), PLAYERS, SEASON_PHRASE)
+    cache.renders.popitem()[1].result()
+    assert renderer.rendered == ["Alex Ovechkin"]
+
+
+def test_next_letter_wraps_around():
+    cache = ScorecardCache("NHL", max_renders=10, render=FakeRenderer())
+    cache.speculate(state("Z"), Counter({(5, "Alex Ovechkin"): 1}), SEASON_PHRASE)
+    # No Z, so only A after cycling
+    assert cache.get(image_input(5, "Alex Ovechkin", ["A"], "B", times_cycled=4))
@@ -0,0 +1,99 @@
+import hashlib
+import io
+
+import pytest
+from PIL import Image  # type: ignore
+
+from clients.image_client import ImageClient
+from clients.scorecard_renderer import ScorecardRenderer
+from clients.sports_clients import get_sports_client
+from my_types import ImageInput
+
+
+def image_input(**changes) -> ImageInput:
+    fields = dict(
+        completed_at=0,
+        matching_letters=["A", "B", "C"],
+        next_letter="D",
+        player_id=8478403,
+        player_name="Gregory Finley",
+        season_phrase="in the 2022-23 season",
+        sport="NHL",
+        times_cycled=22,
+        tweet_id="1",
+    )
+    fields.update(changes)
+    return ImageInput(**fields)  # type: ignore
+
+
+def picture(color, size=(336, 336)) -> bytes:
+    b = io.BytesIO()
+    Image.new("RGB", size, color).save(b, format="PNG")
+    return b.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def local_state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCAL_STATE_DIR", str(tmp_path))
+
+
+@pytest.fixture
+def nhl():
+    client = get_sports_client("NHL", dry_run=True)
+    client.downloads = []
+
+    def get_player_picture(player_id):
+        client.downloads.append(player_id)
+        if player_id == 404:
+            return b"<html>Not found</html>"
+        return picture((200, 120, 90))
+
+    client.get_player_picture = get_player_picture
+    client.get_default_player_picture = lambda: picture((0, 0, 0))
+    return client
+
+
+def digest(b: io.BytesIO) -> str:
+    return hashlib.sha256(b.getvalue()).hexdigest()
+
+
+def test_same_input_same_bytes(nhl):
+    first = ScorecardRenderer("NHL", nhl).render(image_input())
+    # A new renderer draws its template and sizes the headshot again
+    again = ScorecardRenderer("NHL", nhl).render(image_input())
+    assert digest(first) == digest(again)
+    assert digest(first) != digest(
+        ScorecardRenderer("NHL", nhl).render(image_input(next_letter="E"))
+    )
+
+    image = Image.open(first)
+    assert (image.format, image.size) == ("JPEG", (1200, 675))
+    assert "exif" not in image.info
+
+
+def test_headshots_are_downloaded_once(nhl):
+    renderer = ScorecardRenderer("NHL", nhl)
+    renderer.render(image_input())
+    renderer.render(image_input(matching_letters=["D"], next_letter="E"))
+    # The next instance reads the download from disk
+    ScorecardRenderer("NHL", nhl).render(image_input())
+    assert nhl.downloads == [8478403]
+
+
+def test_default_headshot(nhl):
+    renderer = ScorecardRenderer("NHL", nhl)
+    renderer.render(image_input(player_id=404))
+    assert renderer.headshots[404].getpixel((10, 10)) == (0, 0, 0)
+
+
+def test_image_client_renders_locally(nhl, monkeypatch, tmp_path):
+    from clients import scorecard_renderer
+
+    monkeypatch.setenv("SCORECARD_RENDERER", "local")
+    monkeypatch.setitem(
+        scorecard_renderer._renderers, "NHL", ScorecardRenderer("NHL", nhl)
+    )
+    saved = tmp_path / "scorecard.jpeg"
+    b = ImageClient().get_tweet_image(image_input(), local_save_name=str(saved))
+    assert saved.read_bytes() == b.getvalue()
+    assert digest(b) == digest(ScorecardRenderer("NHL", nhl).render(image_input()))
@@ -0,0 +1,54 @@
+import datetime
+
+import pytest
+
+from clients.season_calendar import SeasonCalendar
+from my_types import GameWindow
+
+
+class FakeSportsClient:
+    def __init__(self, windows=None, error=None):
+        self.windows = windows or []
+        self.error = error
+
+    def get_game_windows(self, start, end):
+        if self.error:
+            raise self.error
+        return self.windows
+
+
+@pytest.fixture(autouse=True)
+def local_state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCAL_STATE_DIR", str(tmp_path))
+
+
+def test_stale_calendar_is_never_idle():
+    calendar = SeasonCalendar("NHL")
+    assert calendar.is_stale
+    assert not calendar.is_idle(now=0)
+
+
+def test_refreshed_calendar_is_idle_outside_windows():
+    calendar = SeasonCalendar("NHL")
+    calendar.refresh_if_stale(
+        FakeSportsClient([GameWindow(start=100, end=200)])  # type: ignore
+    )
+    assert calendar.is_idle(now=50)
+    assert not calendar.is_idle(now=150)
+    assert calendar.is_idle(now=250)
+
+
+def test_refresh_is_persisted():
+    SeasonCalendar("NFL").refresh_if_stale(
+        FakeSportsClient([GameWindow(start=100, end=200)])  # type: ignore
+    )
+    calendar = SeasonCalendar("NFL")
+    assert calendar.refreshed_on == datetime.date.today().isoformat()
+    assert calendar.windows == [GameWindow(start=100, end=200)]
+
+
+def test_failed_refresh_stays_stale():
+    calendar = SeasonCalendar("MLB")
+    calendar.refresh_if_stale(FakeSportsClient(error=ValueError("down")))  # type: ignore
+    assert calendar.is_stale
+    assert not calendar.is_idle(now=0)
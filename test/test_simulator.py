@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from my_types import SeasonPeriod, State, TweetablePlay
+
+np = pytest.importorskip("numpy")
+
+from simulator import VARIANTS, simulate  # noqa: E402
+
+NAMES = [
+    "Ronald Acuña Jr.",
+    "Bo Bichette",
+    "Vladimir Guerrero Jr.",
+    "Aaron Judge",
+    "Cal Raleigh",
+    "Ke'Bryan Hayes",
+    "Michael Harris II",
+    "Giancarlo Stanton",
+    "Mookie Betts",
+    "Fernando Tatis Jr.",
+]
+
+
+def play_with_state(state: State, player_name: str) -> None:
+    play = TweetablePlay(
+        play_id="1",
+        game_id="1",
+        end_time="",
+        image_name="",
+        tweet_phrase="",
+        player_name=player_name,
+        player_id=1,
+        player_team_id=1,
+        tiebreaker=0,
+        score="",
+        sport="MLB",
+        season_period=SeasonPeriod.REGULAR_SEASON,
+        season_phrase="",
+    )
+    state.find_matching_letters(play)
+
+
+@pytest.mark.parametrize("start_letter", ["A", "M", "Z"])
+def test_live_variant_matches_state(start_letter):
+    player_names = random.Random(0).choices(NAMES, k=300)
+    state = State(
+        current_letter=start_letter,
+        initial_current_letter=start_letter,
+        times_cycled=0,
+        initial_times_cycled=0,
+        season="season",
+        initial_season="season",
+        tweet_id=0,
+        initial_tweet_id=0,
+        scores_since_last_match=0,
+        initial_scores_since_last_match=0,
+    )
+    for name in player_names:
+        play_with_state(state, name)
+
+    [result] = simulate(player_names, [VARIANTS["live"]], start_letter)
+
+    assert result.final_letter == state.current_letter
+    assert result.times_cycled == state.times_cycled
+
+
+def test_variants_differ():
+    results = simulate(["Fernando Tatis Jr."], list(VARIANTS.values()), "I")
+
+    assert [(r.variant, r.final_letter, r.letters) for r in results] == [
+        ("live", "J", 1),
+        ("keep_suffixes", "K", 2),
+        ("last_name_only", "J", 1),
+        ("reverse", "H", 1),
+    ]
+
+
+def test_new_season_period_resets():
+    [result] = simulate(["Abe", "Abe"], [VARIANTS["live"]], "A", ["season", "playoffs"])
+
+    assert result.final_letter == "C"
+    assert result.letters == 4
+
+
+def test_live_variant_cleans_names_like_the_game():
+    from my_types import clean_player_name
+
+    for name in NAMES:
+        assert VARIANTS["live"].clean_name(name) == clean_player_name(name)
+    assert (
+        VARIANTS["keep_suffixes"].clean_name("Ronald Acuña Jr.") == "RONALD ACUNA JR."
+    )
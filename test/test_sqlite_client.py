@@ -0,0 +1,158 @@
+import pytest
+
+from clients.sqlite_client import MirroredStorageClient, SQLiteClient
+from clients.sports_clients import get_sports_client
+from clients.storage_client import StateConflictError
+from my_types import Game, SeasonPeriod, TweetablePlay
+
+
+def game(game_id: str, is_complete: bool = False) -> Game:
+    return Game(
+        game_id=game_id,
+        is_complete=is_complete,
+        home_team_id=1,
+        away_team_id=2,
+        season_period=SeasonPeriod.REGULAR_SEASON,
+    )
+
+
+def play(game_id: str, play_id: str) -> TweetablePlay:
+    return TweetablePlay(
+        play_id=play_id,
+        game_id=game_id,
+        end_time="",
+        image_name="Goal",
+        tweet_phrase="scored a goal",
+        player_name="Gregory Finley",
+        player_id=1,
+        player_team_id=1,
+        tiebreaker=0,
+        score="",
+        sport="NHL",
+        season_period=SeasonPeriod.REGULAR_SEASON,
+        season_phrase="in the 2022-23 season",
+    )
+
+
+@pytest.fixture
+def sqlite_client(tmp_path):
+    return SQLiteClient(
+        dry_run=False,
+        sports_client=get_sports_client("NHL", dry_run=True),
+        path=str(tmp_path / "test.sqlite3"),
+    )
+
+
+def test_run_round_trip(sqlite_client):
+    games = [game("1", is_complete=True), game("2")]
+    state = sqlite_client.get_initial_state()
+    assert state.current_letter == "A"
+
+    state.current_letter = "B"
+    sqlite_client.update_state(state)
+    sqlite_client.add_tweetable_play(play("1", "10"), state, is_match=True)
+    sqlite_client.add_tweetable_play(play("2", "20"), state, is_match=False)
+    sqlite_client.set_completed_games(games)
+
+    assert sqlite_client.get_initial_state().current_letter == "B"
+    assert sqlite_client.get_known_plays(games) == {"1": ["10"], "2": ["20"]}
+    assert [g.game_id for g in sqlite_client.get_active_games(games)] == ["2"]
+
+
+class CountingStorage(SQLiteClient):
+    known_play_queries = 0
+    state_queries = 0
+
+    def get_known_plays(self, games):
+        self.known_play_queries += 1
+        return super().get_known_plays(games)
+
+    def get_initial_state(self):
+        self.state_queries += 1
+        return super().get_initial_state()
+
+
+def test_mirror_copies_known_plays_once(tmp_path, sqlite_client):
+    primary = CountingStorage(
+        dry_run=False,
+        sports_client=get_sports_client("NHL", dry_run=True),
+        path=str(tmp_path / "primary.sqlite3"),
+    )
+    state = primary.get_initial_state()
+    primary.add_tweetable_play(play("1", "10"), state, is_match=False)
+    mirrored = MirroredStorageClient(primary=primary, mirror=sqlite_client)
+
+    assert mirrored.get_known_plays([game("1")]) == {"1": ["10"]}
+    mirrored.add_tweetable_play(play("1", "11"), state, is_match=False)
+
+    assert mirrored.get_known_plays([game("1")]) == {"1": ["10", "11"]}
+    assert primary.known_play_queries == 1
+    assert primary.get_known_plays([game("1")]) == {"1": ["10", "11"]}
+
+
+def test_mirror_copies_again_after_another_instance_wrote(tmp_path, sqlite_client):
+    nhl = get_sports_client("NHL", dry_run=True)
+    path = str(tmp_path / "primary.sqlite3")
+    other = SQLiteClient(dry_run=False, sports_client=nhl, path=path)
+    other.get_initial_state()
+    primary = CountingStorage(dry_run=False, sports_client=nhl, path=path)
+    # One run: the state it loads is the version the copy is checked against
+    mirrored = MirroredStorageClient(primary=primary, mirror=sqlite_client)
+    state = mirrored.get_initial_state()
+    assert mirrored.get_known_plays([game("1")]) == {}
+
+    # Our own writes keep the copy current
+    state.current_letter = "B"
+    mirrored.record_play(play("1", "10"), state, is_match=True, outbox_entry=None)
+    assert mirrored.get_known_plays([game("1")]) == {"1": ["10"]}
+    assert (primary.known_play_queries, primary.state_queries) == (1, 1)
+
+    # Like the instance holding the lease, then our next run
+    other_state = other.get_initial_state()
+    other_state.current_letter = "C"
+    other.record_play(play("1", "11"), other_state, is_match=True, outbox_entry=None)
+    mirrored = MirroredStorageClient(primary=primary, mirror=sqlite_client)
+    mirrored.get_initial_state()
+    assert mirrored.get_known_plays([game("1")]) == {"1": ["10", "11"]}
+    assert (primary.known_play_queries, primary.state_queries) == (2, 2)
+
+
+def test_stale_state_update_conflicts(tmp_path):
+    path = str(tmp_path / "test.sqlite3")
+    nhl = get_sports_client("NHL", dry_run=True)
+    first = SQLiteClient(dry_run=False, sports_client=nhl, path=path)
+    second = SQLiteClient(dry_run=False, sports_client=nhl, path=path)
+    first_state = first.get_initial_state()
+    second_state = second.get_initial_state()
+
+    first_state.current_letter = "B"
+    first.update_state(first_state)
+    second_state.current_letter = "C"
+    with pytest.raises(StateConflictError):
+        second.update_state(second_state)
+
+    # The winner can keep going from its new version
+    first_state.current_letter = "D"
+    first.update_state(first_state)
+    assert second.get_initial_state().current_letter == "D"
+
+
+def test_one_lease_per_sport(tmp_path):
+    path = str(tmp_path / "test.sqlite3")
+    first = SQLiteClient(
+        dry_run=False, sports_client=get_sports_client("NHL", True), path=path
+    )
+    second = SQLiteClient(
+        dry_run=False, sports_client=get_sports_client("NHL", True), path=path
+    )
+    other_sport = SQLiteClient(
+        dry_run=False, sports_client=get_sports_client("NBA", True), path=path
+    )
+
+    assert first.acquire_lease()
+    assert first.acquire_lease()
+    assert not second.acquire_lease()
+    assert other_sport.acquire_lease()
+
+    first.release_lease()
+    assert second.acquire_lease()
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from clients.sports_clients import get_sports_client
+from clients.sqlite_client import SQLiteClient
+from clients.tweet_outbox import TweetOutbox
+from my_types import Game, ImageInput, SeasonPeriod, TweetablePlay
+
+
+class FakeTwitterClient:
+    def __init__(self):
+        self.posts = []  # (status, has_image, in_reply_to)
+        self.timeline = {}
+
+    def matched_text(self, tweetable_play, state, matching_letters):
+        return f"{tweetable_play.player_name} matched {''.join(matching_letters)}"
+
+    def unmatched_text(self, tweetable_play, state):
+        return f"{tweetable_play.player_name} missed {state.current_letter}"
+
+    def posts_unmatched(self, state):
+        return True
+
+    def image_input(self, tweetable_play, state, matching_letters):
+        return ImageInput(
+            0, matching_letters, state.current_letter, 1, "", "", "NHL", 0, "1"
+        )
+
+    async def post(self, status, image_input=None, in_reply_to=None):
+        self.posts.append((status, image_input is not None, in_reply_to))
+        tweet_id = 100 + len(self.posts)
+        self.timeline[status] = tweet_id
+        return tweet_id
+
+    def find_recent_tweet(self, status):
+        return self.timeline.get(status)
+
+
+def play(play_id: str, player_name: str) -> TweetablePlay:
+    return TweetablePlay(
+        play_id=play_id,
+        game_id="1",
+        end_time="",
+        image_name="Goal",
+        tweet_phrase="scored a goal",
+        player_name=player_name,
+        player_id=1,
+        player_team_id=1,
+        tiebreaker=0,
+        score="",
+        sport="NHL",
+        season_period=SeasonPeriod.REGULAR_SEASON,
+        season_phrase="in the 2022-23 season",
+    )
+
+
+@pytest.fixture
+def storage_client(tmp_path):
+    return SQLiteClient(
+        dry_run=False,
+        sports_client=get_sports_client("NHL", dry_run=True),
+        path=str(tmp_path / "test.sqlite3"),
+    )
+
+
+def outbox_for(storage_client, twitter_client):
+    outbox = TweetOutbox(storage_client, get_sports_client("NHL", True), False)
+    outbox._twitter_client = twitter_client
+    return outbox
+
+
+def test_tweets_are_posted_after_detection(storage_client):
+    twitter_client = FakeTwitterClient()
+    outbox = outbox_for(storage_client, twitter_client)
+    state = storage_client.get_initial_state()
+
+    for p in [play("1", "Alex Ovechkin"), play("2", "Jack Hughes")]:
+        outbox.enqueue(p, state, state.find_matching_letters(p))
+    # Saved, not posted
+    assert twitter_client.posts == []
+    assert storage_client.get_known_plays(
+        [Game("1", False, 1, 2, SeasonPeriod.REGULAR_SEASON)]
+    ) == {"1": ["1", "2"]}
+    assert storage_client.get_initial_state().current_letter == "B"
+
+    asyncio.run(outbox.drain(state))
+    assert twitter_client.posts == [
+        ("Alex Ovechkin matched A", True, None),
+        ("Jack Hughes missed B", False, 101),
+    ]
+    assert storage_client.get_pending_tweets() == []
+    saved_state = storage_client.get_initial_state()
+    assert saved_state.tweet_id == 102
+    assert saved_state.scores_since_last_match == 1
+
+
+def test_unconfirmed_tweet_is_not_posted_twice(storage_client):
+    twitter_client = FakeTwitterClient()
+    outbox = outbox_for(storage_client, twitter_client)
+    state = storage_client.get_initial_state()
+    p = play("1", "Alex Ovechkin")
+    outbox.enqueue(p, state, state.find_matching_letters(p))
+
+    # The run dies right after posting
+    (entry,) = storage_client.get_pending_tweets()
+    storage_client.mark_tweet_sending(entry)
+    twitter_client.timeline[entry.status_text] = 555
+
+    asyncio.run(outbox.drain(storage_client.get_initial_state()))
+    assert twitter_client.posts == []
+    assert storage_client.get_pending_tweets() == []
+    assert storage_client.get_initial_state().tweet_id == 555
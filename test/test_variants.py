@@ -0,0 +1,118 @@
+import pytest
+
+from clients.sports_clients import get_sports_client
+from clients.sqlite_client import SQLiteClient
+from clients.variants import Variant, VariantEngine
+from my_types import Game, SeasonPeriod, TweetablePlay
+
+GAMES = [Game("1", False, 1, 2, SeasonPeriod.REGULAR_SEASON)]
+
+
+@pytest.fixture(autouse=True)
+def sqlite_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.sqlite3")
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_PATH", path)
+    return path
+
+
+def goal(play_id: str, player_name: str, team_id: int = 1) -> TweetablePlay:
+    return TweetablePlay(
+        play_id=play_id,
+        game_id="1",
+        end_time="",
+        image_name="Goal",
+        tweet_phrase="scored a goal",
+        player_name=player_name,
+        player_id=1,
+        player_team_id=team_id,
+        tiebreaker=0,
+        score="",
+        sport="NHL",
+        season_period=SeasonPeriod.REGULAR_SEASON,
+        season_phrase="in the 2022-23 season",
+    )
+
+
+def test_parse():
+    assert Variant.parse("last_name+reverse+team_21") == Variant(
+        "last_name+reverse+team_21", last_name_only=True, reverse=True, team_id=21
+    )
+    with pytest.raises(ValueError):
+        Variant.parse("backwards")
+
+
+def test_name_letters():
+    play = goal("1", "Alex Ovechkin Jr.")
+    assert Variant("all").name_letters(play) == "ALEX OVECHKIN"
+    assert Variant("last", last_name_only=True).name_letters(play) == "OVECHKIN"
+    # Mirrored, so the state's A is the game's Z
+    assert Variant("rev", reverse=True).name_letters(play) == "ZOVC LEVXSPRM"
+    assert Variant("rev", reverse=True).letter("A") == "Z"
+
+
+def test_each_variant_plays_its_own_game(sqlite_path):
+    nhl = get_sports_client("NHL", dry_run=True)
+    engine = VariantEngine(
+        nhl,
+        [
+            Variant("last_name", last_name_only=True),
+            Variant.parse("reverse"),
+            Variant.parse("team_2"),
+        ],
+    )
+    plays = [
+        goal("1", "Adam Fox"),  # A in the first name only
+        goal("2", "Zach Werenski", team_id=2),
+        goal("3", "Sebastian Aho"),
+    ]
+    last_name, reverse, team = engine.play(GAMES, plays)
+
+    assert (last_name.plays, last_name.matches, last_name.letter) == (3, 1, "B")
+    assert (reverse.plays, reverse.matches, reverse.letter) == (3, 1, "Y")
+    assert (team.plays, team.matches, team.letter) == (1, 1, "B")
+
+    # Each kept its own state and plays, and the sport's own game is untouched
+    storage_client = SQLiteClient(
+        dry_run=False, sports_client=nhl, path=sqlite_path, state_key="NHL_last_name"
+    )
+    assert storage_client.get_initial_state().current_letter == "B"
+    assert storage_client.get_known_plays(GAMES) == {"1": ["1", "2", "3"]}
+    assert (
+        SQLiteClient(dry_run=False, sports_client=nhl, path=sqlite_path)
+        .get_initial_state()
+        .current_letter
+        == "A"
+    )
+
+    # Plays seen again are skipped
+    last_name, _, _ = engine.play(GAMES, plays + [goal("4", "Mathew Barzal")])
+    assert (last_name.plays, last_name.matches, last_name.letter) == (1, 1, "C")
+
+
+def test_from_env(monkeypatch):
+    nhl = get_sports_client("NHL", dry_run=True)
+    monkeypatch.delenv("VARIANTS", raising=False)
+    assert VariantEngine.from_env(nhl) is None
+    monkeypatch.setenv("VARIANTS", "last_name, reverse")
+    engine = VariantEngine.from_env(nhl)
+    assert engine is not None
+    assert [engine.state_key(v) for v in engine.variants] == [
+        "NHL_last_name",
+        "NHL_reverse",
+    ]
+
+
+def test_a_failing_variant_is_skipped(sqlite_path, monkeypatch):
+    nhl = get_sports_client("NHL", dry_run=True)
+    engine = VariantEngine(nhl, [Variant.parse("reverse"), Variant.parse("team_2")])
+    get_initial_state = SQLiteClient.get_initial_state
+
+    def fail_for_reverse(self):
+        if self.sport == "NHL_reverse":
+            raise RuntimeError("No state row")
+        return get_initial_state(self)
+
+    monkeypatch.setattr(SQLiteClient, "get_initial_state", fail_for_reverse)
+    (team,) = engine.play(GAMES, [goal("1", "Zach Werenski", team_id=2)])
+    assert (team.variant.name, team.plays, team.letter) == ("team_2", 1, "B")
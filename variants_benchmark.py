@@ -0,0 +1,93 @@
+"""
+Measure what each added alphabet game variant costs a run, next to parsing the plays once.
+
+The slate comes from load_generator.py and is parsed once, then every variant count plays
+the same plays into a fresh SQLite database. The cost of a variant is the time it adds
+over one fewer, and parsing is what each variant would cost if it ingested the feeds itself.
+
+    python variants_benchmark.py NHL --games 15 --variants 0,1,2,4,8
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from clients.fetch_scheduler import FetchResult
+from clients.sports_clients import get_sports_client
+from clients.variants import Variant, VariantEngine
+from load_generator import SlateSpec, generate_slate, prepare_client
+
+RUNS = 3
+# Cycled through for the variant counts
+VARIANT_NAMES = ["last_name", "reverse", "last_name+reverse"]
+
+
+def benchmark(
+    sport: str, games: int, plays_per_game: int, variant_counts: list[int]
+) -> tuple[int, float, dict[int, float]]:
+    """Tweetable plays, median seconds to parse them and to play them for each variant count."""
+    slate = generate_slate(SlateSpec(sport, games, plays_per_game))  # type: ignore
+    sports_client = get_sports_client(slate.spec.sport, dry_run=True)
+    prepare_client(sports_client, slate)
+    schedule_games = sports_client.games_from_schedule(
+        slate.schedule, slate.day, slate.day
+    )
+    feeds = {
+        game_id: FetchResult(200, "application/json", json.dumps(feed).encode())
+        for game_id, feed in slate.feeds.items()
+    }
+
+    parse_times = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        plays = sports_client._parse_feeds(schedule_games, feeds, {})
+        parse_times.append(time.perf_counter() - started)
+
+    play_times: dict[int, float] = {}
+    for count in variant_counts:
+        variants = [
+            Variant.parse(VARIANT_NAMES[i % len(VARIANT_NAMES)]) for i in range(count)
+        ]
+        # Unique names, so each is its own state row
+        for i, v in enumerate(variants):
+            v.name = f"{v.name}{i}"
+        times = []
+        for _ in range(RUNS):
+            with tempfile.TemporaryDirectory() as directory:
+                os.environ["SQLITE_PATH"] = os.path.join(directory, "variants.sqlite3")
+                engine = VariantEngine(sports_client, variants)
+                started = time.perf_counter()
+                engine.play(schedule_games, plays)
+                times.append(time.perf_counter() - started)
+        play_times[count] = statistics.median(times)
+    return len(plays), statistics.median(parse_times), play_times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("sport", choices=["MLB", "NHL", "NBA", "NFL"])
+    parser.add_argument("--games", type=int, default=15)
+    parser.add_argument("--plays", type=int, default=400, help="Plays per game")
+    parser.add_argument("--variants", default="0,1,2,4,8")
+    args = parser.parse_args()
+
+    os.environ["STORAGE_BACKEND"] = "sqlite"
+    # Every variant prints its matches
+    with contextlib.redirect_stdout(io.StringIO()):
+        plays, parse_seconds, play_times = benchmark(
+            args.sport,
+            args.games,
+            args.plays,
+            [int(v) for v in args.variants.split(",")],
+        )
+    print(f"{plays} tweetable plays, parsed once in {parse_seconds * 1000:.1f}ms")
+    print("variants  total ms  per variant ms")
+    for count, seconds in play_times.items():
+        per_variant = seconds / count * 1000 if count else 0.0
+        print(f"{count:8} {seconds * 1000:9.1f} {per_variant:15.1f}")